@@ -0,0 +1,5 @@
+"""
+Benchmarks of the host-side code paths of the LPU.
+
+See `benchmarks/run.py` for running them without asv.
+"""
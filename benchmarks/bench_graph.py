@@ -0,0 +1,64 @@
+"""
+Benchmarks of circuit construction and conversion.
+"""
+
+import os
+import shutil
+import tempfile
+
+from .device_stub import install
+install()
+
+from neurokernel.LPU.LPU import LPU
+from .circuits import create_circuit
+
+SIZES = [1000, 10000, 100000]
+
+class GraphConstruction(object):
+    params = SIZES
+    param_names = ['num_neurons']
+    timeout = 600
+
+    def time_create_circuit(self, num_neurons):
+        create_circuit(num_neurons)
+
+class GraphConversion(object):
+    params = SIZES
+    param_names = ['num_neurons']
+    timeout = 600
+
+    def setup(self, num_neurons):
+        self.G = create_circuit(num_neurons)
+        self.graph = self.G.to_networkx()
+
+    def time_to_lpu_args(self, num_neurons):
+        self.G.to_lpu_args()
+
+    def time_to_networkx(self, num_neurons):
+        self.G.to_networkx()
+
+    def time_graph_to_dicts(self, num_neurons):
+        LPU.graph_to_dicts(self.graph)
+
+class GEXF(object):
+    params = SIZES[:2]
+    param_names = ['num_neurons']
+    timeout = 600
+
+    def setup(self, num_neurons):
+        self.dir = tempfile.mkdtemp()
+        self.G = create_circuit(num_neurons)
+        self.filename = os.path.join(self.dir, 'circuit.gexf')
+        self.G.write_gexf(self.filename)
+
+    def teardown(self, num_neurons):
+        shutil.rmtree(self.dir)
+
+    def time_write_gexf(self, num_neurons):
+        self.G.write_gexf(os.path.join(self.dir, 'out.gexf'))
+
+    def time_read_gexf(self, num_neurons):
+        self.G.read_gexf(self.filename)
+
+    def time_lpu_parser(self, num_neurons):
+        LPU.lpu_parser(self.filename)
@@ -0,0 +1,45 @@
+"""
+Benchmarks of the time taken to import the modules used by tools.
+
+Each import is timed in a fresh interpreter, so the results include the
+start-up time of the interpreter, which is measured separately by
+`time_interpreter`.
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run(code):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT]+[p for p in \
+        env.get('PYTHONPATH', '').split(os.pathsep) if p])
+    subprocess.check_call([sys.executable, '-c', code], env=env)
+
+class Import(object):
+    number = 1
+    repeat = 10
+
+    def time_interpreter(self):
+        _run('pass')
+
+    def time_graph(self):
+        _run('import neurokernel.LPU.Graph')
+
+    def time_parsing(self):
+        _run('import neurokernel.LPU.utils.parsing')
+
+    def time_model(self):
+        _run('from neurokernel.LPU.NDComponents import get_model; '
+             'get_model("LeakyIAF")')
+
+    def time_file_input_processor(self):
+        _run('import neurokernel.LPU.InputProcessors.FileInputProcessor')
+
+    def time_lpu(self):
+        # The LPU derives from the Neurokernel core module, which is replaced
+        # by the device stub:
+        _run('from benchmarks.device_stub import install; install(); '
+             'import neurokernel.LPU.LPU')
@@ -0,0 +1,71 @@
+"""
+Benchmarks of the throughput of the file input and output processors.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .device_stub import install
+install()
+
+from neurokernel.LPU.InputProcessors.FileInputProcessor import \
+    FileInputProcessor
+from neurokernel.LPU.OutputProcessors.FileOutputProcessor import \
+    FileOutputProcessor
+from .circuits import create_input_file
+
+SIZES = [100, 10000, 100000]
+
+class FileInput(object):
+    params = SIZES
+    param_names = ['num_uids']
+    number = 1
+    repeat = 5
+    steps = 1000
+
+    def setup(self, num_uids):
+        self.dir = tempfile.mkdtemp()
+        filename = os.path.join(self.dir, 'input.h5')
+        create_input_file(filename, ['neuron_%d' % i for i in range(num_uids)],
+                          self.steps+1)
+        self.proc = FileInputProcessor(filename)
+        self.proc.pre_run()
+
+    def teardown(self, num_uids):
+        self.proc.post_run()
+        shutil.rmtree(self.dir)
+
+    def time_update_input(self, num_uids):
+        for _ in range(self.steps):
+            self.proc.update_input()
+
+class FileOutput(object):
+    params = SIZES
+    param_names = ['num_uids']
+    number = 1
+    repeat = 5
+    steps = 1000
+
+    def setup(self, num_uids):
+        self.dir = tempfile.mkdtemp()
+        uids = ['neuron_%d' % i for i in range(num_uids)]
+        self.proc = FileOutputProcessor([('V', uids), ('spike_state', uids)],
+                                        os.path.join(self.dir, 'output.h5'))
+        # Attributes otherwise set when the processor is attached to an LPU:
+        self.proc.start_time = 0.
+        self.proc.dt = 1e-4
+        self.proc.variables['V']['output'] = np.random.rand(num_uids)
+        self.proc.variables['spike_state']['output'] = \
+            np.zeros(num_uids, np.int32)
+        self.proc.pre_run()
+
+    def teardown(self, num_uids):
+        self.proc.post_run()
+        shutil.rmtree(self.dir)
+
+    def time_process_output(self, num_uids):
+        for _ in range(self.steps):
+            self.proc.process_output()
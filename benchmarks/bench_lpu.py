@@ -0,0 +1,78 @@
+"""
+Benchmarks of LPU construction, memory setup and per-step host overhead.
+
+Kernels are replaced by functions that do nothing (see `device_stub`), so
+the step benchmarks measure the time spent in Python between kernel
+launches, which bounds the step rate of small circuits on a GPU.
+"""
+
+import copy
+
+from .device_stub import install
+install()
+
+from neurokernel.LPU.LPU import LPU
+from neurokernel.LPU.MemoryManager import MemoryManager
+from .circuits import create_circuit
+
+SIZES = [1000, 10000, 100000]
+DT = 1e-4
+
+class _Circuit(object):
+    params = SIZES
+    param_names = ['num_neurons']
+    timeout = 600
+    # LPU modifies the component dictionaries, so each measurement needs a
+    # fresh copy made in setup():
+    number = 1
+    repeat = 5
+
+    def setup_cache(self):
+        return dict((n, create_circuit(n).to_lpu_args()) for n in SIZES)
+
+    def make_lpu(self, args, num_neurons, **kwargs):
+        comp_dict, conns = copy.deepcopy(args[num_neurons])
+        return LPU(DT, comp_dict, conns, id='bench', **kwargs)
+
+class LPUConstruction(_Circuit):
+    def setup(self, args, num_neurons):
+        self.args = copy.deepcopy(args[num_neurons])
+
+    def time_init(self, args, num_neurons):
+        comp_dict, conns = self.args
+        LPU(DT, comp_dict, conns, id='bench')
+
+class LPUMemory(_Circuit):
+    def setup(self, args, num_neurons):
+        self.lpu = self.make_lpu(args, num_neurons)
+        self.lpu.memory_manager = MemoryManager()
+
+    def time_init_variable_memory(self, args, num_neurons):
+        self.lpu.init_variable_memory()
+
+class LPUConnections(_Circuit):
+    def setup(self, args, num_neurons):
+        self.lpu = self.make_lpu(args, num_neurons)
+        self.lpu.memory_manager = MemoryManager()
+        self.lpu.init_variable_memory()
+
+    def time_process_connections(self, args, num_neurons):
+        self.lpu.process_connections()
+
+class LPUPreRun(_Circuit):
+    def setup(self, args, num_neurons):
+        self.lpu = self.make_lpu(args, num_neurons)
+
+    def time_pre_run(self, args, num_neurons):
+        self.lpu.pre_run()
+
+class LPUStep(_Circuit):
+    steps = 100
+
+    def setup(self, args, num_neurons):
+        self.lpu = self.make_lpu(args, num_neurons)
+        self.lpu.pre_run()
+
+    def time_run_step(self, args, num_neurons):
+        for _ in range(self.steps):
+            self.lpu.run_step()
@@ -0,0 +1,70 @@
+"""
+Benchmarks of the rendering of visualizer frames.
+"""
+
+import os
+import shutil
+import tempfile
+
+import h5py
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from neurokernel.LPU.utils import visualizer as vis
+
+def create_output_file(filename, num_uids, steps, dt=1e-4, seed=0):
+    """
+    Write a random output file in the format of FileOutputProcessor.
+    """
+
+    rng = np.random.RandomState(seed)
+    uids = np.array(['neuron_%d' % i for i in range(num_uids)], dtype='S')
+    with h5py.File(filename, 'w') as f:
+        f.create_dataset('metadata', (), 'i')
+        f['metadata'].attrs['start_time'] = 0.
+        f['metadata'].attrs['sample_interval'] = 1
+        f['metadata'].attrs['dt'] = dt
+        f.create_dataset('V/uids', data=uids)
+        f.create_dataset('V/data', data=rng.uniform(-70., -20.,
+                                                    (steps, num_uids)))
+        f.create_dataset('spike_state/uids', data=uids)
+        f.create_dataset('spike_state/data',
+                         data=(rng.rand(steps, num_uids) < 0.01).astype(np.int32))
+    return uids
+
+class FrameRendering(object):
+    params = ['waveform', 'raster', 'image']
+    param_names = ['plot']
+    number = 1
+    repeat = 5
+    frames = 20
+    num_uids = 1024
+    steps = 10000
+
+    def setup(self, plot):
+        self.dir = tempfile.mkdtemp()
+        filename = os.path.join(self.dir, 'output.h5')
+        uids = create_output_file(filename, self.num_uids, self.steps)
+        self.V = vis.visualizer()
+        self.V.add_LPU(filename, LPU='bench')
+        if plot == 'waveform':
+            config = {'type': 'waveform', 'variable': 'V', 'uids': [uids[:1]]}
+        elif plot == 'raster':
+            config = {'type': 'raster', 'variable': 'spike_state',
+                      'uids': [uids[:100]]}
+        else:
+            config = {'type': 'image', 'variable': 'V', 'uids': [uids],
+                      'shape': [32, 32]}
+        self.V.add_plot(config, 'bench')
+        self.V.update_interval = self.steps/self.frames*1e-4
+        self.V.final_frame_name = None
+
+    def teardown(self, plot):
+        plt.close('all')
+        self.V._close_data()
+        shutil.rmtree(self.dir)
+
+    def time_render(self, plot):
+        self.V._render(0, self.frames, 80)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""
+Synthetic circuits and input files of configurable size for the benchmarks.
+"""
+
+import h5py
+import numpy as np
+
+def create_circuit(num_neurons, fan_in=10, seed=0):
+    """
+    Create a random circuit without ports.
+
+    Half of the neurons are spiking (LeakyIAF) and half are graded potential
+    (MorrisLecar) neurons, with the same parameters as the generic LPU
+    example. Each neuron receives `fan_in` synapses from randomly chosen
+    neurons; synapses from spiking neurons use the alpha function model and
+    the others the power_gpot_gpot model.
+
+    Parameters
+    ----------
+    num_neurons : int
+        Number of neurons.
+    fan_in : int
+        Number of synapses of each neuron.
+    seed : int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    G : neurokernel.LPU.Graph.Graph
+        Generated circuit.
+    """
+
+    from neurokernel.LPU.Graph import Graph
+
+    rng = np.random.RandomState(seed)
+    G = Graph()
+    G.set_model_default(
+        'LeakyIAF',
+        reset_potential = -67.5489770451,
+        resting_potential = 0.0,
+        threshold = -25.1355161007,
+        resistance = 1002.445570216,
+        capacitance = 0.0669810502993,
+        V = -67.5489770451)
+    G.set_model_default(
+        'AlphaSynapse',
+        ad = 0.19 * 1e3,
+        ar = 1.1 * 1e2,
+        gmax = 0.003 * 1e-3,
+        reverse = 65.0,
+        a0 = 0.,
+        a1 = 0.,
+        a2 = 0.)
+    G.set_model_default(
+        'PowerGPotGPot',
+        reverse = -80.0,
+        saturation = 0.03 * 1e-3,
+        slope = 0.8 * 1e-6,
+        power = 1.0,
+        threshold = -50.0)
+    G.set_model_default(
+        'MorrisLecar',
+        V1 = 30.,
+        V2 = 15.,
+        V3 = 0.,
+        V4 = 30.,
+        phi = 0.025,
+        offset = 0.,
+        V_L = -50.,
+        V_Ca = 100.0,
+        V_K = -70.0,
+        g_Ca = 1.1,
+        g_K = 2.0,
+        g_L = 0.5,
+        V = -52.14,
+        n = 0.02)
+
+    num_spk = num_neurons // 2
+    neurons = ['neuron_%d' % i for i in range(num_neurons)]
+    G.add_neurons(neurons[:num_spk], 'LeakyIAF',
+                  V=rng.uniform(-60.0, -25.0, num_spk))
+    G.add_neurons(neurons[num_spk:], 'MorrisLecar')
+
+    pre = rng.randint(0, num_neurons, num_neurons*fan_in)
+    post = np.repeat(np.arange(num_neurons), fan_in)
+    spk = pre < num_spk
+    for model, mask, kwargs in [('AlphaSynapse', spk, {}),
+                                ('PowerGPotGPot', ~spk, {'delay': 0.001})]:
+        ids = ['synapse_%d' % i for i in np.flatnonzero(mask)]
+        G.add_synapses(ids, [neurons[i] for i in pre[mask]],
+                       [neurons[i] for i in post[mask]], model, **kwargs)
+    return G
+
+def create_input_file(filename, uids, steps, var='I', seed=0):
+    """
+    Write a random input file in the format read by FileInputProcessor.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 file to write.
+    uids : list
+        Uids of the components that receive the input.
+    steps : int
+        Number of time steps.
+    var : str
+        Input variable.
+    seed : int
+        Seed of the random number generator.
+    """
+
+    rng = np.random.RandomState(seed)
+    with h5py.File(filename, 'w') as f:
+        f.create_dataset(var + '/uids', data=np.array(uids, dtype='S'))
+        f.create_dataset(var + '/data', (steps, len(uids)), dtype=np.double,
+                         data=rng.rand(steps, len(uids)))
@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+
+"""
+Host-only stand-in for the device layer used by the benchmarks.
+
+`install()` registers replacements for PyCUDA, the pitched array module and
+the Neurokernel core modules that the LPU depends on, so that the host-side
+code paths (construction, connectivity processing, memory setup, per-step
+Python overhead and I/O) can be timed on machines without a GPU. Device
+memory is ordinary host memory, so pointer arithmetic and memory copies
+behave as on the device; kernels are compiled to functions that do nothing.
+With `install(run_elementwise=True)`, the elementwise kernels (which gather
+and scatter the inputs and outputs of the LPU) are run on the host, so that
+tests can step components on the host (e.g., with `update_numpy`).
+`HostModule` compiles CUDA kernels for the host with a C++ compiler, so
+that tests can also run or check the kernels themselves.
+"""
+
+import ctypes
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import types
+
+import numpy as np
+
+def _module(name, **attrs):
+    m = types.ModuleType(name)
+    m.__dict__.update(attrs)
+    sys.modules[name] = m
+    parent, _, child = name.rpartition('.')
+    if parent in sys.modules:
+        setattr(sys.modules[parent], child, m)
+    return m
+
+class DeviceAllocation(object):
+    """
+    Device memory backed by a host buffer.
+    """
+
+    def __init__(self, nbytes):
+        self.buf = np.zeros(max(int(nbytes), 1), np.uint8)
+
+    def __int__(self):
+        return self.buf.ctypes.data
+
+    __index__ = __int__
+    __long__ = __int__
+
+def _view(ptr, shape, dtype):
+    # Array over the memory at a device (i.e., host) address:
+    dtype = np.dtype(dtype)
+    n = int(np.prod(shape))*dtype.itemsize
+    buf = (ctypes.c_char*max(n, 1)).from_address(int(ptr))
+    return np.frombuffer(buf, dtype, int(np.prod(shape))).reshape(shape)
+
+def mem_alloc(nbytes):
+    return DeviceAllocation(nbytes)
+
+def mem_alloc_pitch(width, height, access_size):
+    pitch = int(np.ceil(float(width)/512)*512)
+    return DeviceAllocation(pitch*height), pitch
+
+def memcpy_htod(dest, src):
+    src = np.ascontiguousarray(src)
+    ctypes.memmove(int(dest), src.ctypes.data, src.nbytes)
+
+def memcpy_dtoh(dest, src):
+    ctypes.memmove(dest.ctypes.data, int(src), dest.nbytes)
+
+def memcpy_dtod(dest, src, size):
+    ctypes.memmove(int(dest), int(src), int(size))
+
+def memset_d32(dest, data, count):
+    _view(dest, (count,), np.uint32)[:] = data
+
+class Event(object):
+    def record(self, stream=None):
+        return self
+
+    def synchronize(self):
+        return self
+
+    def time_since(self, event):
+        return 0.
+
+class _Device(object):
+    MULTIPROCESSOR_COUNT = 16
+
+    def compute_capability(self):
+        return (7, 0)
+
+class Context(object):
+    handle = 0
+
+    @staticmethod
+    def get_device():
+        return _Device()
+
+    @staticmethod
+    def get_current():
+        return Context()
+
+    @staticmethod
+    def synchronize():
+        pass
+
+class GPUArray(object):
+    """
+    Minimal host-backed replacement for pycuda.gpuarray.GPUArray.
+    """
+
+    def __init__(self, shape, dtype, gpudata=None):
+        if isinstance(shape, (int, np.integer)):
+            shape = (int(shape),)
+        self.shape = tuple(int(s) for s in shape)
+        self.dtype = np.dtype(dtype)
+        self.size = int(np.prod(self.shape))
+        self.nbytes = self.size*self.dtype.itemsize
+        if gpudata is None:
+            gpudata = DeviceAllocation(self.nbytes)
+        self.gpudata = gpudata
+        self._data = _view(gpudata, self.shape, self.dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def get(self):
+        return self._data.copy()
+
+    def set(self, ary):
+        self._data[...] = np.asarray(ary).reshape(self.shape)
+
+    def fill(self, value, stream=None):
+        self._data.fill(value)
+        return self
+
+def to_gpu(ary):
+    ary = np.asarray(ary)
+    result = GPUArray(ary.shape, ary.dtype)
+    result.set(ary)
+    return result
+
+def empty(shape, dtype=np.double):
+    return GPUArray(shape, dtype)
+
+def zeros(shape, dtype=np.double):
+    return GPUArray(shape, dtype).fill(0)
+
+class PitchArray(object):
+    """
+    Minimal host-backed replacement for parray.PitchArray.
+    """
+
+    def __init__(self, shape, dtype):
+        if isinstance(shape, (int, np.integer)):
+            shape = (1, int(shape))
+        self.shape = tuple(int(s) for s in shape)
+        self.dtype = np.dtype(dtype)
+        self.size = int(np.prod(self.shape))
+        self.ld = self.shape[-1]
+        self.gpudata = DeviceAllocation(self.size*self.dtype.itemsize)
+        self.nbytes = self.size*self.dtype.itemsize
+        self._data = _view(self.gpudata, self.shape, self.dtype)
+
+    def get(self):
+        return self._data.copy()
+
+    def set(self, ary):
+        self._data[...] = ary
+
+    def fill(self, value, stream=None):
+        self._data.fill(value)
+        return self
+
+    def __mul__(self, value):
+        self._data *= value
+        return self
+
+def _parray_zeros(shape, dtype):
+    return PitchArray(shape, dtype).fill(0)
+
+def _parray_ones(shape, dtype):
+    return PitchArray(shape, dtype).fill(1)
+
+class _Function(object):
+    """
+    Compiled kernel that does nothing when launched.
+    """
+
+    def prepare(self, arg_types, *args, **kwargs):
+        return self
+
+    def prepared_call(self, *args, **kwargs):
+        pass
+
+    def prepared_async_call(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        pass
+
+class SourceModule(object):
+    def __init__(self, source, *args, **kwargs):
+        self.source = source
+
+    def get_function(self, name):
+        return _Function()
+
+def compile(source, *args, **kwargs):
+    return source.encode('utf-8')
+
+def get_nvcc_version(nvcc):
+    return 'stub'
+
+def module_from_buffer(binary):
+    return SourceModule(binary)
+
+# Host definitions of the CUDA built-ins, with which kernels run as a single
+# thread of a single block:
+HOST_PRELUDE = """
+#include <math.h>
+#define __global__ extern "C"
+#define __device__
+#define __shared__ static
+struct dim3_t { int x, y, z; };
+static const dim3_t threadIdx = {0, 0, 0}, blockIdx = {0, 0, 0},
+                    blockDim = {1, 1, 1}, gridDim = {1, 1, 1};
+static inline void __syncthreads() {}
+"""
+
+class HostModule(object):
+    """
+    CUDA kernels compiled for the host with a C++ compiler.
+
+    Kernels that only index their data with the global thread index and
+    loop over it with a stride of the total number of threads, such as
+    those of the models, run as serial loops; the others can only be
+    checked to compile (with `syntax_only`).
+
+    Parameters
+    ----------
+    source : str
+        CUDA source of the kernels.
+    options : list
+        Compiler options, e.g., the macros of the model.
+    syntax_only : bool
+        Only check that the source compiles.
+    """
+
+    def __init__(self, source, options=[], syntax_only=False):
+        build_dir = tempfile.mkdtemp()
+        try:
+            src = os.path.join(build_dir, 'kernels.cpp')
+            lib = os.path.join(build_dir, 'kernels.so')
+            with open(src, 'w') as f:
+                f.write(HOST_PRELUDE + source)
+            cmd = [os.environ.get('CXX', 'g++'), '-O2', '-w', src] + \
+                  [o for o in options if o.startswith('-D')]
+            cmd += ['-fsyntax-only'] if syntax_only else \
+                   ['-shared', '-fPIC', '-o', lib]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT)
+            out = proc.communicate()[0]
+            if proc.returncode:
+                raise RuntimeError('compilation failed:\n' +
+                                   out.decode('utf-8', 'replace'))
+            self.lib = None if syntax_only else ctypes.CDLL(lib)
+        finally:
+            shutil.rmtree(build_dir)
+
+    def get_function(self, name):
+        func = getattr(self.lib, name)
+        func.restype = None
+        def call(*args):
+            # Arrays are passed by address, floats as doubles (the kernels
+            # are compiled with USE_DOUBLE) and integers as ints:
+            func(*[ctypes.c_void_p(a.ctypes.data)
+                   if isinstance(a, np.ndarray) else
+                   ctypes.c_double(a) if isinstance(a, float) else
+                   ctypes.c_int(a) for a in args])
+        return call
+
+def _host_array(a):
+    if isinstance(a, (GPUArray, PitchArray)):
+        return a._data.reshape(-1)
+    return a
+
+class ElementwiseKernel(_Function):
+    """
+    Elementwise kernel that does nothing unless `run_on_host` is set.
+
+    The operations of the elementwise kernels of the LPU are single
+    assignments with array indexing, which are also valid NumPy statements
+    when `i` is the array of indices.
+    """
+
+    run_on_host = False
+
+    def __init__(self, arguments, operation, *args, **kwargs):
+        self.names = [a.split()[-1].lstrip('*') for a in arguments.split(',')]
+        self.operation = operation
+
+    def __call__(self, *args, **kwargs):
+        if not self.run_on_host:
+            return
+        env = dict(zip(self.names, [_host_array(a) for a in args]))
+        r = kwargs.get('range', None)
+        if r is None:
+            r = slice(0, args[0].size, 1)
+        env['i'] = np.arange(r.start, r.stop, r.step)
+        exec(self.operation, {}, env)
+
+_ctypes = {np.dtype(np.float32): 'float', np.dtype(np.float64): 'double',
+           np.dtype(np.int32): 'int', np.dtype(np.int64): 'long long',
+           np.dtype(np.uint32): 'unsigned int'}
+
+def dtype_to_ctype(dtype):
+    return _ctypes[np.dtype(dtype)]
+
+def context_dependent_memoize(func):
+    cache = {}
+    def wrapper(*args):
+        if args not in cache:
+            cache[args] = func(*args)
+        return cache[args]
+    return wrapper
+
+class _PortMapper(object):
+    def ports_to_inds(self, selector):
+        return []
+
+class LoggerMixin(object):
+    def __init__(self, name=''):
+        self.name = name
+
+    def log_info(self, msg):
+        pass
+
+    log_debug = log_warning = log_error = log_info
+
+class Module(LoggerMixin):
+    """
+    Stand-in for the Neurokernel module base class without any inter-LPU
+    communication.
+    """
+
+    def __init__(self, sel=None, sel_in=None, sel_out=None, sel_gpot=None,
+                 sel_spike=None, data_gpot=None, data_spike=None,
+                 columns=None, ctrl_tag=None, gpot_tag=None, spike_tag=None,
+                 id=None, device=None, routing_table=None, rank_to_id=None,
+                 debug=False, time_sync=False):
+        self.id = id
+        self.pm = {'gpot': _PortMapper(), 'spike': _PortMapper()}
+
+    def pre_run(self):
+        pass
+
+    def run_step(self):
+        pass
+
+    def post_run(self):
+        pass
+
+def get_by_inds(*args, **kwargs):
+    raise NotImplementedError
+
+def install(run_elementwise=False):
+    """
+    Register the stand-in modules.
+
+    PyCUDA, the pitched array module and the Neurokernel core are always
+    replaced so that results do not depend on the hardware or on MPI; the
+    Neurokernel logging and GPU tools are only replaced if they are not
+    installed.
+
+    Parameters
+    ----------
+    run_elementwise : bool
+        Run the elementwise kernels on the host instead of doing nothing.
+    """
+
+    if run_elementwise:
+        ElementwiseKernel.run_on_host = True
+    if 'pycuda' in sys.modules and \
+       getattr(sys.modules['pycuda'], '__stub__', False):
+        return
+    # Don't fill the kernel cache with stub modules:
+    os.environ['NEUROKERNEL_KERNEL_CACHE'] = ''
+    _module('pycuda', __stub__=True, __path__=[])
+    _module('pycuda.driver', mem_alloc=mem_alloc,
+            mem_alloc_pitch=mem_alloc_pitch, memcpy_htod=memcpy_htod,
+            memcpy_dtoh=memcpy_dtoh, memcpy_dtod=memcpy_dtod,
+            memset_d32=memset_d32, Event=Event, Context=Context,
+            DeviceAllocation=DeviceAllocation, pagelocked_empty=np.empty,
+            module_from_buffer=module_from_buffer)
+    _module('pycuda.gpuarray', GPUArray=GPUArray, to_gpu=to_gpu, empty=empty,
+            zeros=zeros)
+    _module('pycuda.compiler', SourceModule=SourceModule, compile=compile,
+            get_nvcc_version=get_nvcc_version)
+    _module('pycuda.elementwise', ElementwiseKernel=ElementwiseKernel)
+    _module('pycuda.tools', dtype_to_ctype=dtype_to_ctype,
+            context_dependent_memoize=context_dependent_memoize)
+    _module('pycuda.autoinit')
+
+    import neurokernel
+    import neurokernel.LPU.utils
+    _module('neurokernel.LPU.utils.parray', PitchArray=PitchArray,
+            zeros=_parray_zeros, ones=_parray_ones)
+    _module('neurokernel.core_gpu', Module=Module, CTRL_TAG=1, GPOT_TAG=2,
+            SPIKE_TAG=3)
+    try:
+        import neurokernel.mixins
+    except ImportError:
+        _module('neurokernel.mixins', LoggerMixin=LoggerMixin)
+    try:
+        import neurokernel.tools.gpu
+    except ImportError:
+        _module('neurokernel.tools', __path__=[])
+        _module('neurokernel.tools.gpu', get_by_inds=get_by_inds)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""
+Run the benchmarks without asv and record the results of the current commit.
+
+The benchmarks follow the asv conventions (classes with `params`,
+`setup`, `teardown`, `setup_cache` and `time_*` methods), so they can also
+be run with `asv run` using the configuration at the top of the repository.
+
+Examples
+--------
+Run all benchmarks and save the results to benchmarks/results/<commit>.json::
+
+    python -m benchmarks.run
+
+Run the benchmarks whose name contains 'LPU' and compare two commits::
+
+    python -m benchmarks.run -b LPU
+    python -m benchmarks.run --compare benchmarks/results/A.json \\
+        benchmarks/results/B.json
+"""
+
+import argparse
+import glob
+import importlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'results')
+
+def discover(pattern=None):
+    """
+    Return (name, class, method) for each benchmark.
+    """
+
+    benchmarks = []
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(here, 'bench_*.py'))):
+        mod_name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            mod = importlib.import_module('benchmarks.' + mod_name)
+        except ImportError as e:
+            print('skipping %s: %s' % (mod_name, e))
+            continue
+        for cls_name in sorted(dir(mod)):
+            cls = getattr(mod, cls_name)
+            if cls_name.startswith('_') or not isinstance(cls, type) or \
+               cls.__module__ != mod.__name__:
+                continue
+            for meth in sorted(dir(cls)):
+                if not meth.startswith('time_'): continue
+                name = '%s.%s.%s' % (mod_name, cls_name, meth)
+                if pattern is None or pattern in name:
+                    benchmarks.append((name, cls, meth))
+    return benchmarks
+
+def param_combinations(cls):
+    params = getattr(cls, 'params', [])
+    if not params:
+        return [()]
+    if not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return list(itertools.product(*params))
+
+def run_benchmark(cls, meth, caches):
+    """
+    Time a benchmark for each combination of its parameters.
+
+    Returns a dictionary mapping the parameters (formatted as a string) to the
+    minimum and median time in seconds of a call.
+    """
+
+    results = {}
+    for params in param_combinations(cls):
+        obj = cls()
+        args = params
+        if hasattr(obj, 'setup_cache'):
+            if cls not in caches:
+                caches[cls] = obj.setup_cache()
+            args = (caches[cls],)+params
+        number = getattr(obj, 'number', 0) or 1
+        samples = []
+        try:
+            for _ in range(getattr(obj, 'repeat', 0) or 3):
+                if hasattr(obj, 'setup'): obj.setup(*args)
+                try:
+                    func = getattr(obj, meth)
+                    start = timeit.default_timer()
+                    for _ in range(number):
+                        func(*args)
+                    samples.append((timeit.default_timer()-start)/number)
+                finally:
+                    if hasattr(obj, 'teardown'): obj.teardown(*args)
+        except NotImplementedError:
+            continue
+        samples.sort()
+        results[repr(params)] = {'min': samples[0],
+                                 'median': samples[len(samples)//2]}
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(RESULTS_DIR)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(old_file, new_file, threshold=1.1):
+    with open(old_file) as f:
+        old = json.load(f)['results']
+    with open(new_file) as f:
+        new = json.load(f)['results']
+    print('%-60s %-12s %10s %10s %7s' % \
+          ('benchmark', 'params', 'old [ms]', 'new [ms]', 'ratio'))
+    for name in sorted(set(old) & set(new)):
+        for params in sorted(set(old[name]) & set(new[name])):
+            a = old[name][params]['min']
+            b = new[name][params]['min']
+            ratio = b/a if a else float('inf')
+            flag = ''
+            if ratio > threshold: flag = ' slower'
+            elif ratio < 1./threshold: flag = ' faster'
+            print('%-60s %-12s %10.3f %10.3f %7.2f%s' % \
+                  (name, params, a*1e3, b*1e3, ratio, flag))
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmarks.')
+    parser.add_argument('-b', '--bench', default=None,
+                        help='Only run benchmarks whose name contains this')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Result file [default: results/<commit>.json]')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='Compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    output = {'commit': commit, 'date': time.time(),
+              'python': platform.python_version(),
+              'machine': platform.node(), 'results': {}}
+    caches = {}
+    for name, cls, meth in discover(args.bench):
+        try:
+            res = run_benchmark(cls, meth, caches)
+        except Exception as e:
+            print('%s failed: %r' % (name, e))
+            continue
+        output['results'][name] = res
+        for params, r in sorted(res.items()):
+            print('%-60s %-12s %10.3f ms' % (name, params, r['min']*1e3))
+
+    filename = args.output or os.path.join(RESULTS_DIR, commit + '.json')
+    if not os.path.isdir(os.path.dirname(os.path.abspath(filename))):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)))
+    with open(filename, 'w') as f:
+        json.dump(output, f, indent=1, sort_keys=True)
+    print('results written to %s' % filename)
+
+if __name__ == '__main__':
+    sys.exit(main())
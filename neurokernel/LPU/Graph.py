@@ -1,32 +1,330 @@
-import networkx as nx
+import array
+import itertools
+import numpy as np
 import inspect
-from .NDComponents import *
+from . import NDComponents
+from .NDComponents import BaseAxonHillockModel, BaseMembraneModel, \
+    BaseSynapseModel
+from .utils import parsing
 from collections import OrderedDict
 
-def get_all_subclasses(cls):
-    all_subclasses = []
+# Placeholder for attributes that a node of a table doesn't have:
+_MISSING = object()
+
+def _is_column(v):
+    return isinstance(v, list) or (isinstance(v, np.ndarray) and v.ndim > 0)
+
+class _Table(object):
+    """Column store of the attributes of the nodes of a single model.
+
+    Each attribute is stored as a list with one entry per row; rows that
+    don't have the attribute hold `_MISSING`. Rows of nodes that were moved
+    to another table are kept as tombstones whose id is `_MISSING`.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.ids = []
+        self.columns = OrderedDict()
+
+    def _column(self, k):
+        col = self.columns.get(k)
+        if col is None:
+            col = self.columns[k] = [_MISSING]*len(self.ids)
+        return col
+
+    def extend(self, nodes, shared, columns):
+        """Append rows and return the index of the first one."""
+        n = len(nodes)
+        for k in itertools.chain(shared, columns):
+            self._column(k)
+        start = len(self.ids)
+        self.ids.extend(nodes)
+        for k, col in self.columns.items():
+            if k in columns:
+                col.extend(columns[k])
+            else:
+                col.extend([shared.get(k, _MISSING)]*n)
+        return start
+
+    def update(self, row, attrs):
+        for k, v in attrs.items():
+            self._column(k)[row] = v
+
+    def delete(self, row):
+        self.ids[row] = _MISSING
+        for col in self.columns.values():
+            col[row] = _MISSING
+
+    def row(self, row):
+        return {k: col[row] for k, col in self.columns.items() \
+                if col[row] is not _MISSING}
+
+class _FrozenDict(dict):
+    """Attribute dictionary of the read-only networkx view of a Graph."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Graph.graph is a read-only view; modify the Graph '
+                        'or a copy returned by to_networkx() instead')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        # Copies are ordinary dictionaries:
+        return (dict, (dict(self),))
+
+def _freeze(graph):
+    """Make a networkx graph and the attributes of its nodes and edges
+    read-only."""
+    nodes = graph._node if hasattr(graph, '_node') else graph.node
+    for x in nodes:
+        nodes[x] = _FrozenDict(nodes[x])
+    succ = graph._succ if hasattr(graph, '_succ') else graph.succ
+    for nbrs in succ.values():
+        # The key dictionaries are shared with the predecessors:
+        for keydict in nbrs.values():
+            for k in keydict:
+                keydict[k] = _FrozenDict(keydict[k])
+    return parsing.networkx().freeze(graph)
+
+class _NodeView(object):
+    """Read-only mapping from node ids to attribute dictionaries."""
 
-    for subclass in cls.__subclasses__():
-        all_subclasses.append(subclass)
-        all_subclasses.extend(get_all_subclasses(subclass))
+    def __init__(self, graph):
+        self._graph = graph
 
-    return all_subclasses
+    def __getitem__(self, node):
+        return self._graph._attrs(node)
+
+    def __contains__(self, node):
+        return node in self._graph
+
+    def __iter__(self):
+        return iter(self._graph._ids)
+
+    def __len__(self):
+        return len(self._graph._ids)
+
+    def items(self):
+        return [(x, self._graph._attrs(x)) for x in self._graph._ids]
 
 class Graph(object):
+    """Specification of the neurons, synapses and ports of an LPU.
+
+    The attributes of the nodes are stored in one column table per model and
+    the connections in an edge table of integer node indices, so that large
+    circuits don't require a Python dictionary per node or edge. Use
+    `to_lpu_args` to obtain the arguments of `LPU` directly, or `to_networkx`
+    for a networkx copy of the circuit (the `graph` property is a cached
+    read-only view of it).
+    """
+
     def __init__(self):
-        self.graph = nx.MultiDiGraph()
         self.modelDefaults = {}
+        self._clear()
+
+    def _clear(self):
+        self._tables = OrderedDict()
+        self._ids = []                      # node id of each node index
+        self._index = {}                    # node index of each node id
+        self._loc_table = []                # table of each node index
+        self._loc_row = array.array('l')    # row of each node index
+        self._src = array.array('l')
+        self._dst = array.array('l')
+        self._edge_attrs = {}               # edge index -> attributes
+        self._nx = None
+
+    def __contains__(self, node):
+        return node in self._index
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _node_index(self, node):
+        # Like networkx, create a node without attributes if it doesn't exist:
+        i = self._index.get(node)
+        if i is None:
+            i = self._index[node] = len(self._ids)
+            self._ids.append(node)
+            self._loc_table.append(None)
+            self._loc_row.append(-1)
+        return i
+
+    def _table(self, key):
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = _Table(key)
+        return table
+
+    def _add_node(self, node, attrs):
+        attrs = dict(attrs)
+        key = attrs.pop('class')
+        self._nx = None
+        i = self._node_index(node)
+        old = self._loc_table[i]
+        row = self._loc_row[i]
+        if old is not None and old.key == key:
+            old.update(row, attrs)
+            return
+        if old is not None:
+            # The model of an existing node changed; keep its other attributes:
+            moved = old.row(row)
+            old.delete(row)
+            moved.update(attrs)
+            attrs = moved
+        table = self._table(key)
+        self._loc_table[i] = table
+        self._loc_row[i] = table.extend([node], attrs, {})
+
+    def _add_nodes(self, nodes, shared, columns):
+        """Add nodes whose attributes are given as shared values and columns.
+
+        Nodes that already exist or that are repeated are added one at a time,
+        so that their attributes are merged as with repeated `add_neuron`
+        calls.
+        """
+        if len(set(nodes)) < len(nodes) or \
+           any(self._loc_table[self._index[x]] is not None \
+               for x in nodes if x in self._index):
+            keys = list(columns.keys())
+            for j, node in enumerate(nodes):
+                attrs = shared.copy()
+                attrs.update((k, columns[k][j]) for k in keys)
+                self._add_node(node, attrs)
+            return
+        shared = dict(shared)
+        table = self._table(shared.pop('class'))
+        self._nx = None
+        start = table.extend(nodes, shared, columns)
+        for row, node in enumerate(nodes, start):
+            i = self._node_index(node)
+            self._loc_table[i] = table
+            self._loc_row[i] = row
+
+    def _add_edge(self, u, v, attrs=None):
+        self._nx = None
+        self._src.append(self._node_index(u))
+        self._dst.append(self._node_index(v))
+        if attrs:
+            self._edge_attrs[len(self._src)-1] = dict(attrs)
+
+    def _add_edges(self, edges):
+        for e in edges:
+            self._add_edge(*e)
+
+    def _attrs(self, node):
+        i = self._index[node]
+        table = self._loc_table[i]
+        if table is None:
+            return {}
+        attrs = table.row(self._loc_row[i])
+        attrs['class'] = table.key
+        return attrs
 
-    def _str_to_model(self, model):
+    def _class(self, node):
+        table = self._loc_table[self._index[node]]
+        return None if table is None else table.key
 
-        modules = get_all_subclasses(NDComponent.NDComponent)
-        modules = {x.__name__.encode('utf-8'): x for x in modules}
-        if type(model) is str:
-            model = model.encode('utf-8')
-            if model in modules:
-                model = modules[model]
+    @property
+    def node(self):
+        """Mapping from node ids to (copies of) their attributes."""
+        return _NodeView(self)
+
+    @property
+    def graph(self):
+        """Cached networkx view of the graph; see `to_networkx`.
+
+        The view is read-only: adding nodes or edges to it or changing their
+        attributes raises an exception, since the changes would not be
+        reflected in this object.
+        """
+        if self._nx is None:
+            self._nx = _freeze(self.to_networkx())
+        return self._nx
+
+    @graph.setter
+    def graph(self, graph):
+        self._clear()
+        self.from_networkx(graph)
+
+    def to_networkx(self):
+        """Return the graph as a networkx.MultiDiGraph.
+
+        The node attributes contain the model class under 'class', as in the
+        dictionaries returned by `node`. Changes made to the returned graph
+        are not reflected in this object.
+        """
+        graph = parsing.networkx().MultiDiGraph()
+        graph.add_nodes_from((x, self._attrs(x)) for x in self._ids)
+        graph.add_edges_from((self._ids[u], self._ids[v],
+                              self._edge_attrs.get(k, {}).copy()) \
+                             for k, (u, v) in enumerate(zip(self._src, self._dst)))
+        return graph
+
+    def from_networkx(self, graph):
+        """Add the nodes and edges of a networkx graph.
+
+        The 'class' attribute of each node must be either u'Port' or a model
+        name or class.
+        """
+        for n,d in graph.nodes(data=True):
+            d = dict(d)
+            if d['class'] == u'Port':
+                self.add_port(n, **d)
             else:
+                model = d.pop('class')
+                # neuron and synapse are ambigious at this point
+                self.add_neuron(n, model, **d)
+        for u,v,d in graph.edges(data=True):
+            self._add_edge(u, v, d)
+
+    def to_lpu_args(self):
+        """Return the component and connection data consumed by `LPU`.
+
+        Returns
+        -------
+        comp_dict : dict
+            Attributes of the components of each model, in the format
+            returned by `LPU.graph_to_dicts`, keyed by model name.
+        conns : list
+            List of (pre, post, attributes) tuples of the connections.
+        """
+        comp_dict = {}
+        for key, table in self._tables.items():
+            rows = [i for i, x in enumerate(table.ids) if x is not _MISSING]
+            if not rows:
+                continue
+            dense = len(rows) == len(table.ids)
+            model = key if key == u'Port' else key.__name__
+
+            attrs = {}
+            ignored_keys = []
+            for k, col in table.columns.items():
+                col = list(col) if dense else [col[i] for i in rows]
+                if any(v is _MISSING for v in col):
+                    ignored_keys.append(k)
+                else:
+                    attrs[k] = col
+            # For visually checking if any essential parameter is dropped
+            if ignored_keys:
+                print('parameters of model {} ignored: {}'.format(model, ignored_keys))
+            if model == 'Port':
+                assert('selector' in attrs)
+
+            attrs['id'] = [table.ids[i] for i in rows]
+            comp_dict[model] = attrs
+
+        conns = [(self._ids[u], self._ids[v], dict(self._edge_attrs.get(k, ()))) \
+                 for k, (u, v) in enumerate(zip(self._src, self._dst))]
+        return comp_dict, conns
+
+    def _str_to_model(self, model):
+        if type(model) is str:
+            cls = NDComponents.get_model(model)
+            if cls is None:
                 raise TypeError("Unsupported model type %r" % model)
+            model = cls
         return model
 
     def _parse_model_kwargs(self, model, **kwargs):
@@ -79,8 +377,8 @@ class Graph(object):
         other has to be an existing node. The direction of the connection will
         be inferred from the port's 'port_io' attribute.
         """
-        x_is_port = self.graph.node[x]['class'] == u'Port'
-        y_is_port = self.graph.node[y]['class'] == u'Port'
+        x_is_port = self._class(x) == u'Port'
+        y_is_port = self._class(y) == u'Port'
 
         assert(not(x_is_port == y_is_port))
 
@@ -91,10 +389,54 @@ class Graph(object):
             port = y
             node = x
 
-        if self.graph.node[port]['port_io'] == 'out':
-            self.graph.add_edge(node, port, **kwargs)
+        if self.node[port]['port_io'] == 'out':
+            self._add_edge(node, port, kwargs)
         else:
-            self.graph.add_edge(port, node, **kwargs)
+            self._add_edge(port, node, kwargs)
+
+    def _parse_port_kwargs(self, kwargs):
+        port_io = kwargs.pop('port_io', '')
+        port_type = kwargs.pop('port_type', '')
+        port = kwargs.pop('port', '')
+
+        is_s, is_g, is_i, is_o = map(lambda x: x in port, ('s','g','i','o'))
+        assert(not(is_s and is_g))
+        assert(not(is_o and is_i))
+
+        if is_s or port_type == 's':
+            port_type = 'spike'
+        elif is_g or port_type == 'g':
+            port_type = 'gpot'
+        assert(port_type == 'gpot' or port_type == 'spike')
+
+        if is_i or port_io == 'i':
+            port_io = 'in'
+        elif is_o or port_io == 'o':
+            port_io = 'out'
+        assert(port_io == 'in' or port_io == 'out')
+        return port_type, port_io
+
+    def _broadcast_attrs(self, attrs, n):
+        """Split the attributes of `n` nodes into shared values and columns.
+
+        Values given as lists or non-scalar numpy arrays must have `n`
+        entries and are assigned elementwise; all other values are shared.
+        """
+        shared = {}
+        columns = {}
+        for k, v in attrs.items():
+            if _is_column(v):
+                if len(v) != n:
+                    raise ValueError('attribute %r has %d entries for %d nodes'
+                                     % (k, len(v), n))
+                columns[k] = v.tolist() if isinstance(v, np.ndarray) else v
+            else:
+                shared[k] = v
+        return shared, columns
+
+    def _expand(self, value, n):
+        shared, columns = self._broadcast_attrs({'v': value}, n)
+        return columns['v'] if columns else [value]*n
 
     def add_port(self, node, **kwargs):
         """Add a single port.
@@ -156,46 +498,91 @@ class Graph(object):
         selector = kwargs.pop('selector', None)
         assert(selector is not None)
 
-        port_io = kwargs.pop('port_io', '')
-        port_type = kwargs.pop('port_type', '')
-        port = kwargs.pop('port', '')
+        port_type, port_io = self._parse_port_kwargs(kwargs)
         source_or_target = kwargs.pop('source_or_target', None)
 
-        is_s, is_g, is_i, is_o = map(lambda x: x in port, ('s','g','i','o'))
-        assert(not(is_s and is_g))
-        assert(not(is_o and is_i))
-
-        if is_s or port_type == 's':
-            port_type = 'spike'
-        elif is_g or port_type == 'g':
-            port_type = 'gpot'
-        assert(port_type == 'gpot' or port_type == 'spike')
-
-        if is_i or port_io == 'i':
-            port_io = 'in'
-        elif is_o or port_io == 'o':
-            port_io = 'out'
-        assert(port_io == 'in' or port_io == 'out')
-
-        if node in self.graph:
+        if node in self:
             assert(source_or_target is None)
             source_or_target = node
             node = "%s_port" % node
 
         kwargs['class'] = u'Port'
         delay = self._get_delay(kwargs)
-        self.graph.add_node(node,
-            **kwargs,
-            port_io = port_io,
-            port_type = port_type,
-            selector = selector)
+        kwargs.update(port_io = port_io,
+                      port_type = port_type,
+                      selector = selector)
+        self._add_node(node, kwargs)
 
         if source_or_target is not None:
-            assert(source_or_target in self.graph)
+            assert(source_or_target in self)
             if port_io == 'out':
-                self.graph.add_edge(source_or_target, node)
+                self._add_edge(source_or_target, node)
             else:
-                self.graph.add_edge(node, source_or_target, **delay)
+                self._add_edge(node, source_or_target, delay)
+
+    def add_ports(self, nodes, **kwargs):
+        """Add multiple ports of the same type.
+
+        Parameters
+        ----------
+        nodes : sequence of hashable Python objects
+            Same as 'node' in `add_port`, one entry per port.
+        selector : list of strings
+            A xpath-like string for each port.
+        port_type : string
+            Either 'spike'/'s' or 'gpot'/'g'.
+        port_io : string
+            Either 'in'/'i' or 'out'/'o'.
+        port : string
+            Short notation for 'port_type' and 'port_io'.
+        source_or_target : sequence or None
+            The source or the target of each port; see `add_port`.
+
+        Examples
+        --------
+        >>> G = Graph()
+        >>> G.add_neurons(['1', '2'], 'LeakyIAF')
+        >>> G.add_ports(['1', '2'], port='so',
+        ...             selector=['/lpu/out/spike/1', '/lpu/out/spike/2'])
+
+        Notes
+        -----
+        Any other attribute given as a list or a numpy array must have one
+        entry per port and is assigned elementwise.
+        """
+        assert(kwargs.get('selector', None) is not None)
+
+        port_type, port_io = self._parse_port_kwargs(kwargs)
+        nodes = list(nodes)
+        n = len(nodes)
+        source_or_target = kwargs.pop('source_or_target', None)
+        if source_or_target is None:
+            source_or_target = [None]*n
+        assert(len(source_or_target) == n)
+
+        ports = []
+        links = []
+        for node, x in zip(nodes, source_or_target):
+            if node in self:
+                assert(x is None)
+                x = node
+                node = "%s_port" % node
+            ports.append(node)
+            links.append(x)
+
+        kwargs['class'] = u'Port'
+        delays = self._expand(kwargs.pop('delay', None), n)
+        kwargs.update(port_io = port_io, port_type = port_type)
+        self._add_nodes(ports, *self._broadcast_attrs(kwargs, n))
+
+        links = [(p, x, d) for p, x, d in zip(ports, links, delays) \
+                 if x is not None]
+        assert(all(x in self for p, x, d in links))
+        if port_io == 'out':
+            self._add_edges((x, p) for p, x, d in links)
+        else:
+            self._add_edges((p, x, {'delay': d} if d else None) \
+                            for p, x, d in links)
 
     def add_neuron(self, node, model, **kwargs):
         """Add a single neuron.
@@ -229,7 +616,42 @@ class Graph(object):
         """
         attrs = self._parse_model_kwargs(model, **kwargs)
 
-        self.graph.add_node(node, **attrs)
+        self._add_node(node, attrs)
+
+    def add_neurons(self, nodes, model, **kwargs):
+        """Add multiple neurons of the same model.
+
+        Parameters
+        ----------
+        nodes : sequence of hashable Python objects
+            Ids of the neurons.
+        model : string or submodule of NDComponent
+            Name or the Python class of a neuron model.
+        params: dict
+            Parameters of the neuron model.
+        states: dict
+            Initial values of the state variables of the neuron model.
+        kwargs:
+            Key/Value pairs of extra attributes. Key could be an attribute in
+            params or states.
+
+        Examples
+        --------
+        >>> G = Graph()
+        >>> G.add_neurons(['1', '2', '3'], 'LeakyIAF',
+        ...               threshold=np.array([-25., -30., -35.]))
+
+        Notes
+        -----
+        The model and the attribute names are validated once for the whole
+        batch. Attributes given as lists or numpy arrays must have one entry
+        per neuron and are assigned elementwise; other values are shared by
+        all the neurons.
+        """
+        nodes = list(nodes)
+        attrs = self._parse_model_kwargs(model, **kwargs)
+
+        self._add_nodes(nodes, *self._broadcast_attrs(attrs, len(nodes)))
 
     def set_model_default(self, model, **kwargs):
         model = self._str_to_model(model)
@@ -293,12 +715,67 @@ class Graph(object):
         attrs = self._parse_model_kwargs(model, **kwargs)
         delay = self._get_delay(attrs)
 
-        self.graph.add_node(node, **attrs)
+        self._add_node(node, attrs)
 
         if source:
-            self.graph.add_edge(source, node, **delay)
+            self._add_edge(source, node, delay)
         if target:
-            self.graph.add_edge(node, target)
+            self._add_edge(node, target)
+
+    def add_synapses(self, nodes, sources, targets, model, **kwargs):
+        """Add multiple synapses of the same model.
+
+        Parameters
+        ----------
+        nodes : sequence of hashable Python objects
+            Ids of the synapses.
+        sources : sequence or None
+            Pre-synaptic neuron of each synapse. The edge between a synapse
+            and its source is omitted if the source is None.
+        targets : sequence or None
+            Post-synaptic neuron of each synapse. The edge between a synapse
+            and its target is omitted if the target is None.
+        model : string or submodule of NDComponent
+            Name or the Python class of a synapse model.
+        params : dict
+            Parameters of the synapse model.
+        states : dict
+            Initial values of the state variables of the synapse model.
+        delay : float or array_like
+            Delay between pre-synaptic neuron and synapse.
+        kwargs:
+            Key/Value pairs of extra attributes. Key could be an attribute in
+            params or states.
+
+        Examples
+        --------
+        >>> G = Graph()
+        >>> G.add_neurons(['1', '2'], 'LeakyIAF')
+        >>> G.add_synapses(['1->2', '2->1'], ['1', '2'], ['2', '1'],
+        ...                'AlphaSynapse', gmax=[0.1, 0.2])
+
+        Notes
+        -----
+        Attributes given as lists or numpy arrays must have one entry per
+        synapse and are assigned elementwise; other values are shared by all
+        the synapses.
+        """
+        nodes = list(nodes)
+        n = len(nodes)
+        attrs = self._parse_model_kwargs(model, **kwargs)
+        delays = self._expand(attrs.pop('delay', None), n)
+
+        self._add_nodes(nodes, *self._broadcast_attrs(attrs, n))
+
+        if sources is not None:
+            assert(len(sources) == n)
+            self._add_edges(
+                (x, node, {'delay': d} if d else None) \
+                for node, x, d in zip(nodes, sources, delays) if x is not None)
+        if targets is not None:
+            assert(len(targets) == n)
+            self._add_edges(
+                (node, x) for node, x in zip(nodes, targets) if x is not None)
 
     def _get_delay(self, attrs):
         delay = attrs.pop('delay', None)
@@ -306,41 +783,31 @@ class Graph(object):
         return delay
 
     def write_gexf(self, filename):
-        graph = nx.MultiDiGraph()
-        for n,d in self.graph.nodes(data=True):
-            data = d.copy()
-            if data['class'] != u'Port':
-                model = data.pop('class')
-                data['class'] = model.__name__
-                print(data['class'] )
-            graph.add_node(n, **data)
-        for u,v,d in self.graph.edges(data=True):
-            data = d.copy()
-            graph.add_edge(u, v, **data)
-        nx.write_gexf(graph, filename)
+        graph = self.to_networkx()
+        for n,d in graph.nodes(data=True):
+            if d['class'] != u'Port':
+                d['class'] = d['class'].__name__
+        parsing.networkx().write_gexf(graph, filename)
 
     def read_gexf(self, filename):
-        self.graph = nx.MultiDiGraph()
-        graph = nx.read_gexf(filename)
-        for n,d in graph.nodes(data=True):
-            if d['class'].encode('utf-8') == u'Port':
-                self.add_port(n, **d)
-            else:
-                model = d.pop('class')
-                # neuron and synapse are ambigious at this point
-                self.add_neuron(n, model, **d)
-        for u,v,d in graph.edges(data=True):
-            self.graph.add_edge(u, v, **d)
+        self._clear()
+        self.from_networkx(parsing.read_gexf(filename))
+
+    def _tables_of(self, base):
+        return [t for k, t in self._tables.items() \
+                if k != u'Port' and issubclass(k, base)]
 
     @property
     def neuron(self):
-        n = {x:d for x,d in self.graph.nodes(True) if self.isneuron(d)}
+        n = {x:d for x,d in self.neurons(True)}
         return n
 
     def neurons(self, data=False):
-        n = [(x,d) for x,d in self.graph.nodes(True) if self.isneuron(d)]
-        if not data:
-            n = [x for x,d in n]
+        tables = self._tables_of((BaseAxonHillockModel.BaseAxonHillockModel,
+                                  BaseMembraneModel.BaseMembraneModel))
+        n = [x for t in tables for x in t.ids if x is not _MISSING]
+        if data:
+            n = [(x, self._attrs(x)) for x in n]
         return n
 
     def isneuron(self, n):
@@ -350,18 +817,19 @@ class Graph(object):
     @property
     def synapse(self):
         # TODO: provide pre-/post- neuron hash value
-        n = {x:d for x,d in self.graph.nodes(True) if self.issynapse(d)}
+        n = {x:d for x,d in self.synapses(True)}
         return n
 
     def synapses(self, data=False):
         # TODO: provide pre-/post- neuron hash value
-        n = [(x,d) for x,d in self.graph.nodes(True) if self.issynapse(d)]
-        if not data:
-            n = [x for x,d in n]
+        tables = self._tables_of(BaseSynapseModel.BaseSynapseModel)
+        n = [x for t in tables for x in t.ids if x is not _MISSING]
+        if data:
+            n = [(x, self._attrs(x)) for x in n]
         return n
 
     def issynapse(self, n):
-        return issubclass(n['class'], BaseSynapsekModel.BaseSynapsekModel)
+        return issubclass(n['class'], BaseSynapseModel.BaseSynapseModel)
 
 if __name__ == "__main__":
     from neurokernel.LPU.Graph import Graph
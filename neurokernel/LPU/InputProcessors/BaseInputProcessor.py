@@ -1,11 +1,7 @@
-import pycuda.driver as cuda
-import pycuda.gpuarray as garray
+from neurokernel.LPU.utils.lazy import cuda, garray, dtype_to_ctype, \
+    elementwise
 import numpy as np
 
-from neurokernel.LPU.LPU import LPU
-from pycuda.tools import dtype_to_ctype
-import pycuda.elementwise as elementwise
-
 class BaseInputProcessor(object):
     def __init__(self, var_list, mode=0):
         # var_list should be a list of (variable, uids)
@@ -26,6 +22,9 @@ class BaseInputProcessor(object):
         self.dtypes = {}
         self._d_input = {}
         self.dest_inds = {}
+        # Indices of the inputs fed to each destination if the LPU contains
+        # several replicas of a component
+        self._src_inds = {}
         
     @property
     def LPU_obj(self):
@@ -33,6 +32,8 @@ class BaseInputProcessor(object):
 
     @LPU_obj.setter
     def LPU_obj(self, value):
+        # Imported here so that processors can be created without the GPU:
+        from neurokernel.LPU.LPU import LPU
         assert(isinstance(value, LPU))
         self._LPU_obj = value
         self.dt = self._LPU_obj.dt
@@ -53,7 +54,11 @@ class BaseInputProcessor(object):
         self.input_to_be_processed = True
         self.update_input()
         for var in self.variables:
-            self._d_input[var].set(self.variables[var]['input'])
+            if var in self._src_inds:
+                self._d_input[var].set(
+                    self.variables[var]['input'][self._src_inds[var]])
+            else:
+                self._d_input[var].set(self.variables[var]['input'])
             
     def inject_input(self, var):
         if var not in self.variables: return
@@ -79,16 +84,21 @@ class BaseInputProcessor(object):
                     for var in self.variables.keys()]))
         for var, d in self.variables.items():
             v_dict =  self.memory_manager.variables[var]
-            uids = []
+            src_inds = []
             inds = []
-            for uid in d['uids']:
-                cd = self.LPU_obj.conn_dict[uid]
-                assert(var in cd)
-                pre = cd[var]['pre'][0]
-                inds.append(v_dict['uids'][pre])
+            for i, uid in enumerate(d['uids']):
+                # Inputs to a replicated component are fed to all replicas
+                for u in self.LPU_obj.replica_uids(uid):
+                    cd = self.LPU_obj.conn_dict[u]
+                    assert(var in cd)
+                    pre = cd[var]['pre'][0]
+                    inds.append(v_dict['uids'][pre])
+                    src_inds.append(i)
+            if len(src_inds) != len(d['uids']):
+                self._src_inds[var] = np.array(src_inds)
             self.dest_inds[var] = garray.to_gpu(np.array(inds,np.int32))
             self.dtypes[var] = v_dict['buffer'].dtype
-            self._d_input[var] = garray.zeros(len(d['uids']),self.dtypes[var])
+            self._d_input[var] = garray.zeros(len(inds),self.dtypes[var])
             self.variables[var]['input'] = np.zeros(len(d['uids']),
                                                     self.dtypes[var])
         self.pre_run()
@@ -99,6 +109,20 @@ class BaseInputProcessor(object):
     def post_run(self):
         pass
 
+    def get_checkpoint(self):
+        # Derived classes with additional state should extend this method
+        # and set_checkpoint
+        return {'epoch': self.epoch,
+                'input_to_be_processed': self.input_to_be_processed,
+                'input': {var: self._d_input[var].get()
+                          for var in self.variables}}
+
+    def set_checkpoint(self, state):
+        self.epoch = int(state['epoch'])
+        self.input_to_be_processed = bool(state['input_to_be_processed'])
+        for var in self.variables:
+            self._d_input[var].set(state['input'][var])
+
     def add_inds(self, src, dest, inds, dest_shift=0):
         """
         Set `dest[inds[i]+dest_shift] = src[i] for i in range(len(inds))`
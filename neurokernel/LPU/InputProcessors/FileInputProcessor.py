@@ -15,16 +15,19 @@ class FileInputProcessor(BaseInputProcessor):
         h5file.close()
 
     def pre_run(self):
+        self._open()
+        self.pointer = 0
+        self.end_of_file = False
+
+    def _open(self):
         self.h5file = h5py.File(self.filename, 'r')
         self.dsets = {}
         for var, g in self.h5file.items():
             if not isinstance(g, h5py.Group): continue
             self.dsets[var] = g.get('data')
-        self.pointer = 0
-        self.end_of_file = False
 
     def update_input(self):
-        for var, dset in self.dsets.iteritems():
+        for var, dset in self.dsets.items():
             if self.pointer+1 == dset.shape[0]: self.end_of_file=True
             self.variables[var]['input'] = dset[self.pointer,:]
             self.pointer += 1
@@ -35,3 +38,19 @@ class FileInputProcessor(BaseInputProcessor):
 
     def post_run(self):
         if not self.end_of_file: self.h5file.close()
+
+    def get_checkpoint(self):
+        state = super(FileInputProcessor, self).get_checkpoint()
+        state['pointer'] = self.pointer
+        state['end_of_file'] = self.end_of_file
+        return state
+
+    def set_checkpoint(self, state):
+        super(FileInputProcessor, self).set_checkpoint(state)
+        self.pointer = int(state['pointer'])
+        if state['end_of_file'] and not self.end_of_file:
+            self.h5file.close()
+        elif self.end_of_file and not state['end_of_file']:
+            # The file was closed when the end of the input was reached:
+            self._open()
+        self.end_of_file = bool(state['end_of_file'])
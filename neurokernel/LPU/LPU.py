@@ -4,293 +4,134 @@
 Local Processing Unit (LPU) with plugin support for various neuron/synapse models.
 """
 import collections
-import numbers
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-import pycuda.elementwise as elementwise
 
 import numpy as np
-import networkx as nx
 
 #import time
 
-import copy
-import itertools
-import numbers
-
-# Work around bug in networkx < 1.9 that causes networkx to choke on GEXF
-# files with boolean attributes that contain the strings 'True' or 'False'
-# (bug already observed in https://github.com/networkx/networkx/pull/971)
-nx.readwrite.gexf.GEXF.convert_bool['false'] = False
-nx.readwrite.gexf.GEXF.convert_bool['False'] = False
-nx.readwrite.gexf.GEXF.convert_bool['true'] = True
-nx.readwrite.gexf.GEXF.convert_bool['True'] = True
-
 from neurokernel.mixins import LoggerMixin
 from neurokernel.core_gpu import Module, CTRL_TAG, GPOT_TAG, SPIKE_TAG
-from neurokernel.tools.gpu import get_by_inds
 
 from types import *
 from collections import Counter
 
+from .utils.lazy import garray, dtype_to_ctype, cuda, elementwise
 from .utils.simpleio import *
-from .utils import parray
+from .utils import kernel_cache, parsing
+from .utils.ordering import order_components
+from .utils.timing import StepTimer
 
-from .NDComponents import *
+from . import NDComponents
 from .MemoryManager import MemoryManager
 
-import pdb
-
 PORT_IN_GPOT = 'port_in_gpot'
 PORT_IN_SPK = 'port_in_spk'
 PORT_OUT_GPOT = 'port_out_gpot'
 PORT_OUT_SPK = 'port_out_spk'
 
 class LPU(Module):
-    @staticmethod
-    def conv_legacy_graph(g):
-        """
-        Converts a gexf from legacy neurodriver format to one currently
-        supported
-        """
-
-
-        # Find maximum ID in given graph so that we can use it to create new nodes
-        # with IDs that don't overlap with those that already exist:
-        max_id = 0
-        for id in g.nodes():
-            if isinstance(id, basestring):
-                if id.isdigit():
-                    max_id = max(max_id, int(id))
-                else:
-                    raise ValueError('node id must be an integer')
-            elif isinstance(id, numbers.Integral):
-                max_id = max(max_id, id)
-            else:
-                raise ValueError('node id must be an integer')
-            gen_new_id = itertools.count(max_id+1).next
-
-        # Create LPU and interface nodes and connect the latter to the former via an
-        # Owns edge:
-        g_new = nx.MultiDiGraph()
-
-        # Transformation:
-        # 1. nonpublic neuron node -> neuron node
-        # 2. public neuron node -> neuron node with
-        #    output edge to output port
-        # 3. input port -> input port
-        # 4. synapse edge -> synapse node + 2 edges connecting
-        #    transformed original input/output nodes
-        edges_to_out_ports = [] # edges to new output port nodes:
-        for id, data in g.nodes(data=True):
-
-            # Don't clobber the original graph's data:
-            data = copy.deepcopy(data)
-
-            if 'public' in data and data['public']:
-                new_id = gen_new_id()
-                port_data = {'selector': data['selector'],
-                             'port_type': 'spike' if data['spiking'] else 'gpot',
-                             'port_io': 'out',
-                             'class': 'Port'}
-                g_new.add_node(new_id, port_data)
-                edges_to_out_ports.append((id, new_id))
-                del data['selector']
-
-            if 'model' in data:
-                if data['model'] == 'port_in_gpot':
-                    for a in data.keys():
-                        if a!='selector': del data[a]
-                    data['class'] = 'Port'
-                    data['port_type'] = 'gpot'
-                    data['port_io'] = 'in'
-                elif data['model'] == 'port_in_spk':
-                    for a in data.keys():
-                        if a!='selector': del data[a]
-                    data['class'] = 'Port'
-                    data['port_type'] = 'spike'
-                    data['port_io'] = 'in'
-                else:
-                    data['class'] = data['model']
-
-                # Don't need to several attributes that are implicit:
-                for a in ['model', 'public', 'spiking','extern']:
-                    if a in data: del data[a]
-
-                g_new.add_node(id, attr_dict=data)
-
-        # Create synapse nodes for each edge in original graph and connect them to
-        # the source/dest neuron/port nodes:
-        for from_id, to_id, data in g.edges(data=True):
-            data = copy.deepcopy(data)
-            if data['model'] == 'power_gpot_gpot':
-                data['class'] = 'PowerGPotGPot'
-            else:
-                data['class'] = data['model']
-            del data['model']
-
-            if 'id' in data: del data['id']
-
-            new_id = gen_new_id()
-            g_new.add_node(new_id, attr_dict=data)
-            g_new.add_edge(from_id, new_id, attr_dict={})
-            g_new.add_edge(new_id, to_id, attr_dict={})
-
-        # Connect output ports to the neurons that emit data through them:
-        for from_id, to_id in edges_to_out_ports:
-            g_new.add_edge(from_id, to_id, attr_dict={})
-
-        return g_new
+    """
+    Local Processing Unit.
+
+    Notes
+    -----
+    With `num_replicas` > 1, the circuit is copied `num_replicas` times (see
+    `replicate`) and all replicas are stepped by the same component kernels.
+    Only the kernels, the construction and the per-step overhead are shared:
+    the parameters, states and connection index arrays (`pre`, `npre` and
+    `cumpre`) are replicated together with the components, so their memory
+    grows linearly with the number of replicas. Inputs and relaxation inputs
+    specified for the uids of the original circuit are fed to every replica
+    (see `replica_uids`).
+    """
+
+    # The parsers live in utils.parsing so that they can be used without
+    # importing the LPU; they are kept here for backwards compatibility:
+    conv_legacy_graph = staticmethod(parsing.conv_legacy_graph)
+    graph_to_dicts = staticmethod(parsing.graph_to_dicts)
+    lpu_parser = staticmethod(parsing.lpu_parser)
+    lpu_parser_legacy = staticmethod(parsing.lpu_parser_legacy)
 
     @staticmethod
-    def graph_to_dicts(graph, uid_key=None, class_key='class'):
+    def replica_uid(uid, replica):
         """
-        Convert graph of LPU neuron/synapse data to Python data structures.
-
-        Parameters
-        ----------
-        graph : networkx.MultiDiGraph
-            NetworkX graph containing LPU data.
-
-        Returns
-        -------
-        comp_dict : dict
-            A dictionary of components of which
-            keys are model names, and
-            values are dictionaries of parameters/attributes associated
-            with the model.
-            Keys of a dictionary of parameters are the names of them,
-            and values of corresponding keys are lists of value of parameters.
-            One of the parameters is called 'id' and by default it
-            uses the id of the node in the graph.
-            If uid_keys is specified, id will use the specified parameter.
-            Therefore, comp_dict has the following structure:
-
-            comp_dict = {}
-                comp_dict[model_name_1] = {}
-                    comp_dict[model_name_1][parameter_1] = []
-                    ...
-                    comp_dict[model_name_1][parameter_N] = []
-                    comp_dict[model_name_1][id] = []
-
-                ...
-
-                comp_dict[model_name_M] = {}
-                    comp_dict[model_name_M][parameter_1] = []
-                    ...
-                    comp_dict[model_name_M][parameter_N] = []
-                    comp_dict[model_name_M][id] = []
-
-        conns : list
-            A list of edges contained in graph describing the relation
-            between components
-
-        Example
-        -------
-        TODO: Update
-
-        Notes
-        -----
-        TODO: Update
+        Return the uid of a component in a replica of a circuit.
         """
 
-        comp_dict = {}
-        comps = graph.node.items()
-
-        all_component_types = list(set([comp[class_key] for uid, comp in comps]))
-
-        for model in all_component_types:
-            sub_comps = [comp for comp in comps \
-                                   if comp[1][class_key] == model]
-
-            all_keys = [set(comp[1].keys()) for comp in sub_comps]
-            key_intersection = set.intersection(*all_keys)
-            key_union = set.union(*all_keys)
-
-            # For visually checking if any essential parameter is dropped
-            ignored_keys = list(key_union-key_intersection)
-            if ignored_keys:
-                print('parameters of model {} ignored: {}'.format(model, ignored_keys))
-
-            del all_keys
-
-            sub_comp_keys = list(key_intersection)
-
-            if model == 'Port':
-                assert('selector' in sub_comp_keys)
-
-            comp_dict[model] = {
-                k: [comp[k] for uid, comp in sub_comps] \
-                for k in sub_comp_keys if not k in [uid_key, class_key]}
-
-            comp_dict[model]['id'] = [comp[uid_key] if uid_key else uid \
-                                      for uid, comp in sub_comps]
-
-#        for id, comp in comps:
-#            model = comp[class_key]
-#
-#            # For port, make sure selector is specified
-#            if model == 'Port':
-#                assert('selector' in comp.keys())
-#
-#            # if the neuron model does not appear before, add it into n_dict
-#            if model not in comp_dict:
-#                comp_dict[model] = {k:[] for k in comp.keys() + ['id']}
-#
-#            # Same model should have the same attributes
-#            if not set(comp_dict[model].keys()) == set(comp.keys() + ['id']):
-#                raise KeyError("keys of component does not match with that of "+\
-#                               model+": "+ str(set(comp_dict[model].keys())) +
-#                               str(set(comp.keys() + ['id'])))
-#
-#            # add data to the subdictionary of comp_dict
-#            for key in comp.iterkeys():
-#                if not key==uid_key:
-#                    comp_dict[model][key].append( comp[key] )
-#            if uid_key:
-#                comp_dict[model]['id'].append(comp[uid_key])
-#            else:
-#                comp_dict[model]['id'].append( id )
-#
-#        # Remove duplicate model information:
-#        for val in comp_dict.itervalues(): val.pop(class_key)
-
-        # Extract connections
-        conns = graph.edges(data=True)
-        return comp_dict, conns
+        return '%s@%d' % (uid, replica)
 
     @staticmethod
-    def lpu_parser(filename):
+    def replicate(comp_dict, conns, num_replicas, overrides={}, uid_key='id'):
         """
-        GEXF LPU specification parser.
+        Replicate a circuit along a batch axis.
 
-        Extract LPU specification data from a GEXF file and store it in
-        Python data structures.
-        TODO: Update
+        The components and connections of the circuit are copied
+        `num_replicas` times; the uids of the copies are tagged with the
+        replica they belong to (see `replica_uid`).
 
         Parameters
         ----------
-        filename : str
-            GEXF filename.
+        comp_dict : dict
+            Components of the circuit (see `graph_to_dicts`).
+        conns : list
+            Connections of the circuit (see `graph_to_dicts`).
+        num_replicas : int
+            Number of replicas.
+        overrides : dict
+            Per-replica values of parameters or initial states, in the form
+            {model: {attribute: values}}, where `values` contains one entry
+            per replica. Each entry is either a single value for all
+            components of the model or a list with one value per component.
+        uid_key : str
+            Key of the component uids in `comp_dict`.
 
         Returns
         -------
-        TODO: Update
+        comp_dict : dict
+            Components of the replicated circuit.
+        conns : list
+            Connections of the replicated circuit.
         """
 
-        graph = nx.read_gexf(filename)
-        return LPU.graph_to_dicts(graph)
+        if 'Port' in comp_dict and comp_dict['Port'][uid_key]:
+            raise ValueError('circuits with ports cannot be replicated')
+        for model, d in overrides.items():
+            for k, values in d.items():
+                if len(values) != num_replicas:
+                    raise ValueError('%d values of %s of %s specified for %d '
+                                     'replicas' % (len(values), k, model,
+                                                   num_replicas))
 
-    @staticmethod
-    def lpu_parser_legacy(filename):
-        """
-        TODO: Update
-        """
+        new_comp_dict = comp_dict.__class__()
+        for model, attribs in comp_dict.items():
+            n = len(attribs[uid_key])
+            over = overrides.get(model, {})
+            new_attribs = {k: [] for k in set(attribs) | set(over)}
+            for r in range(num_replicas):
+                for k, v in new_attribs.items():
+                    if k == uid_key:
+                        v.extend([LPU.replica_uid(uid, r)
+                                  for uid in attribs[uid_key]])
+                    elif k in over:
+                        val = over[k][r]
+                        if isinstance(val, np.ndarray):
+                            val = val.tolist()
+                        if isinstance(val, list):
+                            assert(len(val) == n)
+                            v.extend(val)
+                        else:
+                            v.extend([val]*n)
+                    else:
+                        v.extend(attribs[k])
+            new_comp_dict[model] = new_attribs
 
-        graph = nx.read_gexf(filename)
-        return LPU.graph_to_dicts(LPU.conv_legacy_graph(graph))
+        new_conns = []
+        for r in range(num_replicas):
+            for conn in conns:
+                new_conns.append((LPU.replica_uid(conn[0], r),
+                                  LPU.replica_uid(conn[1], r)) + \
+                                 tuple(dict(d) for d in conn[2:]))
+        return new_comp_dict, new_conns
 
     @classmethod
     def extract_in_gpot(cls, comp_dict, uid_key):
@@ -436,7 +277,12 @@ class LPU(Module):
                  spike_tag=SPIKE_TAG, rank_to_id=None, routing_table=None,
                  uid_key='id', debug=False, columns=['io', 'type', 'interface'],
                  cuda_verbose=False, time_sync=False, default_dtype=np.double,
-                 control_inteface=None, id=None, extra_comps=[]):
+                 control_inteface=None, id=None, extra_comps=[],
+                 reorder=None, share_states=False, broadcast_params=False,
+                 checkpoint_in=None, checkpoint_out=None,
+                 relax_duration=0., relax_inputs={}, num_replicas=1,
+                 replica_overrides={}, timing=None, integrators={},
+                 rate_tables={}, adaptive_steps={}, substep_stats=False):
 
         LoggerMixin.__init__(self, 'LPU {}'.format(id))
 
@@ -449,6 +295,23 @@ class LPU(Module):
         self.debug = debug
         self.device = device
         self.default_dtype = default_dtype
+        self.share_states = share_states
+        self.broadcast_params = broadcast_params
+        # Checkpoint to resume from at pre_run and to save at post_run:
+        self.checkpoint_in = checkpoint_in
+        self.checkpoint_out = checkpoint_out
+        # Constant inputs ({variable: value or {uid: value}}) under which
+        # component states are relaxed to their resting values before the
+        # simulation, and duration of the warm-up of the components that do
+        # not rest (see NDComponent.relax):
+        self.relax_steps = int(round(relax_duration/dt))
+        self.relax_inputs = relax_inputs
+        # Time the sections of each step with the specified clock ('cuda' or
+        # 'wall') if requested:
+        self.timer = StepTimer(timing) if timing else None
+        # Record the substeps taken by the components with adaptive substeps
+        # (see get_substep_stats):
+        self.substep_stats = substep_stats
         self.control_inteface = control_inteface
         if cuda_verbose:
             self.compile_options = ['--ptxas-options=-v']
@@ -466,8 +329,27 @@ class LPU(Module):
         self.gen_uids = []
         self.uid_key = uid_key
 
-        # Load all NDComponents:
-        self._load_components(extra_comps=extra_comps)
+        # Run several copies of the circuit (e.g., for parameter sweeps) in
+        # the same set of component updates:
+        self.num_replicas = num_replicas
+        if num_replicas > 1:
+            comp_dict, conn_list = self.replicate(comp_dict, conn_list,
+                                                  num_replicas,
+                                                  replica_overrides, uid_key)
+
+        # Load the NDComponents used by the circuit; aggregators may be
+        # inserted below. Models listed in `integrators` ({model:
+        # integrator}) use the specified integrator instead of their
+        # default one (see NDComponent.with_integrator), and models listed
+        # in `rate_tables` ({model: step}) tabulate their rate functions
+        # (see NDComponent.with_tables). Components of the models listed in
+        # `adaptive_steps` ({model: tolerance scale}) choose their number of
+        # substeps (see NDComponent.with_adaptive_steps):
+        self._load_components(list(comp_dict)+['Aggregator'],
+                              extra_comps=extra_comps,
+                              integrators=integrators,
+                              rate_tables=rate_tables,
+                              adaptive_steps=adaptive_steps)
 
         # Ignore models without implementation
         models_to_be_deleted = []
@@ -710,9 +592,19 @@ class LPU(Module):
 
         #print self.LPU_id, "step 4:", time.time()-start
 
-        # Optimize ordering (TODO)
+        # Optimize ordering of components within each model to make the
+        # gathers of presynaptic data more contiguous (see
+        # utils.ordering.order_components for the available methods):
         self.uid_ind_map = {m:{uid:i for i,uid in enumerate(n[uid_key])}
                             for m,n in comp_dict.items() if not m=='Input'}
+        if reorder:
+            comps = collections.OrderedDict(
+                (m, n[uid_key]) for m, n in comp_dict.items() \
+                if m not in ['Port', 'Input'])
+            pres = {uid: [p for d in v.values() for p in d['pre']] \
+                    for uid, v in self.conn_dict.items()}
+            for m, uids in order_components(comps, pres, reorder).items():
+                self.uid_ind_map[m] = {uid:i for i,uid in enumerate(uids)}
 
         if 'Input' in comp_dict:
             self.uid_ind_map['Input'] = {var:{uid:i for i, uid in enumerate(d[uid_key])}
@@ -861,6 +753,18 @@ class LPU(Module):
         self.out_spk_inds = np.array(self.pm['spike'].ports_to_inds(\
                                     ','.join(self.sel_out_spk)), dtype=np.int32)
 
+    def replica_uids(self, uid):
+        """
+        Return the uids of the replicas of a component.
+
+        Uids that already refer to a component (including those of
+        individual replicas) are returned unchanged.
+        """
+
+        if self.num_replicas == 1 or uid in self.uid_model_map:
+            return [uid]
+        return [self.replica_uid(uid, r) for r in range(self.num_replicas)]
+
     def generate_uid(self, input=False):
         if input:
             uid = 'input_' + str(np.random.randint(100000))
@@ -881,15 +785,22 @@ class LPU(Module):
         self.init_variable_memory()
         #print self.LPU_id, "step 7:", time.time()-start
         self.process_connections()
+        if self.share_states:
+            self.find_state_classes()
         #print self.LPU_id, "step 8:", time.time()-start
         self.init_parameters()
         #print self.LPU_id, "step 9:", time.time()-start
 
         self.components = {}
-        # Instantiate components
+        # Instantiate components; their kernels are compiled in parallel:
+        with kernel_cache.get_cache().deferred():
+            for model in self.models:
+                if model in ['Port','Input']: continue
+                self.components[model] = self._instantiate_component(model)
         for model in self.models:
             if model in ['Port','Input']: continue
-            self.components[model] = self._instantiate_component(model)
+            self.components[model].timer = self.timer
+            self.components[model].record_substeps = self.substep_stats
             update_pointers = {}
             for var in self._comps[model]['updates']:
                 buff = self.memory_manager.get_buffer(var)
@@ -898,6 +809,8 @@ class LPU(Module):
                 update_pointers[var] = int(buff.gpudata)+(buff.current*buff.ld+\
                                             shift)*buff.dtype.itemsize
             self.components[model].pre_run(update_pointers)
+            if self.relax_steps and not self.checkpoint_in:
+                self._relax_component(model, update_pointers)
             for var in self._comps[model]['updates']:
                 buff = self.memory_manager.get_buffer(var)
                 mind = self.memory_manager.variables[var]['models'].index(model)
@@ -927,6 +840,39 @@ class LPU(Module):
 
         if self.control_inteface: self.control_inteface.register(self)
 
+        if self.checkpoint_in:
+            self.load_checkpoint(self.checkpoint_in)
+
+    def _relax_component(self, model, update_pointers):
+        """
+        Relax the states of a model under the constant inputs in
+        `relax_inputs` (see `NDComponent.relax`).
+        """
+        uids = self.comp_list[self.models[model]][1][self.uid_key]
+        inputs = {}
+        for var in self._comps[model]['accesses']:
+            if not var in self.relax_inputs: continue
+            v = self.relax_inputs[var]
+            if isinstance(v, dict):
+                # Inputs to a replicated component are fed to all replicas:
+                values = {}
+                for uid, value in v.iteritems():
+                    for u in self.replica_uids(uid):
+                        values[u] = value
+                inputs[var] = np.array([values.get(uid, 0) for uid in uids])
+            else:
+                inputs[var] = np.full(len(uids), v)
+        rest = self.components[model].relax(update_pointers, inputs,
+                                            self.relax_steps)
+
+        # Spikes emitted while relaxing must not be seen as initial spikes
+        # when the buffer is replicated:
+        if 'spike_state' in update_pointers:
+            cuda.memset_d32(update_pointers['spike_state'], 0, len(uids))
+        self.log_info('Relaxed %d of %d components of %s to their resting '
+                      'states, warmed up the others for %d steps' %
+                      (rest.sum(), len(uids), model, self.relax_steps))
+
     # TODO: optimize the order of self.out_port_conns beforehand
     def _setup_output_ports(self):
         self.out_port_inds_gpot = {}
@@ -1022,11 +968,18 @@ class LPU(Module):
                 nn_rest = {k:v for k, v in nn.iteritems() if (
                            (not isinstance(v, list)) or (len(v) and
                            type(v[0]) not in [int, long, bool]))}
+                # store parameters that are constant over all components of
+                # the model as a single value if the model supports it
+                cls = self._comps[m]['cls']
+                broadcast = list(cls.params) if self.broadcast_params and \
+                            cls.supports_broadcast_params else []
                 if nn_int:
-                    self.memory_manager.params_htod(m, nn_int, np.int32)
+                    self.memory_manager.params_htod(m, nn_int, np.int32,
+                                                    broadcast)
                 if nn_rest:
                     self.memory_manager.params_htod(m, nn_rest,
-                                                    self.default_dtype)
+                                                    self.default_dtype,
+                                                    broadcast)
 
     def init_variable_memory(self):
         var_info = {}
@@ -1103,7 +1056,140 @@ class LPU(Module):
             attribs['npre'] = npre
             attribs['conn_data'] = data
 
+    def find_state_classes(self):
+        """
+        Group components whose states evolve identically.
+
+        For models that declare `shared_state_params`, components with the
+        same inputs, connection data, values of these parameters and initial
+        states integrate identical trajectories. The class of each component
+        is stored in the 'state_class' attribute and the index of one
+        representative component per class in 'state_rep', so that the model
+        keeps a single copy of the states per class.
+        """
+        for (model, attribs) in self.comp_list:
+            if model in ['Port','Input']: continue
+            cls = self._comps[model]['cls']
+            if cls.shared_state_params is None: continue
+            keys = [k for k in list(cls.shared_state_params)+list(cls.states)
+                    if k in attribs]
+            classes = {}
+            state_class = []
+            state_rep = []
+            for i in range(len(attribs[self.uid_key])):
+                key = [tuple(attribs[k][i] for k in keys)]
+                for var in self._comps[model]['accesses']:
+                    s = slice(attribs['cumpre'][var][i],
+                              attribs['cumpre'][var][i+1])
+                    key.append(tuple(attribs['pre'][var][s]))
+                    for k, d in sorted(attribs['conn_data'][var].items()):
+                        key.append((k, tuple(d[s])))
+                key = tuple(key)
+                if key not in classes:
+                    classes[key] = len(state_rep)
+                    state_rep.append(i)
+                state_class.append(classes[key])
+            if len(state_rep) == len(state_class): continue
+            attribs['state_class'] = state_class
+            attribs['state_rep'] = state_rep
+            self.log_info('%s: %d components share %d states' % \
+                          (model, len(state_class), len(state_rep)))
+
+    def save_checkpoint(self, filename):
+        """
+        Save the state of the simulation to an HDF5 file.
+
+        The checkpoint contains the time, the contents and current position
+        of every variable buffer (including the delay history), the states
+        of all components, and the states of the input and output
+        processors. Each buffer and state is written as a single contiguous
+        dataset.
+
+        Parameters
+        ----------
+        filename : str
+            HDF5 file to write.
+        """
+
+        state = {'time': self.time,
+                 'variables': {var: self.memory_manager.get_buffer(var).\
+                               get_checkpoint()
+                               for var in self.memory_manager.variables},
+                 'components': {model: comp.get_checkpoint()
+                                for model, comp in self.components.items()},
+                 'input_processors': {str(i): p.get_checkpoint()
+                                      for i, p in enumerate(self.input_processors)},
+                 'output_processors': {str(i): p.get_checkpoint()
+                                       for i, p in enumerate(self.output_processors)}}
+        write_dict(state, filename)
+
+    def load_checkpoint(self, filename):
+        """
+        Restore the state of the simulation from an HDF5 file.
+
+        The LPU must have been constructed with the same circuit and
+        processors as the one that saved the checkpoint. If called before
+        `pre_run`, the checkpoint is loaded at the end of `pre_run`.
+
+        Parameters
+        ----------
+        filename : str
+            HDF5 file written by `save_checkpoint`.
+        """
+
+        if not hasattr(self, 'components'):
+            self.checkpoint_in = filename
+            return
+
+        state = read_dict(filename)
+        if set(state['variables']) != set(self.memory_manager.variables) or \
+           set(state['components']) != set(self.components) or \
+           len(state['input_processors']) != len(self.input_processors) or \
+           len(state['output_processors']) != len(self.output_processors):
+            raise ValueError('checkpoint %s does not match LPU %s' % \
+                             (filename, self.LPU_id))
+        self.time = float(state['time'])
+        for var, d in state['variables'].items():
+            self.memory_manager.get_buffer(var).set_checkpoint(d)
+        for model, d in state['components'].items():
+            self.components[model].set_checkpoint(d)
+        for i, p in enumerate(self.input_processors):
+            p.set_checkpoint(state['input_processors'][str(i)])
+        for i, p in enumerate(self.output_processors):
+            p.set_checkpoint(state['output_processors'][str(i)])
+        self.log_info('Resumed from checkpoint %s at time %s' % \
+                      (filename, self.time))
+
+    def get_timings(self):
+        """
+        Return the timing statistics of the sections of a step.
+
+        See `utils.timing.StepTimer.get_timings`; empty if timing is not
+        enabled.
+        """
+
+        return self.timer.get_timings() if self.timer else {}
+
+    def get_substep_stats(self):
+        """
+        Return the statistics of the substeps taken by the components with
+        adaptive substeps.
+
+        See `NDComponent.get_substep_stats`; empty if `substep_stats` is not
+        enabled.
+        """
+
+        if not self.substep_stats:
+            return {}
+        return {model: comp.get_substep_stats()
+                for model, comp in self.components.items()
+                if comp.adaptive_steps}
+
     def post_run(self):
+        if self.checkpoint_out:
+            self.save_checkpoint(self.checkpoint_out)
+        if self.timer and self.timer.steps:
+            self.log_info('Step timings:\n' + self.timer.summary())
         super(LPU, self).post_run()
         for comp in self.components.values():
             comp.post_run()
@@ -1112,15 +1198,19 @@ class LPU(Module):
         for p in self.output_processors: p.post_run()
 
     def run_step(self):
-        super(LPU, self).run_step()
+        timer = self.timer
+        if timer: timer.start_step()
 
+        super(LPU, self).run_step()
+        if timer: timer.mark('communication')
 
         # Update input ports
         self._read_LPU_input()
-
+        if timer: timer.mark('read_ports')
 
         # Fetch updated input if available from all input processors
         for p in self.input_processors: p.run_step()
+        if timer: timer.mark('input_processors')
 
         for model in self.exec_order:
             if model in self.model_var_inj:
@@ -1129,6 +1219,7 @@ class LPU(Module):
                     self.memory_manager.fill_zeros(model='Input', variable=var)
                     for p in self.input_processors:
                         p.inject_input(var)
+                if timer: timer.mark('%s/inject_input' % model)
 
         # Call run_step of components
         for model in self.exec_order:
@@ -1145,17 +1236,23 @@ class LPU(Module):
                                        (buffer_current_plus_one*buff.ld+\
                                         shift)*buff.dtype.itemsize
             self.components[model].run_step(update_pointers)
+            if timer: timer.mark('%s/update' % model)
 
         # Process output processors
         for p in self.output_processors: p.run_step()
+        if timer: timer.mark('output_processors')
 
         # Check for transforms
 
         # Update output ports
         self._extract_output()
+        if timer: timer.mark('extract_output')
 
         # Step through buffers
         self.memory_manager.step()
+        if timer:
+            timer.mark('memory_step')
+            timer.end_step()
 
         self.time += self.dt
 
@@ -1248,15 +1345,23 @@ class LPU(Module):
                    cuda_verbose=bool(self.compile_options))
 
 
-    def _load_components(self, extra_comps=[]):
+    def _load_components(self, models, extra_comps=[], integrators={},
+                         rate_tables={}, adaptive_steps={}):
         """
-        Load all available NDcomponents
+        Load the NDComponents implementing the given models
         """
-        child_classes = NDComponent.NDComponent.__subclasses__()
-        comp_classes = child_classes[:]
-        for cls in child_classes:
-            comp_classes.extend(cls.__subclasses__())
+        comp_classes = [NDComponents.get_model(model) for model in models]
+        comp_classes = [cls for cls in comp_classes if cls is not None]
         comp_classes.extend(extra_comps)
+        comp_classes = [cls.with_integrator(integrators[cls.__name__])
+                        if cls.__name__ in integrators else cls
+                        for cls in comp_classes]
+        comp_classes = [cls.with_tables(rate_tables[cls.__name__])
+                        if cls.__name__ in rate_tables else cls
+                        for cls in comp_classes]
+        comp_classes = [cls.with_adaptive_steps(adaptive_steps[cls.__name__])
+                        if cls.__name__ in adaptive_steps else cls
+                        for cls in comp_classes]
         self._comps = {cls.__name__:{'accesses': cls.accesses ,
                                      'updates':cls.updates,
                                      'cls':cls} \
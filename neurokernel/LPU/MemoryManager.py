@@ -1,7 +1,6 @@
-from .utils import parray
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.elementwise as elementwise
+from neurokernel.LPU.utils.lazy import lazy_import, garray, dtype_to_ctype, \
+    elementwise
+parray = lazy_import('neurokernel.LPU.utils.parray')
 
 import numpy as np
 import numbers
@@ -74,7 +73,23 @@ class MemoryManager(object):
                             CircularArray(size, buffer_length, dtype, init)}
         self.variables[variable_name].update(info)
 
-    def params_htod(self, model_name, param_dict, dtype=np.double):
+    def params_htod(self, model_name, param_dict, dtype=np.double,
+                    broadcast=[]):
+        """
+        Transfer the parameters of a model to the GPU.
+
+        Parameters
+        ----------
+        model_name : str
+            Name of the model.
+        param_dict : dict
+            Values of each parameter for all components of the model.
+        dtype : numpy.dtype
+            Data type of the parameters.
+        broadcast : list
+            Parameters that are stored as a single value if they have the same
+            value for all components.
+        """
         if model_name in self.parameters:
             assert(not (set(self.parameters[model_name].keys()) &
                         set(param_dict.keys())))
@@ -100,7 +115,10 @@ class MemoryManager(object):
                             cd[var][d_key] = garray.to_gpu(np.array(d, dtype))
                 self.parameters[model_name]['conn_data'] = cd
             if not all([isinstance(i,numbers.Number) for i in v]): continue
-            self.parameters[model_name][k] = garray.to_gpu(np.array(v, dtype))
+            v = np.array(v, dtype)
+            if k in broadcast and v.size > 1 and np.all(v == v[0]):
+                v = v[:1]
+            self.parameters[model_name][k] = garray.to_gpu(v)
 
     def step(self):
         for d in self.variables.values():
@@ -191,3 +209,21 @@ class CircularArray(object):
             self.current += 1
             if self.current >= self.buffer_length:
                 self.current = 0
+
+    def get_checkpoint(self):
+        """
+        Return the contents of the buffer and the current position.
+        """
+
+        return {'buffer': self.parr.get(), 'current': self.current}
+
+    def set_checkpoint(self, state):
+        """
+        Restore the contents of the buffer and the current position.
+        """
+
+        if state['buffer'].shape != self.parr.shape:
+            raise ValueError('buffer shape %s does not match %s' % \
+                             (state['buffer'].shape, self.parr.shape))
+        self.parr.set(np.ascontiguousarray(state['buffer'], self.dtype))
+        self.current = int(state['current'])
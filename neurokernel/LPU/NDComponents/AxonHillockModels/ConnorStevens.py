@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseAxonHillockModel import BaseAxonHillockModel
 
 class ConnorStevens(BaseAxonHillockModel):
@@ -25,151 +20,58 @@ class ConnorStevens(BaseAxonHillockModel):
         ('Vprev2', 'V')  # same as V
     ])
     max_dt = 1e-5
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-
-#define		E_K		-72.
-#define		E_Na		55.
-#define		E_a		-75.
-#define		E_l		-17.
-#define		G_total		67.7
-#define		G_a		47.7
-#define		G_Na		120.
-#define		G_K		(G_total-G_a)
-#define		G_l		0.3
-#define		ms		-5.3
-#define		hs		-12.
-#define		ns		-4.3
-
-__global__ void update(
-    INTTYPE num_comps,
-    FLOATTYPE dt,
-    INTTYPE nsteps,
-    FLOATTYPE *g_I,
-    FLOATTYPE *g_n,
-    FLOATTYPE *g_m,
-    FLOATTYPE *g_h,
-    FLOATTYPE *g_a,
-    FLOATTYPE *g_b,
-    FLOATTYPE *g_internalV,
-    FLOATTYPE *g_internalVprev1,
-    FLOATTYPE *g_internalVprev2,
-    INTTYPE *g_spike_state,
-    FLOATTYPE *g_V)
-{
-	int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V, Vprev1, Vprev2;
-    FLOATTYPE I;
-    INTTYPE spike;
-
-    FLOATTYPE n, a_n, b_n, n_inf, tau_n;
-    FLOATTYPE m, a_m, b_m, m_inf, tau_m;
-    FLOATTYPE h, a_h, b_h, h_inf, tau_h;
-    FLOATTYPE a, a_inf, tau_a;
-    FLOATTYPE b, b_inf, tau_b;
-
-
-    for(int i = tid; i < num_comps; i += total_threads) {
-        spike = 0;
-        I = g_I[i];
-        n = g_n[i];
-        m = g_m[i];
-        h = g_h[i];
-        a = g_a[i];
-        b = g_b[i];
-        V = g_internalV[i];
-        Vprev1 = g_internalVprev1[i];
-        Vprev2 = g_internalVprev2[i];
-
-        for (int j = 0; j < nsteps; ++j) {
-            /*
-             * Hodgkin-Huxley with shifts - 3.8 is temperature factor
-             */
-            a_m = -.1*(V+35+ms)/(EXP(-(V+35+ms)/10)-1);
-            b_m = 4*EXP(-(V+60+ms)/18);
-            m_inf = a_m/(a_m+b_m);
-            tau_m = 1/(3.8*(a_m+b_m));
-
-            a_h = .07*EXP(-(V+60+hs)/20);
-            b_h = 1/(1+EXP(-(V+30+hs)/10));
-            h_inf = a_h/(a_h+b_h);
-            tau_h = 1/(3.8*(a_h+b_h));
-
-            a_n = -.01*(V+50+ns)/(EXP(-(V+50+ns)/10)-1);
-            b_n = .125*EXP(-(V+60+ns)/80);
-            n_inf = a_n/(a_n+b_n);
-            tau_n = 2/(3.8*(a_n+b_n));
-
-            a_inf = POW(.0761*EXP((V+94.22)/31.84)/(1+EXP((V+1.17)/28.93)),.3333);
-            tau_a = .3632+1.158/(1+EXP((V+55.96)/20.12));
-            b_inf = POW(1/(1+EXP((V+53.3)/14.54)),4);
-            tau_b = 1.24+2.678/(1+EXP((V+50)/16.027));
-
-            V += dt*(I-G_l*(V-E_l)-G_Na*h*m*m*m*(V-E_Na)-G_K*n*n*n*n*(V-E_K)-G_a*b*a*a*a*(V-E_a));
-            m += dt*(m_inf-m)/tau_m;
-            h += dt*(h_inf-h)/tau_h;
-            n += dt*(n_inf-n)/tau_n;
-            a += dt*(a_inf-a)/tau_a;
-            b += dt*(b_inf-b)/tau_b;
-
-            spike += (Vprev2<=Vprev1) && (Vprev1 >= V) && (Vprev1 > -30);
-
-            Vprev2 = Vprev1;
-            Vprev1 = V;
-
-        }
-        g_n[i] = n;
-        g_m[i] = m;
-        g_h[i] = h;
-        g_a[i] = a;
-        g_b[i] = b;
-        g_V[i] = V;
-        g_internalV[i] = V;
-        g_internalVprev1[i] = Vprev1;
-        g_internalVprev2[i] = Vprev2;
-        g_spike_state[i] = (spike > 0);
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    # Exponential Euler keeps the spike times of forward Euler at max_dt
+    # with 4 substeps rather than 10:
+    integrator_max_dt = {'exponential': 2.5e-5}
+    # The rate functions can be tabulated over this range (see with_tables):
+    table_range = {'V': (-100., 100.)}
+    equations = """
+# Hodgkin-Huxley with shifts - 3.8 is temperature factor
+u = exp(-(V+29.7)/10.)-1.
+alpha_m = 1. if abs(u) <= 1e-7 else -0.1*(V+29.7)/u
+beta_m = 4.*exp(-(V+54.7)/18.)
+m_inf = alpha_m/(alpha_m+beta_m)
+tau_m = 1./(3.8*(alpha_m+beta_m))
+
+alpha_h = 0.07*exp(-(V+48.)/20.)
+beta_h = 1./(1.+exp(-(V+18.)/10.))
+h_inf = alpha_h/(alpha_h+beta_h)
+tau_h = 1./(3.8*(alpha_h+beta_h))
+
+u = exp(-(V+45.7)/10.)-1.
+alpha_n = 0.1 if abs(u) <= 1e-7 else -0.01*(V+45.7)/u
+beta_n = 0.125*exp(-(V+55.7)/80.)
+n_inf = alpha_n/(alpha_n+beta_n)
+tau_n = 2./(3.8*(alpha_n+beta_n))
+
+# A-current
+a_inf = (0.0761*exp((V+94.22)/31.84)/(1.+exp((V+1.17)/28.93)))**0.3333
+tau_a = 0.3632+1.158/(1.+exp((V+55.96)/20.12))
+b_inf = (1./(1.+exp((V+53.3)/14.54)))**4
+tau_b = 1.24+2.678/(1.+exp((V+50.)/16.027))
+
+dm = (m_inf-m)/tau_m
+dh = (h_inf-h)/tau_h
+dn = (n_inf-n)/tau_n
+da = (a_inf-a)/tau_a
+db = (b_inf-b)/tau_b
+dV = (I - 0.3*(V+17.) - 120.*m**3*h*(V-55.) - 20.*n**4*(V+72.) -
+      47.7*a**3*b*(V+75.))
+
+m = integrate(m, dm)
+h = integrate(h, dh)
+n = integrate(n, dn)
+a = integrate(a, da)
+b = integrate(b, db)
+V = integrate(V, dV)
+
+spike_state = spike_state or (Vprev2 <= Vprev1 and Vprev1 >= V and
+                              Vprev1 > -30)
+Vprev2 = Vprev1
+Vprev1 = V
 """
 
-    def run_step(self, update_pointers, st=None):
-        for k in self.inputs:
-            self.sum_in_variable(k, self.inputs[k], st=st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, 1000.*self.dt, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params]+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("update")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*self.num_garray)
-        func.block = (128,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 128 + 1), 1)
-        return func
-
-
 
 if __name__ == '__main__':
     import argparse
@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseAxonHillockModel import BaseAxonHillockModel
 
 class HodgkinHuxley(BaseAxonHillockModel):
@@ -23,120 +18,40 @@ class HodgkinHuxley(BaseAxonHillockModel):
         ('Vprev2', 'V')  # same as V
     ])
     max_dt = 1e-5
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-
-__global__ void update(
-    int num_comps,
-    FLOATTYPE dt,
-    int nsteps,
-    FLOATTYPE* g_I,
-    FLOATTYPE* g_n,
-    FLOATTYPE* g_m,
-    FLOATTYPE* g_h,
-    FLOATTYPE* g_internalV,
-    FLOATTYPE *g_internalVprev1,
-    FLOATTYPE *g_internalVprev2,
-    INTTYPE* g_spike_state,
-    FLOATTYPE* g_V)
-{
-    int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V, Vprev1, Vprev2, dV;
-    FLOATTYPE I;
-    INTTYPE spike;
-    FLOATTYPE n, dn;
-    FLOATTYPE m, dm;
-    FLOATTYPE h, dh;
-    FLOATTYPE a;
-
-    for(int i = tid; i < num_comps; i += total_threads)
-    {
-        spike = 0;
-        V = g_internalV[i];
-        Vprev1 = g_internalVprev1[i];
-        Vprev2 = g_internalVprev2[i];
-        I = g_I[i];
-        n = g_n[i];
-        m = g_m[i];
-        h = g_h[i];
-
-        for (int j = 0; j < nsteps; ++j)
-        {
-            a = exp(-(V+55)/10)-1;
-            if (abs(a) <= 1e-7)
-                dn = (1.-n) * 0.1 - n * (0.125*EXP(-(V+65.)/80.));
-            else
-                dn = (1.-n) * (-0.01*(V+55.)/a) - n * (0.125*EXP(-(V+65)/80));
-
-            a = exp(-(V+40.)/10.)-1.;
-            if (abs(a) <= 1e-7)
-                dm = (1.-m) - m*(4*EXP(-(V+65)/18));
-            else
-                dm = (1.-m) * (-0.1*(V+40.)/a) - m * (4.*EXP(-(V+65.)/18.));
-
-            dh = (1.-h) * (0.07*EXP(-(V+65.)/20.)) - h / (EXP(-(V+35.)/10.)+1.);
-
-            dV = I - 120.*POW(m,3)*h*(V-50.) - 36. * POW(n,4) * (V+77.) - 0.3 * (V+54.387);
-
-            n += dt * dn;
-            m += dt * dm;
-            h += dt * dh;
-            V += dt * dV;
-
-            spike += (Vprev2<=Vprev1) && (Vprev1 >= V) && (Vprev1 > -30);
-
-            Vprev2 = Vprev1;
-            Vprev1 = V;
-        }
-
-        g_n[i] = n;
-        g_m[i] = m;
-        g_h[i] = h;
-        g_V[i] = V;
-        g_internalV[i] = V;
-        g_internalVprev1[i] = Vprev1;
-        g_internalVprev2[i] = Vprev2;
-        g_spike_state[i] = (spike > 0);
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    # Exponential Euler is stable at the time step of the simulation:
+    integrator_max_dt = {'exponential': 1e-4}
+    # The rate functions can be tabulated over this range (see with_tables):
+    table_range = {'V': (-100., 100.)}
+    # Changes per substep that keep the accuracy of max_dt with adaptive
+    # substeps (see with_adaptive_steps):
+    adaptive_tolerance = {'V': 0.02, 'n': 4e-4, 'm': 4e-4, 'h': 4e-4}
+    equations = """
+a = exp(-(V+55.)/10.)-1.
+alpha_n = 0.1 if abs(a) <= 1e-7 else -0.01*(V+55.)/a
+beta_n = 0.125*exp(-(V+65.)/80.)
+a = exp(-(V+40.)/10.)-1.
+alpha_m = 1. if abs(a) <= 1e-7 else -0.1*(V+40.)/a
+beta_m = 4.*exp(-(V+65.)/18.)
+alpha_h = 0.07*exp(-(V+65.)/20.)
+beta_h = 1./(exp(-(V+35.)/10.)+1.)
+
+dn = (1.-n)*alpha_n - n*beta_n
+dm = (1.-m)*alpha_m - m*beta_m
+dh = (1.-h)*alpha_h - h*beta_h
+dV = I - 120.*m**3*h*(V-50.) - 36.*n**4*(V+77.) - 0.3*(V+54.387)
+
+n = integrate(n, dn)
+m = integrate(m, dm)
+h = integrate(h, dh)
+V = integrate(V, dV)
+
+spike_state = spike_state or (Vprev2 <= Vprev1 and Vprev1 >= V and
+                              Vprev1 > -30)
+Vprev2 = Vprev1
+Vprev1 = V
 """
 
-    def run_step(self, update_pointers, st=None):
-        for k in self.inputs:
-            self.sum_in_variable(k, self.inputs[k], st=st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, 1000.*self.dt, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params]+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("update")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*self.num_garray)
-        func.block = (128,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 128 + 1), 1)
-        return func
 
 if __name__ == '__main__':
     import argparse
@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseAxonHillockModel import BaseAxonHillockModel
 
 class LeakyIAF(BaseAxonHillockModel):
@@ -20,97 +15,17 @@ class LeakyIAF(BaseAxonHillockModel):
         ('reset_potential', -65.),
         ('capacitance', 0.065),
         ('resistance', 1000.)])
+    supports_broadcast_params = True
     max_dt = 1e-4
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-#
-__global__ void update(
-    int num_comps,
-    FLOATTYPE dt, int nsteps,
-    FLOATTYPE *g_I,
-    FLOATTYPE *g_resting_potential,
-    FLOATTYPE *g_threshold,
-    FLOATTYPE *g_reset_potential,
-    FLOATTYPE *g_capacitance,
-    FLOATTYPE *g_resistance,
-    FLOATTYPE *g_internalV,
-    INTTYPE *g_spike_state,
-    FLOATTYPE *g_V)
-{
-    int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V;
-    FLOATTYPE I;
-    INTTYPE spike;
-    FLOATTYPE resting_potential;
-    FLOATTYPE threshold;
-    FLOATTYPE reset_potential;
-    FLOATTYPE capacitance;
-    FLOATTYPE resistance;
-    FLOATTYPE bh;
-
-    for(int i = tid; i < num_comps; i += total_threads)
-    {
-        V = g_internalV[i];
-        I = g_I[i];
-        capacitance = g_capacitance[i];
-        resting_potential = g_resting_potential[i];
-        threshold = g_threshold[i];
-        resistance = g_resistance[i];
-        reset_potential = g_reset_potential[i];
-
-        bh = EXP(-dt/(capacitance*resistance));
-        V = V*bh + (resistance*I+resting_potential)*(1.0 - bh);
-        spike = 0;
-        if (V >= threshold) {
-            V = reset_potential;
-            spike = 1;
-        }
-
-        g_V[i] = V;
-        g_internalV[i] = V;
-        g_spike_state[i] = spike;
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    equations = """
+bh = exp(-dt/(capacitance*resistance))
+V = V*bh + (resistance*I+resting_potential)*(1.0-bh)
+spike = V >= threshold
+V = reset_potential if spike else V
+spike_state = spike_state or spike
 """
 
-    def run_step(self, update_pointers, st=None):
-        for k in self.inputs:
-            self.sum_in_variable(k, self.inputs[k], st=st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, 1000.*self.dt, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params]+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("update")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*self.num_garray)
-        func.block = (256,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 256 + 1), 1)
-        return func
-
-
 
 if __name__ == '__main__':
     import argparse
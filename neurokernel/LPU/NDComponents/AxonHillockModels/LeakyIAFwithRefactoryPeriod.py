@@ -2,12 +2,9 @@
 from collections import OrderedDict
 
 import numpy as np
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
+from neurokernel.LPU.utils.lazy import garray, dtype_to_ctype, cuda, \
+    SourceModule
 
-from neurokernel.LPU.utils.simpleio import *
 from .BaseAxonHillockModel import BaseAxonHillockModel
 
 class LeakyIAFwithRefactoryPeriod(BaseAxonHillockModel):
@@ -22,7 +19,12 @@ class LeakyIAFwithRefactoryPeriod(BaseAxonHillockModel):
         ('refractory_period', 0.0),
         ('time_constant', 16.0),
         ('bias_current', 0.0)])
+    supports_broadcast_params = True
     max_dt = 1e-4
+    time_scale = 1000. # the kernel works in ms
+    derived_params = OrderedDict([
+        ('bh', 'exp(-dt/time_constant)'),
+        ('input_resistance', 'time_constant/capacitance')])
 
     cuda_src = """
 # if (defined(USE_DOUBLE))
@@ -43,6 +45,8 @@ class LeakyIAFwithRefactoryPeriod(BaseAxonHillockModel):
 #     define INTTYPE int
 # endif
 #
+# define PARAM_INDEX(name, i) ((i)*name##_STRIDE)
+#
 __global__ void update(int num_comps, FLOATTYPE dt, INTTYPE steps,
            FLOATTYPE* g_I,
            FLOATTYPE* g_resting_potential,
@@ -52,6 +56,8 @@ __global__ void update(int num_comps, FLOATTYPE dt, INTTYPE steps,
            FLOATTYPE* g_refractory_period,
            FLOATTYPE* g_time_constant,
            FLOATTYPE* g_bias_current,
+           FLOATTYPE* g_bh,
+           FLOATTYPE* g_input_resistance,
            FLOATTYPE* g_refractory_time_left,
            INTTYPE* g_spike_state, FLOATTYPE* g_V)
 {
@@ -64,11 +70,10 @@ __global__ void update(int num_comps, FLOATTYPE dt, INTTYPE steps,
     FLOATTYPE resting_potential;
     FLOATTYPE threshold;
     FLOATTYPE reset_potential;
-    FLOATTYPE capacitance;
-    FLOATTYPE time_constant;
     FLOATTYPE bias_current;
     FLOATTYPE refractory_time_left;
     FLOATTYPE bh;
+    FLOATTYPE input_resistance;
 
     for (int i = tid; i < num_comps; i += total_threads)
     {
@@ -76,22 +81,21 @@ __global__ void update(int num_comps, FLOATTYPE dt, INTTYPE steps,
 
         V = g_V[i];
         I = g_I[i];
-        time_constant = g_time_constant[i];
-        capacitance = g_capacitance[i];
-        reset_potential = g_reset_potential[i];
-        resting_potential = g_resting_potential[i];
-        threshold = g_threshold[i];
-        bias_current = g_bias_current[i];
+        reset_potential = g_reset_potential[PARAM_INDEX(reset_potential, i)];
+        resting_potential = g_resting_potential[PARAM_INDEX(resting_potential, i)];
+        threshold = g_threshold[PARAM_INDEX(threshold, i)];
+        bias_current = g_bias_current[PARAM_INDEX(bias_current, i)];
+        bh = g_bh[PARAM_INDEX(bh, i)];
+        input_resistance = g_input_resistance[PARAM_INDEX(input_resistance, i)];
 
-        bh = EXP(-dt/time_constant);
-        V = V*bh + ((refractory_time_left == 0 ? time_constant/capacitance*(I+bias_current) : 0) + resting_potential) * (1.0 - bh);
+        V = V*bh + ((refractory_time_left == 0 ? input_resistance*(I+bias_current) : 0) + resting_potential) * (1.0 - bh);
 
         spike = 0;
         if (V >= threshold)
         {
             V = reset_potential;
             spike = 1;
-            refractory_time_left += g_refractory_period[i];
+            refractory_time_left += g_refractory_period[PARAM_INDEX(refractory_period, i)];
         }
 
         g_V[i] = V;
@@ -108,9 +112,10 @@ __global__ void update(int num_comps, FLOATTYPE dt, INTTYPE steps,
 
         self.update_func.prepared_async_call(
             self.update_func.grid, self.update_func.block, st,
-            self.num_comps, self.dt*1000, self.steps,
+            self.num_comps, self.time_scale*self.dt, self.steps,
             *[self.inputs[k].gpudata for k in self.accesses]+\
             [self.params_dict[k].gpudata for k in self.params]+\
+            [self.derived_dict[k].gpudata for k in self.derived_dict]+\
             [self.states[k].gpudata for k in self.states]+\
             [update_pointers[k] for k in self.updates])
 
@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseAxonHillockModel import BaseAxonHillockModel
 
 class Rinzel(BaseAxonHillockModel):
@@ -21,121 +16,48 @@ class Rinzel(BaseAxonHillockModel):
         ('Vprev2', 'V')  # same as V
     ])
     max_dt = 1e-5
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-
-
-__global__ void update(
-    int num_comps,
-    FLOATTYPE dt,
-    int nsteps,
-    FLOATTYPE *g_I,
-    FLOATTYPE *g_w,
-    FLOATTYPE *g_internalV,
-    FLOATTYPE *g_internalVprev1,
-    FLOATTYPE *g_internalVprev2,
-    INTTYPE *g_spike_state,
-    FLOATTYPE *g_V)
-{
-    int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V, Vprev1, Vprev2, dV;
-    FLOATTYPE I;
-    INTTYPE spike;
-    FLOATTYPE n0, alpha_n, beta_n, n_infty;
-    FLOATTYPE h0, alpha_m, beta_m, m_infty;
-    FLOATTYPE alpha_h, beta_h, h_infty;
-    FLOATTYPE w, dw, w_infty, tau_w;
-    FLOATTYPE s;
-
-    h0 = 0.07/(0.07+1/(EXP(3.)+1.));
-    n0 = 0.1/(EXP(1.)-1.)/(0.1/(EXP(1.)-1.) + 0.125);
-    s = (1.-h0)/n0;
-
-    for(int i = tid; i < num_comps; i += total_threads)
-    {
-        spike = 0;
-        V = g_internalV[i];
-        Vprev1 = g_internalVprev1[i];
-        Vprev2 = g_internalVprev2[i];
-        I = g_I[i];
-        w = g_w[i];
-
-        for (int j = 0; j < nsteps; ++j) {
-            alpha_n = -0.01*(V+55)/(EXP(-(V+55)/10)-1);
-            alpha_m = -0.1*(V+40)/(EXP(-(V+40)/10)-1);
-            alpha_h = 0.07*EXP(-(V+65)/20 );
-
-            beta_n = 0.125*EXP(-(V+65)/80);
-            beta_m = 4*EXP(-(V+65)/18);
-            beta_h = 1/(EXP(-(V+35)/10)+1);
-
-            n_infty = alpha_n/(alpha_n + beta_n);
-            m_infty = alpha_m/(alpha_m + beta_m);
-            h_infty = alpha_h/(alpha_h + beta_h);
-            w_infty = s/(1+s*s)*(n_infty + s*(1-h_infty));
-
-            tau_w = 1 + 5*EXP(-(V+55)*(V+55)/55*55);
-
-            dw = 3*w_infty/tau_w - 3/tau_w*w;
-            dV = I - 120.*POW(m_infty,3)*(1-w)*(V-50.) - 36. * POW(w/s,4) * (V+77.) - 0.3 * (V+54.387);
-
-            V += dt * dV;
-            w += dt * dw;
-
-            spike += (Vprev2<=Vprev1) && (Vprev1 >= V) && (Vprev1 > -10);
-
-            Vprev2 = Vprev1;
-            Vprev1 = V;
-        }
-
-        g_V[i] = V;
-        g_w[i] = w;
-        g_internalV[i] = V;
-        g_internalVprev1[i] = Vprev1;
-        g_internalVprev2[i] = Vprev2;
-        g_spike_state[i] = (spike > 0);
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    # Exponential Euler is stable at the time step of the simulation, but
+    # W is fast enough (tau_w/3 is about 0.3 ms) that repetitive firing is
+    # damped out above a quarter of it:
+    integrator_max_dt = {'exponential': 2.5e-5}
+    # The rate functions can be tabulated over this range (see with_tables):
+    table_range = {'V': (-100., 100.)}
+    # Changes per substep that keep the accuracy of max_dt with adaptive
+    # substeps (see with_adaptive_steps):
+    adaptive_tolerance = {'V': 0.02, 'W': 4e-4}
+    equations = """
+h0 = 0.07/(0.07+1/(exp(3.)+1.))
+n0 = 0.1/(exp(1.)-1.)/(0.1/(exp(1.)-1.) + 0.125)
+s = (1.-h0)/n0
+
+alpha_n = -0.01*(V+55)/(exp(-(V+55)/10)-1)
+alpha_m = -0.1*(V+40)/(exp(-(V+40)/10)-1)
+alpha_h = 0.07*exp(-(V+65)/20)
+
+beta_n = 0.125*exp(-(V+65)/80)
+beta_m = 4*exp(-(V+65)/18)
+beta_h = 1/(exp(-(V+35)/10)+1)
+
+n_infty = alpha_n/(alpha_n + beta_n)
+m_infty = alpha_m/(alpha_m + beta_m)
+h_infty = alpha_h/(alpha_h + beta_h)
+w_infty = s/(1+s*s)*(n_infty + s*(1-h_infty))
+
+tau_w = 1 + 5*exp(-(V+55)*(V+55)/55*55)
+
+dw = 3*w_infty/tau_w - 3/tau_w*W
+dV = I - 120.*m_infty**3*(1-W)*(V-50.) - 36.*(W/s)**4*(V+77.) - 0.3*(V+54.387)
+
+V = integrate(V, dV)
+W = integrate(W, dw)
+
+spike_state = spike_state or (Vprev2 <= Vprev1 and Vprev1 >= V and
+                              Vprev1 > -10)
+Vprev2 = Vprev1
+Vprev1 = V
 """
 
-    def run_step(self, update_pointers, st=None):
-        for k in self.inputs:
-            self.sum_in_variable(k, self.inputs[k], st=st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, 1000.*self.dt, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params]+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("update")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*self.num_garray)
-        func.block = (128,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 128 + 1), 1)
-        return func
-
-
 
 if __name__ == '__main__':
     import argparse
@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseAxonHillockModel import BaseAxonHillockModel
 
 class Wilson(BaseAxonHillockModel):
@@ -21,101 +16,27 @@ class Wilson(BaseAxonHillockModel):
         ('Vprev2', 'V')  # same as V
     ])
     max_dt = 1e-5
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-
-
-__global__ void update(
-    int num_comps,
-    FLOATTYPE dt,
-    int nsteps,
-    FLOATTYPE *g_I,
-    FLOATTYPE *g_R,
-    FLOATTYPE *g_internalV,
-    FLOATTYPE *g_internalVprev1,
-    FLOATTYPE *g_internalVprev2,
-    INTTYPE *g_spike_state,
-    FLOATTYPE *g_V)
-{
-    int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V, Vprev1, Vprev2, dV;
-    FLOATTYPE R, R_infty, dR;
-    FLOATTYPE I;
-    INTTYPE spike;
-
-
-    for (int i = tid; i < num_comps; i += total_threads) {
-        spike = 0;
-        I = g_I[i];
-        V = g_internalV[i];
-        Vprev1 = g_internalVprev1[i];
-        Vprev2 = g_internalVprev2[i];
-        R = g_R[i];
-
-        for (int j = 0; j < nsteps; ++j) {
-
-            R_infty = 0.0135*V+1.03;
-
-            dR = R_infty/1.9 - R/1.9;
-            dV = 1./0.8*(I - 1.0*(17.81+0.4771*V+0.003263*V*V)*(V-55.) - 26.*R*(V+92.));
-
-            V += dt * dV;
-            R += dt * dR;
-
-            spike += (Vprev2<=Vprev1) && (Vprev1 >= V) && (Vprev1 > 20.);
-
-            Vprev2 = Vprev1;
-            Vprev1 = V;
-        }
-
-        g_V[i] = V;
-        g_R[i] = R;
-        g_internalV[i] = V;
-        g_internalVprev1[i] = Vprev1;
-        g_internalVprev2[i] = Vprev2;
-        g_spike_state[i] = (spike > 0);
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    # Exponential Euler is stable at the time step of the simulation, but
+    # needs half of it to keep the spike times:
+    integrator_max_dt = {'exponential': 5e-5}
+    # Changes per substep that keep the accuracy of max_dt with adaptive
+    # substeps (see with_adaptive_steps):
+    adaptive_tolerance = {'V': 0.02, 'R': 4e-4}
+    equations = """
+R_infty = 0.0135*V+1.03
+dR = R_infty/1.9 - R/1.9
+dV = 1./0.8*(I - 1.0*(17.81+0.4771*V+0.003263*V*V)*(V-55.) - 26.*R*(V+92.))
+
+V = integrate(V, dV)
+R = integrate(R, dR)
+
+spike_state = spike_state or (Vprev2 <= Vprev1 and Vprev1 >= V and
+                              Vprev1 > 20.)
+Vprev2 = Vprev1
+Vprev1 = V
 """
 
-    def run_step(self, update_pointers, st=None):
-        for k in self.inputs:
-            self.sum_in_variable(k, self.inputs[k], st=st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, 1000.*self.dt, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params]+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("update")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*self.num_garray)
-        func.block = (128,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 128 + 1), 1)
-        return func
-
-
 
 if __name__ == '__main__':
     import argparse
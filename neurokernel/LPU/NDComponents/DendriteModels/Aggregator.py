@@ -4,12 +4,9 @@ from abc import ABCMeta, abstractmethod, abstractproperty
 import os.path
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
+from neurokernel.LPU.utils.lazy import garray, dtype_to_ctype, cuda, \
+    SourceModule
 
-from neurokernel.LPU.utils.simpleio import *
 from .BaseDendriteModel import BaseDendriteModel
 
 class Aggregator(BaseDendriteModel):
@@ -51,18 +48,59 @@ class Aggregator(BaseDendriteModel):
                         self.access_buffers['V'].ld,                          #i
                         self.access_buffers['V'].current,                     #i
                         self.params_dict['pre']['V'].gpudata,                 #P
-                        update_pointers['I'])                                 #P
+                        update_pointers['I'],                                 #P
+                        self.num_comps)                                       #i
 
 
+    def compute_I_sparse(self, g=None, g_current=None, V=None,
+                         V_current=None):
+        """
+        Compute the aggregated current on the host with sparse matrices.
+
+        The term sum_i g_i*(V-V_rev_i) is evaluated as two sparse
+        matrix-vector products per connection delay, one unweighted and one
+        weighted by the reversal potentials.
+
+        Parameters
+        ----------
+        g, V : numpy.ndarray
+            Histories of the conductances and membrane potentials of shape
+            (buffer_length, size). Default to the contents of the
+            corresponding CircularArrays.
+        g_current, V_current : int
+            Current rows of `g` and `V`. Default to the current positions of
+            the corresponding CircularArrays.
+
+        Returns
+        -------
+        I : numpy.ndarray
+            Current of each component.
+        """
+        from neurokernel.LPU.utils.sparse_input import aggregator_current
+
+        if g is None:
+            g = self.access_buffers['g'].parr.get()
+        if g_current is None:
+            g_current = self.access_buffers['g'].current
+        if V is None:
+            V = self.access_buffers['V'].parr.get()
+        if V_current is None:
+            V_current = self.access_buffers['V'].current
+        V_pre = self.params_dict['pre']['V'].get()
+        return aggregator_current(self.get_input_matrices('g'),
+                                  self.get_input_matrices('g', 'reverse'),
+                                  g, g_current, V[V_current][V_pre])
+
     def get_update_func(self, dtype=np.double):
+        # The number of components is passed at run time so that the same
+        # code is compiled only once for all sizes (see kernel_cache):
         template = """
-        #define NUM_COMPS %(num_comps)d
-
         __global__ void aggregate_I(%(type)s* g, int ld, int current,
                                     int buffer_length, int* delay,
                                     %(type)s* V_rev, int* pre, int* npre,
                                     int* cumpre, %(type)s* V, int V_ld,
-                                    int V_current, int* V_pre, %(type)s* I)
+                                    int V_current, int* V_pre, %(type)s* I,
+                                    int num_comps)
         {
             // must use block size (32, 32, 1)
             int tidx = threadIdx.x;
@@ -78,7 +116,7 @@ class Aggregator(BaseDendriteModel):
             if(tidy == 0)
             {
                 comp = bid * 32 + tidx;
-                if(comp < NUM_COMPS)
+                if(comp < num_comps)
                 {
                     num_pre[tidx] = npre[comp];
                     V_in[tidx] = V[V_pre[comp]+V_current*V_ld];
@@ -86,7 +124,7 @@ class Aggregator(BaseDendriteModel):
             } else if(tidy == 1)
             {
                 comp = bid * 32 + tidx;
-                if(comp < NUM_COMPS)
+                if(comp < num_comps)
                 {
                     pre_start[tidx] = cumpre[comp];
                     I[comp] = 0;
@@ -98,7 +136,7 @@ class Aggregator(BaseDendriteModel):
             __syncthreads();
 
             comp = bid * 32 + tidy ;
-            if(comp < NUM_COMPS)
+            if(comp < num_comps)
             {
                int dl;
                int col;
@@ -150,18 +188,17 @@ class Aggregator(BaseDendriteModel):
             {
                 input[tidx][0] += input[tidx][1];
                 comp = bid*32+tidx;
-                if(comp < NUM_COMPS)
+                if(comp < num_comps)
                 {
                     I[comp] -= input[tidx][0];
                 }
             }
         }
         """
-        mod = SourceModule(template % {"num_comps": self.num_comps,
-                                       "type": dtype_to_ctype(dtype)},
+        mod = SourceModule(template % {"type": dtype_to_ctype(dtype)},
                            options=self.compile_options)
         func = mod.get_function("aggregate_I")
-        func.prepare('PiiiPPPPPPiiPP')
+        func.prepare('PiiiPPPPPPiiPPi')
         self.block = (32, 32, 1)
         self.grid = ((self.num_comps - 1) / 32 + 1, 1)
         return func
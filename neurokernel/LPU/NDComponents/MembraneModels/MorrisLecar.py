@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseMembraneModel import BaseMembraneModel
 
 class MorrisLecar(BaseMembraneModel):
@@ -15,125 +10,24 @@ class MorrisLecar(BaseMembraneModel):
         ('V1', 30.), ('V2', 15.), ('V3', 0.), ('V4', 30.), ('phi', 0.025),
         ('offset', 0.), ('V_L', -50.), ('V_Ca', 100.0), ('V_K', -70.0),
         ('g_L', 0.5), ('g_Ca', 1.1), ('g_K', 2.0)])
+    supports_broadcast_params = True
     states = OrderedDict([('V', -70.), ('n', 0.3525)])
     max_dt = 1e-5
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-
-__device__ FLOATTYPE compute_n(
-    FLOATTYPE V, FLOATTYPE n, FLOATTYPE V3, FLOATTYPE V4, FLOATTYPE phi)
-{
-    FLOATTYPE n_inf = 0.5 * (1 + tanh((V - V3) / V4));
-    FLOATTYPE dn = phi * cosh(( V - V3) / (V4*2)) * (n_inf - n);
-    return dn;
-}
-
-__device__ FLOATTYPE compute_V(
-    FLOATTYPE V, FLOATTYPE n, FLOATTYPE I, FLOATTYPE V1, FLOATTYPE V2,
-    FLOATTYPE offset, FLOATTYPE V_L, FLOATTYPE V_Ca,
-    FLOATTYPE V_K, FLOATTYPE g_L, FLOATTYPE g_K, FLOATTYPE g_Ca)
-{
-    FLOATTYPE m_inf = 0.5 * (1+tanh((V - V1)/V2));
-    FLOATTYPE dV = (I - g_L * (V - V_L) - g_K * n * (V - V_K)
-        - g_Ca * m_inf * (V - V_Ca) + offset);
-    return dV;
-}
-
-__global__ void
-morris_lecar_multiple(
-    INTTYPE num_comps, FLOATTYPE dt, INTTYPE nsteps,
-    FLOATTYPE* g_I, FLOATTYPE* g_V1, FLOATTYPE* g_V2, FLOATTYPE* g_V3,
-    FLOATTYPE* g_V4, FLOATTYPE* g_phi, FLOATTYPE* g_offset,
-    FLOATTYPE* g_V_L, FLOATTYPE* g_V_Ca, FLOATTYPE* g_V_K,
-    FLOATTYPE* g_g_L, FLOATTYPE* g_g_Ca, FLOATTYPE* g_g_K,
-    FLOATTYPE* g_internalV, FLOATTYPE* g_n, FLOATTYPE* g_V)
-{
-    int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V, dV;
-    FLOATTYPE n, dn;
-    FLOATTYPE I;
-    FLOATTYPE V1;
-    FLOATTYPE V2;
-    FLOATTYPE V3;
-    FLOATTYPE V4;
-    FLOATTYPE phi;
-    FLOATTYPE offset;
-    FLOATTYPE V_L;
-    FLOATTYPE V_Ca;
-    FLOATTYPE V_K;
-    FLOATTYPE g_L;
-    FLOATTYPE g_Ca;
-    FLOATTYPE g_K;
-
-    for (int k = tid; k < num_comps; k += total_threads) {
-        V = g_internalV[k];
-        n = g_n[k];
-        V1 = g_V1[k];
-        V2 = g_V2[k];
-        V3 = g_V3[k];
-        V4 = g_V4[k];
-        phi = g_phi[k];
-        offset = g_offset[k];
-        V_L = g_V_L[k];
-        V_Ca = g_V_Ca[k];
-        V_K = g_V_K[k];
-        g_L = g_g_L[k];
-        g_Ca = g_g_Ca[k];
-        g_K = g_g_K[k];
-        I = g_I[k];
-
-        for (int i = 0; i < nsteps; ++i) {
-            dn = compute_n(V, n, V3, V4, phi);
-            dV = compute_V(V, n, I, V1, V2,
-                           offset, V_L, V_Ca, V_K,
-                           g_L, g_K, g_Ca);
-            V += dV * dt;
-            n += dn * dt;
-        }
-
-        g_V[k] = V;
-        g_internalV[k] = V;
-        g_n[k] = n;
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    # Exponential Euler is stable at the time step of the simulation:
+    integrator_max_dt = {'exponential': 1e-4}
+    # Changes per substep that keep the accuracy of max_dt with adaptive
+    # substeps (see with_adaptive_steps):
+    adaptive_tolerance = {'V': 0.02, 'n': 4e-4}
+    equations = """
+n_inf = 0.5*(1+tanh((V-V3)/V4))
+dn = phi*cosh((V-V3)/(V4*2))*(n_inf-n)
+m_inf = 0.5*(1+tanh((V-V1)/V2))
+dV = I - g_L*(V-V_L) - g_K*n*(V-V_K) - g_Ca*m_inf*(V-V_Ca) + offset
+V = integrate(V, dV)
+n = integrate(n, dn)
 """
 
-    def run_step(self, update_pointers, st=None):
-        for k in self.inputs:
-            self.sum_in_variable(k, self.inputs[k], st=st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, self.dt*1000, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params]+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("morris_lecar_multiple")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*self.num_garray)
-        func.block = (256,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 256 + 1), 1)
-        return func
 
 if __name__ == '__main__':
     import argparse
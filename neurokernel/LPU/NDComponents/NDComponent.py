@@ -7,12 +7,12 @@ from collections import OrderedDict
 import os.path
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
+from neurokernel.LPU.utils.lazy import garray, dtype_to_ctype, cuda, \
+    SourceModule
 
-from neurokernel.LPU.utils.simpleio import *
+# Versions of the models using other integrators or rate tables (see
+# NDComponent.with_integrator and NDComponent.with_tables):
+_variant_classes = {}
 
 class NDComponent(object):
     """Abstract base Neurodriver component class.
@@ -36,6 +36,43 @@ class NDComponent(object):
         accesses: List, list of variables to access.
         states: Dict, mapping between state variables and their default values.
         updates: List, list of variabels to update and pupolate.
+        shared_state_params: List, parameters that, together with the inputs,
+            determine the evolution of the states. If not None, components
+            with identical values may share one copy of their states (see
+            `LPU.find_state_classes`); the component then receives the
+            'state_class' and 'state_rep' index arrays in `params_dict`.
+        supports_broadcast_params: bool, whether the CUDA kernel of the model
+            reads its parameters through the PARAM_INDEX(name, i) macro, so
+            that parameters that are constant over all components can be
+            stored as a single value (see `MemoryManager.params_htod`).
+        equations: str, update equations of the model. If not None, the CUDA
+            kernel, `get_update_func`, `run_step` and `update_numpy` are
+            generated from them (see `neurokernel.LPU.utils.codegen`)
+            instead of being written by hand.
+        derived_params: Dict, mapping between derived parameters and the
+            expressions computing them from the parameters and `dt`, the
+            time step passed to the kernel, in the syntax of the equations.
+            They are evaluated by `update_derived_params` and passed to the
+            kernel after the parameters. Models with equations derive them
+            from the equations instead.
+        time_scale: float, factor converting the time step in seconds to
+            the time unit of the equations, e.g., 1000. for milliseconds.
+        integrator: str, scheme used for the `integrate(x, dx/dt)`
+            statements of the equations: 'euler' (forward Euler) or
+            'exponential' (exponential Euler, see `with_integrator`).
+        integrator_max_dt: Dict, value of `max_dt` for each integrator other
+            than the default one.
+        table_range: Dict, range (low, high) of each variable over which the
+            rate functions of the equations may be tabulated.
+        table_step: float, step of the grid of the tabulated rate functions.
+            If None, the rate functions are not tabulated (see
+            `with_tables`).
+        table_tolerance: float, maximum relative error of the interpolated
+            rate functions accepted by `build_tables`.
+        adaptive_tolerance: Dict, maximum change of each integrated state
+            in a substep when the number of substeps is adaptive.
+        adaptive_steps: Dict, tolerances used if the number of substeps is
+            chosen by each component (see `with_adaptive_steps`), or None.
 
     # Methods
         run_step:
@@ -60,6 +97,35 @@ class NDComponent(object):
 
     params = OrderedDict()
     states = OrderedDict()
+    shared_state_params = None
+    supports_broadcast_params = False
+    equations = None
+    derived_params = OrderedDict()
+    time_scale = 1.
+    integrator = 'euler'
+    integrator_max_dt = {}
+    table_range = {}
+    table_step = None
+    table_tolerance = 1e-3
+    adaptive_tolerance = {}
+    adaptive_steps = None
+
+    # If True, statistics of the adaptive substeps are recorded at every step
+    # (see `get_substep_stats`)
+    record_substeps = False
+
+    # If True, the sums of the inputs are not recomputed (see `relax`)
+    _hold_inputs = False
+
+    # StepTimer set by the LPU if timing is enabled
+    timer = None
+
+    # Set by __init__; models that override it without calling it, such as
+    # the Aggregator, gather their inputs in their own kernels and have
+    # neither derived parameters nor rate tables
+    inputs = {}
+    derived_dict = OrderedDict()
+    rate_tables = None
 
     def __init__(self, params_dict, access_buffers, dt, debug=False,
                  LPU_id=None, cuda_verbose=False):
@@ -71,14 +137,31 @@ class NDComponent(object):
         self.LPU_id = LPU_id
         self.debug = debug
         self.compile_options = ['--ptxas-options=-v'] if cuda_verbose else []
+        # Options of the kernels that are the same for all models (e.g., the
+        # summation of the inputs); unlike compile_options, they don't depend
+        # on the parameters of the model, so that each of these kernels is
+        # compiled once:
+        self.generic_compile_options = list(self.compile_options)
 
         # get number of components
         nums = [v.size for k,v in self.params_dict.items() if k in cls.params]
         for v in self.params_dict['npre'].values():
             nums.append(v.size)
         # nums += [v.size for k,v in self.access_buffers.items() if k in cls.accesses]
-        self.num_comps = nums[0]
-        assert(all([x == self.num_comps for x in nums]))
+        if cls.supports_broadcast_params:
+            # parameters that are constant may be stored as a single value
+            self.num_comps = max(nums)
+            assert(all([x in [1, self.num_comps] for x in nums]))
+            self.broadcast_params = [k for k in cls.params
+                                     if k in self.params_dict and
+                                     self.params_dict[k].size == 1]
+            self.compile_options.extend(
+                ['-D%s_STRIDE=%d' % (k, 0 if k in self.broadcast_params else 1)
+                 for k in cls.params])
+        else:
+            self.num_comps = nums[0]
+            assert(all([x == self.num_comps for x in nums]))
+            self.broadcast_params = []
 
         # get dtype from PyCUDA array
         dtypes = [v.dtype.type for k,v in self.params_dict.items() if k in cls.params]
@@ -109,10 +192,18 @@ class NDComponent(object):
             self.dt = self.floattype(dt/self.steps)
 
 
+        # Components of the same state class share one copy of the states:
+        if 'state_rep' in self.params_dict:
+            self.num_states = self.params_dict['state_rep'].size
+        else:
+            self.num_states = self.num_comps
+
         self.states = OrderedDict()
         for k,v in cls.states.items():
-            dtype = self.floattype if isinstance(v, float) else self.inttype
-            self.states[k] = garray.empty(self.num_comps, dtype = dtype)
+            # states initialized to another state have the same type:
+            dtype = self.floattype if isinstance(cls.states.get(v, v), float) \
+                    else self.inttype
+            self.states[k] = garray.empty(self.num_states, dtype = dtype)
             self._set_state(k, v)
 
         self.inputs = OrderedDict()
@@ -121,8 +212,27 @@ class NDComponent(object):
             assert(dtype == self.floattype or dtype == self.inttype)
             self.inputs[k] = garray.empty(self.num_comps, dtype = dtype)
 
+        # Derived parameters, computed by update_derived_params; they are
+        # stored as a single value if the parameters they depend on are:
+        self.derived_dict = OrderedDict()
+        code = self.get_derived_code()
+        for k, deps in (code.derived.items() if code else []):
+            dtype = self.inttype if k in code.int_vars else self.floattype
+            single = cls.supports_broadcast_params and \
+                     all([p in self.broadcast_params for p in deps])
+            self.derived_dict[k] = garray.empty(
+                1 if single else self.num_comps, dtype = dtype)
+            if cls.supports_broadcast_params:
+                self.compile_options.append(
+                    '-D%s_STRIDE=%d' % (k, 0 if single else 1))
+
         self.num_garray = len(self.accesses)+len(self.params)+len(self.states) \
-            +len(self.updates)
+            +len(self.updates)+len(self.derived_dict)
+        # Tabulated rate functions, filled in by build_tables:
+        self.rate_tables = None
+        if cls.equations is not None and self.get_model_code().tables:
+            self.rate_tables = garray.empty(self.get_model_code().table_size,
+                                            dtype = self.floattype)
         self.update_func = self.get_update_func()
 
     def initialize_states(self):
@@ -131,23 +241,522 @@ class NDComponent(object):
 
     def _set_state(self, k, v):
         cls = type(self)
-        if k in self.params_dict:
+        if k in self.params_dict and self.num_states != self.num_comps:
+            # Initialize the shared states from the class representatives:
+            rep = self.params_dict['state_rep'].get()
+            self.states[k].set(np.ascontiguousarray(
+                self.get_param(k)[rep], self.states[k].dtype))
+        elif k in self.params_dict and k in self.broadcast_params:
+            self.states[k].fill(self.params_dict[k].get()[0])
+        elif k in self.params_dict:
             cuda.memcpy_dtod(self.states[k].gpudata,
                              self.params_dict[k].gpudata,
                              self.params_dict[k].nbytes)
         else:
             if isinstance(v, float):
                 self.states[k].fill(self.floattype(v))
+            elif isinstance(v, int):
+                self.states[k].fill(self.inttype(v))
             else:
                 assert(v in cls.states)
                 self.states[k].fill(self.floattype(cls.states[v]))
 
-    @abstractmethod
-    def run_step(self, update_pointers):
-        pass
+    def relax(self, update_pointers, inputs, steps, tolerance=1e-10,
+              max_iter=50):
+        """
+        Relax the states of the component under constant inputs.
+
+        Components that have a stable resting state under the inputs are
+        set to it (see `find_rest_states`). The other components, i.e.,
+        those whose fixed point is unstable (e.g., tonically spiking ones)
+        or not found, and all components of models whose equations do not
+        integrate their states, are warmed up instead: they are stepped
+        `steps` times with the sums of their inputs held at the given
+        values rather than gathered from the variable buffers. Components
+        that gather their inputs inside their own kernels are warmed up
+        against the current contents of the buffers.
+
+        Parameters
+        ----------
+        update_pointers : dict
+            Pointers to the memory of the updated variables, as passed to
+            `run_step`.
+        inputs : dict
+            Value of each accessed variable for all components. Inputs that
+            are not specified are held at zero.
+        steps : int
+            Number of steps of the warm-up.
+        tolerance, max_iter :
+            See `find_rest_states`.
+
+        Returns
+        -------
+        rest : numpy.ndarray
+            Boolean array of the components set to their resting states.
+        """
+        result = self.find_rest_states(inputs, tolerance, max_iter)
+        if result is None:
+            rest = np.zeros(self.num_comps, bool)
+        else:
+            states, updates, rest = result
+
+        if not rest.all():
+            for k, v in self.inputs.items():
+                if k in inputs:
+                    v.set(np.ascontiguousarray(inputs[k], v.dtype))
+                else:
+                    v.fill(0)
+            self._hold_inputs = True
+            timer, self.timer = self.timer, None
+            try:
+                for i in range(steps):
+                    self.run_step(update_pointers)
+            finally:
+                self._hold_inputs = False
+                self.timer = timer
+
+        if rest.any():
+            for k, v in states.items():
+                x = self.states[k].get()
+                x[rest] = v[rest]
+                self.states[k].set(x)
+            for k, v in updates.items():
+                x = np.empty(self.num_comps, v.dtype)
+                cuda.memcpy_dtoh(x, update_pointers[k])
+                x[rest] = v[rest]
+                cuda.memcpy_htod(update_pointers[k], x)
+        return rest
+
+    def find_rest_states(self, inputs, tolerance=1e-10, max_iter=50):
+        """
+        Find the resting states of the components under constant inputs.
+
+        The zeros of the derivatives of the states advanced by `integrate`
+        in the equations of the model are found by Newton's method, starting
+        from the current states. The derivatives are evaluated on the host
+        with the NumPy code generated for forward Euler, and their Jacobian
+        by finite differences. A fixed point is only accepted if it is
+        stable, i.e., if all the eigenvalues of the Jacobian have negative
+        real parts. The other states (e.g., the previous membrane
+        potentials used to detect spikes) are then brought in line with the
+        fixed point by steps of zero length.
+
+        Parameters
+        ----------
+        inputs : dict
+            Value of each accessed variable for all components. Inputs that
+            are not specified are zero.
+        tolerance : float
+            Largest Newton correction of the states, relative to
+            1+abs(state), at which a fixed point is accepted.
+        max_iter : int
+            Maximum number of Newton iterations.
+
+        Returns
+        -------
+        states : OrderedDict
+            Resting states of all components.
+        updates : OrderedDict
+            Values of the updated variables at the resting states.
+        rest : numpy.ndarray
+            Boolean array of the components for which a stable fixed point
+            was found; the values of the other components are meaningless.
+
+        Returns None if the model has no equations, does not integrate its
+        states or shares states between components.
+        """
+        cls = type(self)
+        if cls.equations is None or 'integrate(' not in cls.equations or \
+           self.num_states != self.num_comps:
+            return None
+        code = cls.with_integrator('euler').get_model_code()
+        names = code.integrated
+        n = self.num_comps
+        host_inputs = {k: np.asarray(inputs[k], np.float64) if k in inputs
+                       else np.zeros(n) for k in code.accesses}
+        params = {k: self.get_param(k) for k in code.params}
+        states = OrderedDict((k, self.states[k].get()) for k in code.states)
+
+        # One forward Euler step of unit length adds the derivatives:
+        def rhs(x):
+            new, _ = code.run_numpy(1., 1, host_inputs, params,
+                                    dict(states, **x))
+            return np.array([new[k]-x[k] for k in names]).T
+
+        x = OrderedDict((k, states[k].astype(np.float64)) for k in names)
+        err = np.seterr(all='ignore')
+        try:
+            for i in range(max_iter):
+                f = rhs(x)
+                J = np.empty((n, len(names), len(names)))
+                for j, k in enumerate(names):
+                    h = 1e-7*(1+np.abs(x[k]))
+                    J[:, :, j] = (rhs(dict(x, **{k: x[k]+h}))-f)/h[:, None]
+                ok = np.all(np.isfinite(J), axis=(1, 2))
+                J[~ok] = np.eye(len(names))
+                dx = -np.einsum('nij,nj->ni', np.linalg.pinv(J), f)
+                for j, k in enumerate(names):
+                    x[k] = x[k]+dx[:, j]
+                converged = ok & np.all(
+                    np.abs(dx) <= tolerance*(1+np.abs(np.array(
+                        list(x.values())).T)), axis=1)
+                if converged.all():
+                    break
+            rest = converged & np.all(np.isfinite(f), axis=1) & \
+                np.all(np.linalg.eigvals(J).real < 0, axis=1)
+        finally:
+            np.seterr(**err)
+
+        states.update(x)
+        for i in range(len(code.states)):
+            new, updates = code.run_numpy(0., 1, host_inputs, params, states)
+            states.update(new)
+        return states, updates, rest
+
+    def get_param(self, k):
+        """
+        Return the values of a parameter for all components on the host.
+
+        Parameters stored as a single value are expanded to the number of
+        components.
+        """
+        v = self.params_dict[k].get()
+        if k in self.broadcast_params:
+            v = np.repeat(v, self.num_comps)
+        return v
+
+    def set_param(self, k, value):
+        """
+        Set the values of a parameter for all components.
+
+        The derived parameters are updated. Parameters stored as a single
+        value can only be set to a single value.
+        """
+        param = self.params_dict[k]
+        value = np.asarray(value, param.dtype)
+        if k in self.broadcast_params:
+            if np.any(value != value.flat[0]):
+                raise ValueError('%s is stored as a single value' % k)
+            value = value.flat[:1]
+        param.set(np.ascontiguousarray(np.broadcast_to(value, param.shape)))
+        self.update_derived_params()
+
+    def update_derived_params(self):
+        """
+        Compute the derived parameters from the current parameters.
+
+        Called by `pre_run` and `set_param`.
+        """
+        if not self.derived_dict:
+            return
+        code = self.get_derived_code()
+        params = {k: self.params_dict[k].get() for k in code._derived_params}
+        values = code.evaluate_derived(self.time_scale*self.dt, params,
+                                       self.floattype, self.inttype)
+        for k, v in self.derived_dict.items():
+            v.set(np.ascontiguousarray(np.broadcast_to(values[k], v.shape),
+                                       v.dtype))
+
+    @classmethod
+    def get_derived_code(cls):
+        """
+        Return the code computing the derived parameters, or None if the
+        model has none.
+        """
+        if cls.equations is not None:
+            return cls.get_model_code()
+        if not cls.derived_params:
+            return None
+        if '_derived_code' not in cls.__dict__:
+            from neurokernel.LPU.utils.codegen import ModelCode
+            equations = '\n'.join(['%s = %s' % (k, v) for k, v in
+                                   cls.derived_params.items()])
+            code = ModelCode(cls.__name__, equations, cls.params, {}, [], [])
+            for k in cls.derived_params:
+                if k not in code.derived:
+                    raise ValueError('%s: derived parameter %s does not '
+                                     'depend on the parameters or dt' %
+                                     (cls.__name__, k))
+            cls._derived_code = code
+        return cls._derived_code
+
+    @classmethod
+    def get_model_code(cls):
+        """
+        Return the code generated from the equations of the model.
+        """
+        # Stored on each class rather than inherited by its subclasses:
+        if '_model_code' not in cls.__dict__:
+            if cls.equations is None:
+                raise NotImplementedError(
+                    '%s does not define its equations' % cls.__name__)
+            from neurokernel.LPU.utils.codegen import ModelCode
+            tables = None
+            if cls.table_step is not None:
+                tables = {k: (low, high, cls.table_step)
+                          for k, (low, high) in cls.table_range.items()}
+            cls._model_code = ModelCode(cls.__name__, cls.equations,
+                                        cls.params, cls.states,
+                                        cls.accesses, cls.updates,
+                                        cls.integrator, tables,
+                                        cls.adaptive_steps)
+        return cls._model_code
+
+    @classmethod
+    def with_integrator(cls, integrator):
+        """
+        Return a version of the model that uses another integrator.
+
+        With the 'exponential' integrator, the states are advanced by
+        exponential Euler steps, which are exact for gating variables and
+        membrane potentials when the other variables are held constant over
+        the step and remain stable for time steps well beyond those of
+        forward Euler (see `neurokernel.LPU.utils.codegen`). The model then
+        uses the `max_dt` given in `integrator_max_dt`, which reduces the
+        number of substeps per step.
+
+        Parameters
+        ----------
+        integrator : str
+            'euler' or 'exponential'.
+
+        Returns
+        -------
+        cls : type
+            Subclass of the model with the same name, or the model itself if
+            it already uses the integrator.
+        """
+        if integrator == cls.integrator:
+            return cls
+        if cls.equations is None or 'integrate(' not in cls.equations:
+            raise ValueError('%s does not support the %s integrator' %
+                             (cls.__name__, integrator))
+        key = (cls, integrator)
+        if key not in _variant_classes:
+            _variant_classes[key] = type(cls)(cls.__name__, (cls,), {
+                '__module__': cls.__module__,
+                '__doc__': cls.__doc__,
+                'integrator': integrator,
+                'max_dt': cls.integrator_max_dt.get(integrator, cls.max_dt)})
+        return _variant_classes[key]
+
+    @classmethod
+    def with_tables(cls, step=0.05):
+        """
+        Return a version of the model that tabulates its rate functions.
+
+        The temporaries of the equations that only depend on one of the
+        variables of `table_range` and on constants, such as the rates of
+        the gating variables of conductance-based models, are tabulated
+        over that range at `pre_run` and evaluated by linear interpolation
+        in the tables instead of their exponentials; values outside the
+        range are computed from the equations. The interpolation is
+        validated against the functions at `pre_run` (see
+        `build_tables`).
+
+        Parameters
+        ----------
+        step : float
+            Step of the grid, in the units of the variable (e.g., mV).
+
+        Returns
+        -------
+        cls : type
+            Subclass of the model with the same name, or the model itself if
+            it already uses the step.
+        """
+        if step == cls.table_step:
+            return cls
+        if cls.equations is None or not cls.table_range:
+            raise ValueError('%s does not support rate tables' %
+                             cls.__name__)
+        key = (cls, 'tables', step)
+        if key not in _variant_classes:
+            variant = type(cls)(cls.__name__, (cls,), {
+                '__module__': cls.__module__,
+                '__doc__': cls.__doc__,
+                'table_step': step})
+            if not variant.get_model_code().tables:
+                raise ValueError('%s has no rate functions to tabulate' %
+                                 cls.__name__)
+            _variant_classes[key] = variant
+        return _variant_classes[key]
+
+    @classmethod
+    def with_adaptive_steps(cls, scale=1., min_dt=None):
+        """
+        Return a version of the model in which each component chooses its
+        number of substeps.
+
+        At every step, each component repeats the step with more substeps
+        if one of the states in `adaptive_tolerance` changes by more than
+        its tolerance in a substep, and starts the next step with the number
+        of substeps for which the largest change is about 0.8 of the
+        tolerance. Quiescent components thus take a single substep while
+        spiking ones take up to `ceil(dt/max_dt)`. The components have the
+        additional integer states 'substeps', the number of substeps of the
+        next step, and 'substeps_taken', the number of substeps computed in
+        the last step.
+
+        Parameters
+        ----------
+        scale : float
+            Factor applied to the tolerances.
+        min_dt : float
+            Shortest substep, which replaces `max_dt` as the bound of the
+            number of substeps. Defaults to the smallest `max_dt` of the
+            model with any integrator, i.e., that of forward Euler.
+
+        Returns
+        -------
+        cls : type
+            Subclass of the model with the same name.
+        """
+        if cls.equations is None or not cls.adaptive_tolerance:
+            raise ValueError('%s does not support adaptive substeps' %
+                             cls.__name__)
+        if min_dt is None:
+            min_dt = min([c.__dict__['max_dt'] for c in cls.__mro__
+                          if c.__dict__.get('max_dt') is not None]+[np.inf])
+            min_dt = None if np.isinf(min_dt) else min_dt
+        key = (cls, 'adaptive', scale, min_dt)
+        if key not in _variant_classes:
+            states = OrderedDict(cls.states)
+            if cls.adaptive_steps is None:
+                states['substeps'] = 1
+                states['substeps_taken'] = 0
+            _variant_classes[key] = type(cls)(cls.__name__, (cls,), {
+                '__module__': cls.__module__,
+                '__doc__': cls.__doc__,
+                'states': states,
+                'adaptive_steps': {k: v*scale for k, v in
+                                   cls.adaptive_tolerance.items()},
+                'max_dt': min_dt})
+        return _variant_classes[key]
+
+    def gather_inputs(self, st=None):
+        """
+        Gather the values of the accessed variables into `inputs`.
+        """
+        for k in self.inputs:
+            self.sum_in_variable(k, self.inputs[k], st=st)
+
+    def run_step(self, update_pointers, st=None):
+        code = self.get_model_code()
+        self.gather_inputs(st=st)
+
+        # With adaptive substeps, the kernel takes the duration of the step
+        # and the maximum number of substeps:
+        dt = self.dt*self.steps if self.adaptive_steps else self.dt
+        self.update_func.prepared_async_call(
+            self.update_func.grid, self.update_func.block, st,
+            self.num_comps, self.time_scale*dt, self.steps,
+            *code.arguments(self.inputs, self.params_dict, self.states,
+                            update_pointers, self.rate_tables,
+                            self.derived_dict))
+        if self.adaptive_steps and self.record_substeps and \
+           not self._hold_inputs:
+            self._record_substeps(self.states['substeps_taken'].get())
+
+    def update_numpy(self, inputs):
+        """
+        Advance the component by one step on the host.
+
+        Computes the same step as `run_step` with the NumPy function
+        generated from the equations of the model, and sets the states of
+        the component to their new values.
+
+        Parameters
+        ----------
+        inputs : dict
+            Value of each accessed variable for all components, e.g., as
+            returned by `sum_in_variable_sparse`.
+
+        Returns
+        -------
+        updates : OrderedDict
+            Values of the updated variables.
+        """
+        code = self.get_model_code()
+        params = {k: self.get_param(k) for k in code.params}
+        params.update((k, v.get()) for k, v in self.derived_dict.items())
+        states = {k: self.states[k].get() for k in code.states}
+        dt = self.dt*self.steps if self.adaptive_steps else self.dt
+        states, updates = code.run_numpy(
+            self.time_scale*dt, self.steps, inputs, params, states,
+            self.floattype, self.inttype)
+        for k, v in states.items():
+            self.states[k].set(v)
+        if self.adaptive_steps and self.record_substeps:
+            self._record_substeps(states['substeps_taken'])
+        return updates
+
+    def _record_substeps(self, taken):
+        try:
+            stats = self._substep_stats
+        except AttributeError:
+            stats = self._substep_stats = {'mean': [], 'max': [],
+                                           'hist': np.zeros(0, np.int64)}
+        stats['mean'].append(taken.mean())
+        stats['max'].append(taken.max())
+        counts = np.bincount(taken)
+        if counts.size > stats['hist'].size:
+            stats['hist'] = np.concatenate([
+                stats['hist'],
+                np.zeros(counts.size-stats['hist'].size, np.int64)])
+        stats['hist'][:counts.size] += counts
+
+    def get_substep_stats(self):
+        """
+        Return statistics of the substeps taken in the recorded steps.
+
+        Steps are recorded if the number of substeps is adaptive and
+        `record_substeps` is True.
+
+        Returns
+        -------
+        stats : dict
+            Mean and maximum number of substeps taken by the components in
+            each step ('mean' and 'max', arrays with one entry per step)
+            and the number of component-steps with each number of substeps
+            ('hist'). The substeps of repeated steps are included.
+        """
+        stats = getattr(self, '_substep_stats', None)
+        if stats is None:
+            return {'mean': np.zeros(0), 'max': np.zeros(0, np.int64),
+                    'hist': np.zeros(0, np.int64)}
+        return {'mean': np.array(stats['mean']),
+                'max': np.array(stats['max']),
+                'hist': stats['hist'].copy()}
 
     def pre_run(self, update_pointers):
         self.initialize_states()
+        self.update_derived_params()
+        if self.rate_tables is not None:
+            self.build_tables()
+
+    def build_tables(self):
+        """
+        Tabulate the rate functions of the model and validate the tables.
+
+        The relative errors of the interpolated functions at the midpoints
+        of the grid, where they are largest, are stored in `table_errors`.
+
+        Raises
+        ------
+        ValueError
+            If an error exceeds `table_tolerance`, in which case the step of
+            the tables should be decreased.
+        """
+        values, self.table_errors = \
+            self.get_model_code().build_tables(self.floattype)
+        for k, v in self.table_errors.items():
+            if v > self.table_tolerance:
+                raise ValueError(
+                    '%s: relative error of the table of %s is %.2g with a '
+                    'step of %g' % (type(self).__name__, k, v,
+                                    self.table_step))
+        self.rate_tables.set(values)
 
 
     def post_run(self):
@@ -156,11 +765,34 @@ class NDComponent(object):
         '''
         pass
 
-    @abstractmethod
+    def get_checkpoint(self):
+        '''
+        Return the states of the component as a dictionary of arrays.
+
+        Components that keep additional state between steps should extend
+        this method and `set_checkpoint`.
+        '''
+        return {k: v.get() for k, v in self.states.items()}
+
+    def set_checkpoint(self, state):
+        '''
+        Restore the states returned by `get_checkpoint`.
+        '''
+        for k, v in self.states.items():
+            v.set(np.ascontiguousarray(state[k], v.dtype))
+
     def get_update_func(self):
-        pass
+        code = self.get_model_code()
+        mod = SourceModule(code.cuda_src, options=self.compile_options)
+        func = mod.get_function("update")
+        func.prepare(code.arg_types(self.floattype))
+        func.block = (256,1,1)
+        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
+                         (self.num_comps-1) / 256 + 1), 1)
+        return func
 
     def sum_in_variable(self, var, garr, st=None):
+        if self._hold_inputs: return
         try:
             a = self.sum_kernel
         except AttributeError:
@@ -175,15 +807,86 @@ class NDComponent(object):
             self.access_buffers[var].gpudata,                      #P
             self.access_buffers[var].ld,                           #i
             self.access_buffers[var].current,                      #i
-            self.access_buffers[var].buffer_length)                #i
+            self.access_buffers[var].buffer_length,                #i
+            garr.size)                                             #i
+        if self.timer is not None:
+            self.timer.mark('%s/inputs' % type(self).__name__)
+
+    def get_input_matrices(self, var, weight=None):
+        """
+        Return the sparse matrices that sum the inputs of a variable.
+
+        Parameters
+        ----------
+        var : str
+            Accessed variable.
+        weight : str
+            Key of the connection data used to weight the connections, e.g.,
+            'reverse'. If None, all connections have a weight of 1.
+
+        Returns
+        -------
+        matrices : OrderedDict
+            CSR matrix for each distinct connection delay; see
+            `neurokernel.LPU.utils.sparse_input.input_matrices`.
+        """
+        from neurokernel.LPU.utils.sparse_input import input_matrices
+
+        try:
+            cache = self._input_matrices
+        except AttributeError:
+            cache = self._input_matrices = {}
+        if (var, weight) not in cache:
+            get = lambda a: a.get() if hasattr(a, 'get') else np.asarray(a)
+            conn_data = self.params_dict['conn_data'][var]
+            cache[(var, weight)] = input_matrices(
+                get(self.params_dict['pre'][var]),
+                get(self.params_dict['npre'][var]),
+                get(conn_data['delay']),
+                self.access_buffers[var].size,
+                None if weight is None else get(conn_data[weight]),
+                self.access_buffers[var].dtype)
+        return cache[(var, weight)]
+
+    def sum_in_variable_sparse(self, var, history=None, current=None):
+        """
+        Sum the inputs of a variable on the host with sparse matrices.
+
+        Computes the same sums as `sum_in_variable` as one sparse
+        matrix-vector product per connection delay.
+
+        Parameters
+        ----------
+        var : str
+            Accessed variable.
+        history : numpy.ndarray
+            History of the variable of shape (buffer_length, size). Defaults
+            to the contents of the variable's CircularArray.
+        current : int
+            Current row of `history`. Defaults to the current position of the
+            variable's CircularArray.
+
+        Returns
+        -------
+        res : numpy.ndarray
+            Sum of the inputs of each component.
+        """
+        from neurokernel.LPU.utils.sparse_input import sum_input
+
+        if history is None:
+            history = self.access_buffers[var].parr.get()
+        if current is None:
+            current = self.access_buffers[var].current
+        return sum_input(self.get_input_matrices(var), history, current)
 
     def __get_sum_kernel(self, num_comps, dtype=np.double):
+        # The number of components is passed at run time so that the same
+        # code is compiled only once for all sizes (see kernel_cache):
         template = """
-        #define NUM_COMPS %(num_comps)d
-
         __global__ void sum_input(%(type)s* res, int* delay, int* cumpre,
                                   int* npre, int* pre, %(type)s* pre_buffer,
-                                  int ld, int current, int buffer_length)
+                                  int ld, int current, int buffer_length,
+                                  int num_comps)
         {
             // must use block size (32, 32, 1)
             int tidx = threadIdx.x;
@@ -199,14 +902,14 @@ class NDComponent(object):
             if(tidy == 0)
             {
                 comp = bid * 32 + tidx;
-                if(comp < NUM_COMPS)
+                if(comp < num_comps)
                 {
                     num_pre[tidx] = npre[comp];
                 }
             } else if(tidy == 1)
             {
                 comp = bid * 32 + tidx;
-                if(comp < NUM_COMPS)
+                if(comp < num_comps)
                 {
                     pre_start[tidx] = cumpre[comp];
                 }
@@ -217,7 +920,7 @@ class NDComponent(object):
             __syncthreads();
 
             comp = bid * 32 + tidy ;
-            if(comp < NUM_COMPS){
+            if(comp < num_comps){
                int dl;
                int col;
                int n_pre = num_pre[tidy];
@@ -264,7 +967,7 @@ class NDComponent(object):
             {
                 input[tidx][0] += input[tidx][1];
                 comp = bid*32+tidx;
-                if(comp < NUM_COMPS)
+                if(comp < num_comps)
                 {
                     res[comp] = input[tidx][0];
                 }
@@ -273,11 +976,10 @@ class NDComponent(object):
         }
         //can be improved
         """
-        mod = SourceModule(template % {"num_comps": num_comps,
-                                       "type": dtype_to_ctype(dtype)},
-                           options=self.compile_options)
+        mod = SourceModule(template % {"type": dtype_to_ctype(dtype)},
+                           options=self.generic_compile_options)
         func = mod.get_function("sum_input")
-        func.prepare('PPPPPPiii')
+        func.prepare('PPPPPPiiii')
         self.__block_sum = (32, 32, 1)
         self.__grid_sum = ((num_comps - 1) / 32 + 1, 1)
         return func
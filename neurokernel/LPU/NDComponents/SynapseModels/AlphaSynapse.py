@@ -1,11 +1,10 @@
 from collections import OrderedDict
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
+from neurokernel.LPU.utils.lazy import garray, dtype_to_ctype, cuda, \
+    SourceModule
 
+from neurokernel.LPU.NDComponents.NDComponent import _variant_classes
 from .BaseSynapseModel import BaseSynapseModel
 # The following kernel assumes a maximum of one input connection
 # per neuron
@@ -15,6 +14,20 @@ class AlphaSynapse(BaseSynapseModel):
     states = OrderedDict([('a0', 0.), ('a1', 0.), ('a2', 0.)])
     params = OrderedDict([('ar', 1.), ('ad', 1.), ('gmax', 1.0),
         ('reverse', -65.)])
+    supports_broadcast_params = True
+    # The states do not depend on gmax, so synapses with the same input,
+    # delay and rise/decay rates can share them:
+    shared_state_params = ['ar', 'ad']
+    derived_params = OrderedDict([('rate_sum', 'ar+ad'),
+                                  ('rate_product', 'ar*ad')])
+    # Derived parameters of the exact propagator (see with_integrator): the
+    # decay of the slower eigenmode over a step and the coupling
+    # (exp(-ar*dt)-exp(-ad*dt))/(ad-ar) of a0 and a1, computed without
+    # cancellation when ar and ad are close:
+    exact_params = OrderedDict([
+        ('decay', 'exp(-ad*dt)'),
+        ('coupling', 'dt*exp(-ar*dt) if ad == ar else '
+                     '-exp(-min(ar, ad)*dt)*expm1(-abs(ad-ar)*dt)/abs(ad-ar)')])
     cuda_src = cuda_src = cuda_src = """
 # if (defined(USE_DOUBLE))
 #    define FLOATTYPE double
@@ -34,6 +47,31 @@ class AlphaSynapse(BaseSynapseModel):
 #     define INTTYPE int
 # endif
 #
+# define PARAM_INDEX(name, i) ((i)*name##_STRIDE)
+#
+// C0 and C1 are the derived parameters of the propagator: ar+ad and ar*ad
+// for forward Euler, decay and coupling for the exact propagator, which
+// advances the linear dynamics between spikes in closed form:
+# if (defined(EXACT_PROPAGATOR))
+#    define PROPAGATE(old_a, new_a, i) { \
+         ar = Ar[PARAM_INDEX(ar, i)]; \
+         ad = Ad[PARAM_INDEX(ad, i)]; \
+         decay = C0[PARAM_INDEX(decay, i)]; \
+         coupling = C1[PARAM_INDEX(coupling, i)]; \
+         u = ad*old_a[0] + old_a[1]; \
+         new_a[0] = decay*old_a[0] + coupling*u; \
+         new_a[1] = decay*old_a[1] - ar*coupling*u; \
+         new_a[2] = -( ar+ad )*old_a[1] - ar*ad*old_a[0]; \
+         jump = ar*ad; }
+# else
+#    define PROPAGATE(old_a, new_a, i) { \
+         rate_sum = C0[PARAM_INDEX(rate_sum, i)]; \
+         rate_product = C1[PARAM_INDEX(rate_product, i)]; \
+         new_a[0] = FMAX( 0., old_a[0] + dt*old_a[1] ); \
+         new_a[1] = old_a[1] + dt*old_a[2]; \
+         new_a[2] = -rate_sum*old_a[1] - rate_product*old_a[0]; \
+         jump = rate_product; }
+# endif
 
 __global__ void alpha_synapse(
     int num,
@@ -44,6 +82,8 @@ __global__ void alpha_synapse(
     INTTYPE buffer_length,
     FLOATTYPE *Ar,
     FLOATTYPE *Ad,
+    FLOATTYPE *C0,
+    FLOATTYPE *C1,
     FLOATTYPE *Gmax,
     FLOATTYPE *a0,
     FLOATTYPE *a1,
@@ -56,7 +96,7 @@ __global__ void alpha_synapse(
 {
     int tid = threadIdx.x + blockIdx.x*blockDim.x;
     int tot_threads = gridDim.x * blockDim.x;
-    FLOATTYPE ar,ad,gmax;
+    FLOATTYPE ar,ad,decay,coupling,u,rate_sum,rate_product,jump,gmax;
     FLOATTYPE old_a[3];
     FLOATTYPE new_a[3];
     INTTYPE pre;
@@ -65,22 +105,18 @@ __global__ void alpha_synapse(
     for (int i=tid; i<num; i+=tot_threads) {
         // copy data from global memory to register
         if(npre[i]){
-            ar = Ar[i];
-            ad = Ad[i];
-            gmax = Gmax[i];
+            gmax = Gmax[PARAM_INDEX(gmax, i)];
             old_a[0] = a0[i];
             old_a[1] = a1[i];
             old_a[2] = a2[i];
             // update the alpha function
-            new_a[0] = FMAX( 0., old_a[0] + dt*old_a[1] );
-            new_a[1] = old_a[1] + dt*old_a[2];
+            PROPAGATE(old_a, new_a, i);
             col = current-delay[i];
             if (col < 0)
                 col = buffer_length + col;
             pre = col*ld + Pre[cumpre[i]];
             if (spike[pre])
-                new_a[1] += ar*ad;
-            new_a[2] = -( ar+ad )*old_a[1] - ar*ad*old_a[0];
+                new_a[1] += jump;
 
 
             // copy data from register to the global memory
@@ -93,9 +129,119 @@ __global__ void alpha_synapse(
     }
     return;
 }
+
+// Update the states shared by each class of synapses using the connection
+// and parameters of a representative synapse of the class:
+__global__ void alpha_synapse_shared(
+    int num_states,
+    FLOATTYPE dt,
+    INTTYPE *spike,
+    INTTYPE ld,
+    INTTYPE current,
+    INTTYPE buffer_length,
+    FLOATTYPE *Ar,
+    FLOATTYPE *Ad,
+    FLOATTYPE *C0,
+    FLOATTYPE *C1,
+    FLOATTYPE *a0,
+    FLOATTYPE *a1,
+    FLOATTYPE *a2,
+    INTTYPE *rep,
+    INTTYPE *Pre,
+    INTTYPE *npre,
+    INTTYPE *cumpre,
+    INTTYPE *delay)
+{
+    int tid = threadIdx.x + blockIdx.x*blockDim.x;
+    int tot_threads = gridDim.x * blockDim.x;
+    FLOATTYPE ar,ad,decay,coupling,u,rate_sum,rate_product,jump;
+    FLOATTYPE old_a[3];
+    FLOATTYPE new_a[3];
+    INTTYPE pre;
+
+    INTTYPE i, col;
+    for (int c=tid; c<num_states; c+=tot_threads) {
+        i = rep[c];
+        if(npre[i]){
+            old_a[0] = a0[c];
+            old_a[1] = a1[c];
+            old_a[2] = a2[c];
+            // update the alpha function
+            PROPAGATE(old_a, new_a, i);
+            col = current-delay[i];
+            if (col < 0)
+                col = buffer_length + col;
+            pre = col*ld + Pre[cumpre[i]];
+            if (spike[pre])
+                new_a[1] += jump;
+
+            a0[c] = new_a[0];
+            a1[c] = new_a[1];
+            a2[c] = new_a[2];
+        }
+    }
+    return;
+}
+
+// Scale the shared state of the class of each synapse by its gmax:
+__global__ void alpha_synapse_output(
+    int num,
+    INTTYPE *state_class,
+    FLOATTYPE *Gmax,
+    FLOATTYPE *a0,
+    INTTYPE *npre,
+    FLOATTYPE *cond)
+{
+    int tid = threadIdx.x + blockIdx.x*blockDim.x;
+    int tot_threads = gridDim.x * blockDim.x;
+
+    for (int i=tid; i<num; i+=tot_threads) {
+        if(npre[i])
+            cond[i] = a0[state_class[i]]*Gmax[PARAM_INDEX(gmax, i)];
+        else
+            cond[i] = 0;
+    }
+    return;
+}
 """
 
     def run_step(self, update_pointers, st = None):
+        # Derived parameters of the propagator:
+        c0, c1 = [v.gpudata for v in self.derived_dict.values()]
+        if 'state_class' in self.params_dict:
+            self.update_func.prepared_async_call(
+                self.update_func.gpu_grid,
+                self.update_func.gpu_block,
+                st,
+                self.num_states,
+                self.dt,
+                self.access_buffers['spike_state'].gpudata,
+                self.access_buffers['spike_state'].ld,
+                self.access_buffers['spike_state'].current,
+                self.access_buffers['spike_state'].buffer_length,
+                self.params_dict['ar'].gpudata,
+                self.params_dict['ad'].gpudata,
+                c0, c1,
+                self.states['a0'].gpudata,
+                self.states['a1'].gpudata,
+                self.states['a2'].gpudata,
+                self.params_dict['state_rep'].gpudata,
+                self.params_dict['pre']['spike_state'].gpudata,
+                self.params_dict['npre']['spike_state'].gpudata,
+                self.params_dict['cumpre']['spike_state'].gpudata,
+                self.params_dict['conn_data']['spike_state']['delay'].gpudata)
+            output_func = self.update_func.output_func
+            output_func.prepared_async_call(
+                output_func.gpu_grid,
+                output_func.gpu_block,
+                st,
+                self.num_comps,
+                self.params_dict['state_class'].gpudata,
+                self.params_dict['gmax'].gpudata,
+                self.states['a0'].gpudata,
+                self.params_dict['npre']['spike_state'].gpudata,
+                update_pointers['g'])
+            return
         self.update_func.prepared_async_call(
             self.update_func.gpu_grid,
             self.update_func.gpu_block,
@@ -108,6 +254,7 @@ __global__ void alpha_synapse(
             self.access_buffers['spike_state'].buffer_length,
             self.params_dict['ar'].gpudata,
             self.params_dict['ad'].gpudata,
+            c0, c1,
             self.params_dict['gmax'].gpudata,
             self.states['a0'].gpudata,
             self.states['a1'].gpudata,
@@ -118,12 +265,120 @@ __global__ void alpha_synapse(
             self.params_dict['cumpre']['spike_state'].gpudata,
             self.params_dict['conn_data']['spike_state']['delay'].gpudata)
 
+    @classmethod
+    def with_integrator(cls, integrator):
+        """
+        Return a version of the model that uses another propagator.
+
+        With the 'exact' propagator, the states are advanced by the matrix
+        exponential of their linear dynamics between spikes, computed once
+        for each synapse from ar, ad and dt (see `exact_params`). Unlike
+        forward Euler ('euler'), it is exact and stable at any time step.
+
+        Parameters
+        ----------
+        integrator : str
+            'euler' or 'exact'.
+
+        Returns
+        -------
+        cls : type
+            Subclass of the model with the same name, or the model itself if
+            it already uses the propagator.
+        """
+        if integrator == cls.integrator:
+            return cls
+        if integrator not in ['euler', 'exact']:
+            raise ValueError('%s does not support the %s integrator' %
+                             (cls.__name__, integrator))
+        key = (cls, integrator)
+        if key not in _variant_classes:
+            derived = cls.exact_params if integrator == 'exact' else \
+                      AlphaSynapse.derived_params
+            _variant_classes[key] = type(cls)(cls.__name__, (cls,), {
+                '__module__': cls.__module__,
+                '__doc__': cls.__doc__,
+                'integrator': integrator,
+                'derived_params': derived})
+        return _variant_classes[key]
+
+    def update_numpy(self, inputs):
+        """
+        Advance the synapses by one step on the host.
+
+        Computes the same step as `run_step`.
+
+        Parameters
+        ----------
+        inputs : dict
+            Presynaptic spike state of each synapse ('spike_state'), after
+            its delay.
+
+        Returns
+        -------
+        updates : OrderedDict
+            Conductance of each synapse ('g').
+        """
+        spike = np.asarray(inputs['spike_state']) != 0
+        active = self.params_dict['npre']['spike_state'].get() > 0
+        ar, ad = self.get_param('ar'), self.get_param('ad')
+        c0, c1 = [np.broadcast_to(v.get(), (self.num_comps,))
+                  for v in self.derived_dict.values()]
+        if 'state_rep' in self.params_dict:
+            # Shared states evolve like their representative synapse:
+            rep = self.params_dict['state_rep'].get()
+            spike, active, ar, ad, c0, c1 = \
+                [v[rep] for v in [spike, active, ar, ad, c0, c1]]
+        a0, a1, a2 = [self.states[k].get() for k in ['a0', 'a1', 'a2']]
+        if self.integrator == 'exact':
+            u = ad*a0+a1
+            new_a0 = c0*a0+c1*u
+            new_a1 = c0*a1-ar*c1*u
+            new_a2 = -(ar+ad)*a1-ar*ad*a0
+            jump = ar*ad
+        else:
+            new_a0 = np.maximum(0., a0+self.dt*a1)
+            new_a1 = a1+self.dt*a2
+            new_a2 = -c0*a1-c1*a0
+            jump = c1
+        new_a1 = np.where(spike, new_a1+jump, new_a1)
+        for k, v, old in [('a0', new_a0, a0), ('a1', new_a1, a1),
+                          ('a2', new_a2, a2)]:
+            self.states[k].set(np.where(active, v, old).astype(
+                self.floattype))
+        a0 = self.states['a0'].get()
+        if 'state_class' in self.params_dict:
+            a0 = a0[self.params_dict['state_class'].get()]
+        g = np.where(self.params_dict['npre']['spike_state'].get() > 0,
+                     a0*self.get_param('gmax'), 0.)
+        return OrderedDict([('g', g.astype(self.floattype))])
+
     def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
+        options = self.compile_options
+        if self.integrator == 'exact':
+            options = options+['-DEXACT_PROPAGATOR']
+        mod = SourceModule(self.cuda_src, options=options)
+        if 'state_class' in self.params_dict:
+            func = mod.get_function("alpha_synapse_shared")
+            func.prepare(
+                np.dtype(self.inttype).char+np.dtype(self.floattype).char+'P' + \
+                np.dtype(self.inttype).char*3 + 'P'*12)
+            func.gpu_block = (128,1,1)
+            func.gpu_grid = (min( 6*cuda.Context.get_device().MULTIPROCESSOR_COUNT,\
+                                  (self.num_states-1)/128 + 1), 1)
+
+            output_func = mod.get_function("alpha_synapse_output")
+            output_func.prepare(np.dtype(self.inttype).char + 'P'*5)
+            output_func.gpu_block = (128,1,1)
+            output_func.gpu_grid = (min( 6*cuda.Context.get_device().MULTIPROCESSOR_COUNT,\
+                                         (self.num_comps-1)/128 + 1), 1)
+            func.output_func = output_func
+            return func
+
         func = mod.get_function("alpha_synapse")
         func.prepare(
             np.dtype(self.inttype).char+np.dtype(self.floattype).char+'P' + \
-            np.dtype(self.inttype).char*3 + 'P'*11)
+            np.dtype(self.inttype).char*3 + 'P'*13)
 
         func.gpu_block = (128,1,1)
         func.gpu_grid = (min( 6*cuda.Context.get_device().MULTIPROCESSOR_COUNT,\
@@ -3,9 +3,7 @@
 from abc import ABCMeta, abstractmethod, abstractproperty
 
 import numpy as np
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
+from neurokernel.LPU.utils.lazy import dtype_to_ctype, cuda, SourceModule
 
 from neurokernel.LPU.NDComponents.NDComponent import NDComponent
 
@@ -15,7 +13,12 @@ class BaseSynapseModel(NDComponent):
     accesses = ['V']
     updates = ['g']
 
+    def gather_inputs(self, st=None):
+        for k in self.inputs:
+            self.retrieve_buffer(k, st=st)
+
     def retrieve_buffer(self, param, st = None):
+        if self._hold_inputs: return
         self.retrieve_buffer_funcs[param].prepared_async_call(
             self.retrieve_buffer_funcs[param].grid,
             self.retrieve_buffer_funcs[param].block,
@@ -30,6 +33,8 @@ class BaseSynapseModel(NDComponent):
             self.params_dict['conn_data'][param]['delay'].gpudata,
             self.inputs[param].gpudata,
             self.num_comps)
+        if self.timer is not None:
+            self.timer.mark('%s/inputs' % type(self).__name__)
 
     def get_retrieve_buffer_func(self, param, dtype):
         template = """
@@ -59,7 +64,7 @@ __global__ void retrieve(%(type)s* buffer, int buffer_ld, int current,
 }
         """
         mod = SourceModule(template % {"type":dtype_to_ctype(dtype)},
-                           options=self.compile_options)
+                           options=self.generic_compile_options)
         func = mod.get_function("retrieve")
         func.prepare('PiiiPPPPPi')
         func.block = (256,1,1)
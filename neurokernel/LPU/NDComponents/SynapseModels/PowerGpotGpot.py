@@ -3,11 +3,6 @@ from collections import OrderedDict
 
 import numpy as np
 
-import pycuda.gpuarray as garray
-from pycuda.tools import dtype_to_ctype
-import pycuda.driver as cuda
-from pycuda.compiler import SourceModule
-
 from .BaseSynapseModel import BaseSynapseModel
 
 #This class assumes a single pre synaptic connection per component instance
@@ -20,57 +15,14 @@ class PowerGPotGPot(BaseSynapseModel):
         ('power', 1.0),
         ('saturation', 0.4),
         ('reverse', -50.)])
+    supports_broadcast_params = True
     states = OrderedDict()
     max_dt = None
-    cuda_src = """
-# if (defined(USE_DOUBLE))
-#    define FLOATTYPE double
-#    define EXP exp
-#    define POW pow
-#    define FMAX fmax
-#    define FMIN fmin
-# else
-#    define FLOATTYPE float
-#    define EXP expf
-#    define POW powf
-#    define FMAX fmaxf
-#    define FMIN fminf
-# endif
-#
-# if (defined(USE_LONG_LONG))
-#     define INTTYPE long long
-# else
-#     define INTTYPE int
-# endif
-
-__global__ void PowerGPotGPot(int num_comps, FLOATTYPE dt, int steps,
-    FLOATTYPE *g_V,
-    FLOATTYPE *g_threshold,
-    FLOATTYPE *g_slope,
-    FLOATTYPE *g_power,
-    FLOATTYPE *g_saturation,
-    FLOATTYPE *g_g)
-{
-    int tid = threadIdx.x + blockIdx.x * blockDim.x;
-    int total_threads = gridDim.x * blockDim.x;
-
-    FLOATTYPE V;
-    FLOATTYPE threshold;
-    FLOATTYPE slope;
-    FLOATTYPE power;
-    FLOATTYPE saturation;
-
-    for (int i = tid; i < num_comps; i += total_threads) {
-        V = g_V[i];
-        threshold = g_threshold[i];
-        slope = g_slope[i];
-        power = g_power[i];
-        saturation = g_saturation[i];
-
-        g_g[i] = FMIN(saturation, slope*POW(fmax(0.0,V-threshold),power));
-    }
-}
+    time_scale = 1000. # the equations are in ms
+    equations = """
+g = min(saturation, slope*pow(max(0.0, V-threshold), power))
 """
+
     def __init__(self, params_dict, access_buffers, dt, LPU_id=None,
         debug=False, cuda_verbose=False):
         super(PowerGPotGPot, self).__init__(params_dict, access_buffers, dt,
@@ -82,28 +34,6 @@ __global__ void PowerGPotGPot(int num_comps, FLOATTYPE dt, int steps,
                 self.get_retrieve_buffer_func(
                     k, dtype = self.access_buffers[k].dtype)
 
-    def run_step(self, update_pointers, st = None):
-        # retrieve all buffers into a linear array
-        for k in self.inputs:
-            self.retrieve_buffer(k, st = st)
-
-        self.update_func.prepared_async_call(
-            self.update_func.grid, self.update_func.block, st,
-            self.num_comps, self.dt*1000, self.steps,
-            *[self.inputs[k].gpudata for k in self.accesses]+\
-            [self.params_dict[k].gpudata for k in self.params if k != 'reverse']+\
-            [self.states[k].gpudata for k in self.states]+\
-            [update_pointers[k] for k in self.updates])
-
-    def get_update_func(self):
-        mod = SourceModule(self.cuda_src, options=self.compile_options)
-        func = mod.get_function("PowerGPotGPot")
-        func.prepare('i'+np.dtype(self.floattype).char+'i'+'P'*(self.num_garray-1))
-        func.block = (256,1,1)
-        func.grid = (min(6 * cuda.Context.get_device().MULTIPROCESSOR_COUNT,
-                         (self.num_comps-1) / 256 + 1), 1)
-        return func
-
 
 if __name__ == '__main__':
     import argparse
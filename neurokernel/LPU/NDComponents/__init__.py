@@ -1,5 +1,7 @@
 import os
 import fnmatch
+import importlib
+import re
 
 __all__ = []
 
@@ -12,3 +14,56 @@ for root, dirnames, filenames in os.walk(NDC_dir):
                 __path__.append(root)
                 mod_imp = True
             __all__.append(f[:-3])
+
+# Module defining each class of the package, found without importing the
+# modules (which is only done when a model is requested):
+_model_modules = None
+
+def _find_models():
+    models = {}
+    for root, dirnames, filenames in os.walk(NDC_dir):
+        for f in fnmatch.filter(filenames, "*.py"):
+            if '__init__'==f[:8]: continue
+            with open(os.path.join(root, f)) as fh:
+                for name in re.findall(r'^class\s+(\w+)', fh.read(), re.M):
+                    models[name] = f[:-3]
+    return models
+
+def _all_subclasses(cls):
+    subclasses = []
+    for subclass in cls.__subclasses__():
+        subclasses.append(subclass)
+        subclasses.extend(_all_subclasses(subclass))
+    return subclasses
+
+def model_names():
+    """
+    Return the names of the models implemented in this package.
+    """
+
+    global _model_modules
+    if _model_modules is None:
+        _model_modules = _find_models()
+    return sorted([name for name in _model_modules
+                   if name != 'NDComponent' and name[:4] != 'Base'])
+
+def get_model(name):
+    """
+    Return the NDComponent subclass implementing a model, or None.
+
+    The module of a model of this package is imported the first time the
+    model is requested. Subclasses of NDComponent defined elsewhere are found
+    if their module has been imported.
+    """
+
+    global _model_modules
+    if _model_modules is None:
+        _model_modules = _find_models()
+    if name in _model_modules:
+        module = importlib.import_module(__name__+'.'+_model_modules[name])
+        return getattr(module, name)
+    from .NDComponent import NDComponent
+    for cls in _all_subclasses(NDComponent):
+        if cls.__name__ == name:
+            return cls
+    return None
@@ -1,8 +1,6 @@
-import pycuda.gpuarray as garray
+from neurokernel.LPU.utils.lazy import garray, dtype_to_ctype, \
+    context_dependent_memoize, elementwise
 import numpy as np
-from neurokernel.LPU.LPU import LPU
-from pycuda.tools import dtype_to_ctype, context_dependent_memoize
-import pycuda.elementwise as elementwise
 
 class BaseOutputProcessor(object):
     def __init__(self, var_list, sample_interval=1):
@@ -28,6 +26,8 @@ class BaseOutputProcessor(object):
 
     @LPU_obj.setter
     def LPU_obj(self, value):
+        # Imported here so that processors can be created without the GPU:
+        from neurokernel.LPU.LPU import LPU
         assert(isinstance(value, LPU))
         self._LPU_obj = value
         self.start_time = self._LPU_obj.time
@@ -66,11 +66,13 @@ class BaseOutputProcessor(object):
                 uids = []
                 inds = []
                 for uid in d['uids']:
-                    try:
-                        inds.append(v_dict['uids'][uid])
-                        uids.append(uid)
-                    except:
-                        pass
+                    # Replicated components are output for each replica
+                    for u in self.LPU_obj.replica_uids(uid):
+                        try:
+                            inds.append(v_dict['uids'][u])
+                            uids.append(u)
+                        except:
+                            pass
                 inds = np.array(inds,np.int32)
                 o = np.argsort(inds)
                 self.src_inds[var] = garray.to_gpu(inds[o])
@@ -92,6 +94,16 @@ class BaseOutputProcessor(object):
     def post_run(self):
         pass
 
+    def get_checkpoint(self):
+        # Derived classes with additional state should extend this method
+        # and set_checkpoint
+        return {'epoch': self.epoch}
+
+    def set_checkpoint(self, state):
+        self.epoch = int(state['epoch'])
+        # Output starts at the time the simulation is resumed from
+        self.start_time = self.LPU_obj.time
+
     def get_inds(self, src, dest, inds, src_shift=0):
         """
         Set `dest[i] = src[src_shift+inds[i]] for i in range(len(inds))`
@@ -30,4 +30,8 @@ class FileOutputProcessor(BaseOutputProcessor):
     def post_run(self):
         self.h5file.close()
 
+    def set_checkpoint(self, state):
+        super(FileOutputProcessor, self).set_checkpoint(state)
+        self.h5file['metadata'].attrs['start_time'] = self.start_time
+
     
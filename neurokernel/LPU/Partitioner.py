@@ -0,0 +1,502 @@
+#!/usr/bin/env python
+
+"""
+Partition a circuit into several LPUs connected through generated ports.
+"""
+
+import collections
+from collections import OrderedDict
+import heapq
+import itertools
+
+import numpy as np
+
+class Partition(object):
+    """
+    Result of partitioning a circuit into several LPUs.
+
+    Attributes
+    ----------
+    lpu_ids : list
+        Ids of the LPUs.
+    parts : dict
+        Index of the LPU to which each component of the circuit is assigned.
+    lpus : OrderedDict
+        (comp_dict, conns) of each LPU, in the format consumed by `LPU`,
+        including the generated ports.
+    connections : dict
+        List of (out selector, in selector, port type) tuples describing the
+        connections from the first to the second LPU of each key
+        (lpu id 0, lpu id 1).
+    weights : list
+        Estimated cost of each LPU.
+    cut : int
+        Number of connections between components in different LPUs.
+    """
+
+    def __init__(self, lpu_ids, parts, lpus, connections, weights, cut):
+        self.lpu_ids = lpu_ids
+        self.parts = parts
+        self.lpus = lpus
+        self.connections = connections
+        self.weights = weights
+        self.cut = cut
+
+    @property
+    def imbalance(self):
+        """Ratio between the cost of the most expensive LPU and the average."""
+        return max(self.weights)/np.mean(self.weights)
+
+    def pattern(self, id_0, id_1):
+        """
+        Create the pattern connecting two LPUs.
+
+        Parameters
+        ----------
+        id_0, id_1 : str
+            Ids of the LPUs.
+
+        Returns
+        -------
+        pat : neurokernel.pattern.Pattern
+            Pattern whose interfaces 0 and 1 contain the ports of `id_0` and
+            `id_1` that connect the two LPUs, suitable for
+            `Manager.connect(id_0, id_1, pat, 0, 1)`.
+        """
+
+        import neurokernel.pattern as pattern
+
+        conns = [(a, b, t, 0) for a, b, t in \
+                 self.connections.get((id_0, id_1), [])] + \
+                [(b, a, t, 1) for a, b, t in \
+                 self.connections.get((id_1, id_0), [])]
+        sel_0 = ','.join(c[0] for c in conns)
+        sel_1 = ','.join(c[1] for c in conns)
+        pat = pattern.Pattern(sel_0, sel_1)
+        for sel_0, sel_1, port_type, d in conns:
+            if d == 0:
+                pat[sel_0, sel_1] = 1
+            else:
+                pat[sel_1, sel_0] = 1
+            pat.interface[sel_0, 'type'] = port_type
+            pat.interface[sel_1, 'type'] = port_type
+        return pat
+
+    def patterns(self):
+        """
+        Create the patterns between all pairs of connected LPUs.
+
+        Returns
+        -------
+        patterns : dict
+            Pattern of each pair (id_0, id_1) of connected LPUs.
+        """
+
+        pairs = set(tuple(sorted(k, key=self.lpu_ids.index)) \
+                    for k in self.connections)
+        return {(id_0, id_1): self.pattern(id_0, id_1) \
+                for id_0, id_1 in pairs}
+
+def _grow(weights, adj, num_parts):
+    """
+    Initial partition of a weighted graph by greedy graph growing.
+
+    Each part but the last is grown from an unassigned seed by repeatedly
+    adding the unassigned vertex with the heaviest connection to the part
+    until the part reaches its share of the total weight.
+    """
+
+    n = len(weights)
+    parts = np.full(n, num_parts-1, np.int64)
+    assigned = np.zeros(n, np.bool_)
+    remaining = float(np.sum(weights))
+    seeds = iter(range(n))
+    for p in range(num_parts-1):
+        target = remaining/(num_parts-p)
+        part_w = 0.
+        conn = {}
+        heap = []
+        while part_w < target:
+            v = None
+            while heap:
+                g, v = heapq.heappop(heap)
+                if not assigned[v] and -g == conn[v]:
+                    break
+                v = None
+            if v is None:
+                # Start from a new seed, e.g., in another connected component:
+                v = next((u for u in seeds if not assigned[u]), None)
+                if v is None:
+                    break
+            if part_w > 0 and part_w+weights[v]-target > target-part_w:
+                break
+            parts[v] = p
+            assigned[v] = True
+            part_w += weights[v]
+            for u, w in adj[v].items():
+                if not assigned[u]:
+                    conn[u] = conn.get(u, 0)+w
+                    heapq.heappush(heap, (-conn[u], u))
+        remaining -= part_w
+    return parts
+
+def _refine(weights, adj, parts, num_parts, max_weight, passes=10,
+            max_stall=100):
+    """
+    Reduce the cut of a partition by k-way Fiduccia-Mattheyses refinement.
+
+    In each pass, vertices are moved one at a time to the neighboring part
+    with the largest cut reduction (which may be negative) that respects
+    `max_weight`, and are locked once moved. The pass is then rolled back to
+    the prefix of moves with the smallest cut. Refinement stops when a pass
+    doesn't improve the cut.
+    """
+
+    part_w = np.bincount(parts, weights, num_parts)
+    part_n = np.bincount(parts, minlength=num_parts)
+
+    def best_move(v):
+        own = parts[v]
+        conn = collections.defaultdict(int)
+        for u, w in adj[v].items():
+            conn[parts[u]] += w
+        best = None
+        for p, c in conn.items():
+            if p == own or part_w[p]+weights[v] > max_weight:
+                continue
+            if best is None or c > best[1]:
+                best = (p, c)
+        if best is None or part_n[own] == 1:
+            return None
+        return best[1]-conn.get(own, 0), best[0]
+
+    for _ in range(passes):
+        heap = []
+        for v in range(len(weights)):
+            if any(parts[u] != parts[v] for u in adj[v]):
+                m = best_move(v)
+                if m is not None:
+                    heap.append((-m[0], v, m[1]))
+        heapq.heapify(heap)
+
+        locked = set()
+        moves = []
+        gain = best_gain = 0
+        best_len = 0
+        while heap and len(moves)-best_len < max_stall:
+            g, v, p = heapq.heappop(heap)
+            if v in locked:
+                continue
+            m = best_move(v)
+            if m is None:
+                continue
+            if m != (-g, p):
+                heapq.heappush(heap, (-m[0], v, m[1]))
+                continue
+            src = parts[v]
+            parts[v] = p
+            part_w[src] -= weights[v]
+            part_w[p] += weights[v]
+            part_n[src] -= 1
+            part_n[p] += 1
+            locked.add(v)
+            moves.append((v, src))
+            gain += -g
+            if gain > best_gain:
+                best_gain = gain
+                best_len = len(moves)
+            for u in adj[v]:
+                if u not in locked:
+                    m = best_move(u)
+                    if m is not None:
+                        heapq.heappush(heap, (-m[0], u, m[1]))
+
+        for v, src in reversed(moves[best_len:]):
+            p = parts[v]
+            parts[v] = src
+            part_w[p] -= weights[v]
+            part_w[src] += weights[v]
+            part_n[p] -= 1
+            part_n[src] += 1
+        if best_gain <= 0:
+            break
+    return parts
+
+def partition_graph(weights, adj, num_parts, imbalance=0.05, passes=10):
+    """
+    Partition a weighted undirected graph into balanced parts with a small cut.
+
+    Parameters
+    ----------
+    weights : array_like
+        Weight of each vertex.
+    adj : list of dict
+        Neighbors of each vertex mapped to the weight of the connecting edge;
+        must be symmetric.
+    num_parts : int
+        Number of parts.
+    imbalance : float
+        Maximum relative excess of the weight of a part over the average
+        allowed during refinement.
+    passes : int
+        Maximum number of refinement passes.
+
+    Returns
+    -------
+    parts : numpy.ndarray
+        Part of each vertex.
+    """
+
+    weights = np.asarray(weights, np.double)
+    if num_parts <= 1 or len(weights) == 0:
+        return np.zeros(len(weights), np.int64)
+    parts = _grow(weights, adj, num_parts)
+    max_weight = max(weights.sum()/num_parts*(1+imbalance),
+                     np.bincount(parts, weights, num_parts).max())
+    return _refine(weights, adj, parts, num_parts, max_weight, passes)
+
+def cut_size(adj, parts):
+    """Total weight of the edges between vertices in different parts."""
+    return sum(w for v in range(len(adj)) for u, w in adj[v].items() \
+               if parts[u] != parts[v])//2
+
+def partition(comp_dict, conns=None, num_parts=2, lpu_ids=None, costs=None,
+              uid_key='id', imbalance=0.05, passes=10):
+    """
+    Split a circuit into several LPUs.
+
+    Components are partitioned so that the estimated cost of the LPUs is
+    balanced and the number of connections between LPUs is small. Synapses
+    and dendrites are always placed with their post-synaptic component and
+    existing ports with the component they are connected to, so that only
+    connections from a neuron (or another component with outputs) to a
+    component in another LPU are cut. Each cut connection is replaced by an
+    output port in the LPU of the presynaptic component, an input port in
+    the LPU of the postsynaptic one and an entry of the pattern between the
+    two LPUs.
+
+    Parameters
+    ----------
+    comp_dict : dict or Graph
+        Components of the circuit in the format returned by
+        `LPU.graph_to_dicts`, or a `Graph` (in which case `conns` is
+        ignored).
+    conns : list
+        List of (pre, post, attributes) tuples of the connections. Defaults
+        to no connections.
+    num_parts : int
+        Number of LPUs.
+    lpu_ids : list of str
+        Ids of the LPUs, used as the first level of the generated port
+        selectors. Defaults to 'lpu_0', 'lpu_1', ...
+    costs : dict
+        Estimated cost of a component of each model. Models that are not
+        listed have a cost of 1.
+    uid_key : str
+        Key of the component ids in `comp_dict`.
+    imbalance : float
+        Maximum relative excess of the cost of an LPU over the average.
+    passes : int
+        Maximum number of min-cut refinement passes.
+
+    Returns
+    -------
+    result : Partition
+        The per-LPU comp_dicts and conns, and the inter-LPU connections.
+
+    Examples
+    --------
+    >>> p = partition(G, num_parts=2)
+    >>> for id in p.lpu_ids:
+    ...     man.add(LPU, id, dt, *p.lpus[id], device=p.lpu_ids.index(id))
+    >>> for (id_0, id_1), pat in p.patterns().items():
+    ...     man.connect(id_0, id_1, pat, 0, 1)
+
+    Notes
+    -----
+    Ports that already exist in the circuit keep their selectors.
+    """
+
+    from .Graph import Graph
+    from .NDComponents import BaseSynapseModel, BaseDendriteModel, \
+        get_model
+
+    if isinstance(comp_dict, Graph):
+        comp_dict, conns = comp_dict.to_lpu_args()
+        uid_key = 'id'
+    if conns is None:
+        conns = []
+    if lpu_ids is None:
+        lpu_ids = ['lpu_%s' % i for i in range(num_parts)]
+    assert(len(lpu_ids) == num_parts)
+    costs = costs or {}
+
+    uids = []
+    uid_model = {}
+    for model, attribs in comp_dict.items():
+        for uid in attribs[uid_key]:
+            uid_model[uid] = model
+            uids.append(uid)
+    index = {uid: i for i, uid in enumerate(uids)}
+    classes = {model: get_model(model) for model in comp_dict}
+
+    def follows_post(model):
+        cls = classes[model]
+        return cls is not None and \
+            issubclass(cls, (BaseSynapseModel.BaseSynapseModel,
+                             BaseDendriteModel.BaseDendriteModel))
+
+    # Merge components that must be in the same LPU:
+    leader = list(range(len(uids)))
+    def find(i):
+        while leader[i] != i:
+            leader[i] = leader[leader[i]]
+            i = leader[i]
+        return i
+    conns = [c for c in conns if c[0] in index and c[1] in index]
+    for c in conns:
+        pre_model = uid_model[c[0]]
+        post_model = uid_model[c[1]]
+        if follows_post(pre_model) or 'Port' in (pre_model, post_model):
+            leader[find(index[c[0]])] = find(index[c[1]])
+    roots = [find(i) for i in range(len(uids))]
+    cluster_ids = {r: k for k, r in enumerate(sorted(set(roots)))}
+    cluster = np.array([cluster_ids[r] for r in roots], np.int64)
+
+    # Graph of clusters weighted by component cost and number of connections:
+    weights = np.zeros(len(cluster_ids))
+    for i, uid in enumerate(uids):
+        weights[cluster[i]] += costs.get(uid_model[uid], 1.)
+    adj = [collections.defaultdict(int) for _ in range(len(cluster_ids))]
+    for c in conns:
+        a = cluster[index[c[0]]]
+        b = cluster[index[c[1]]]
+        if a != b:
+            adj[a][b] += 1
+            adj[b][a] += 1
+    cparts = partition_graph(weights, adj, num_parts, imbalance, passes)
+    part_of = {uid: int(cparts[cluster[i]]) for i, uid in enumerate(uids)}
+
+    # Split components:
+    lpus = OrderedDict()
+    rows = [collections.defaultdict(list) for _ in range(num_parts)]
+    for model, attribs in comp_dict.items():
+        for i, uid in enumerate(attribs[uid_key]):
+            rows[part_of[uid]][model].append(i)
+    for p, lpu_id in enumerate(lpu_ids):
+        lpu_comps = {}
+        for model, inds in rows[p].items():
+            lpu_comps[model] = {k: [v[i] for i in inds] \
+                                for k, v in comp_dict[model].items()}
+        lpus[lpu_id] = (lpu_comps, [])
+
+    def add_port(p, uid, selector, port_type, port_io):
+        port_comps = lpus[lpu_ids[p]][0].setdefault('Port', {
+            uid_key: [], 'selector': [], 'port_type': [], 'port_io': []})
+        n = len(port_comps[uid_key])
+        for k, v in port_comps.items():
+            if k not in (uid_key, 'selector', 'port_type', 'port_io'):
+                # Extra attributes of existing ports are left undefined:
+                v.append(None)
+        port_comps[uid_key].append(uid)
+        port_comps['selector'].append(selector)
+        port_comps['port_type'].append(port_type)
+        port_comps['port_io'].append(port_io)
+
+    # Split connections, routing cut ones through generated ports:
+    counters = collections.defaultdict(itertools.count)
+    out_ports = {}
+    in_ports = {}
+    connections = collections.defaultdict(list)
+    cut = 0
+    for c in conns:
+        pre, post = c[0], c[1]
+        data = dict(c[2]) if len(c) > 2 else {}
+        a, b = part_of[pre], part_of[post]
+        if a == b:
+            lpus[lpu_ids[a]][1].append((pre, post, data))
+            continue
+        cut += 1
+
+        var = data.get('variable', None)
+        if var is None:
+            pre_cls = classes[uid_model[pre]]
+            post_cls = classes[uid_model[post]]
+            if pre_cls is None:
+                raise ValueError('cannot infer the variable transmitted '
+                                 'from %s to %s' % (pre, post))
+            common = [v for v in pre_cls.updates if post_cls is None or \
+                      v in post_cls.accesses]
+            var = common[0] if common else pre_cls.updates[0]
+        port_type = 'spike' if var == 'spike_state' else 'gpot'
+        short = 'spk' if port_type == 'spike' else 'gpot'
+
+        if (pre, var) not in out_ports:
+            sel = '/%s/out/%s/%s' % (lpu_ids[a], short,
+                                     next(counters[(a, 'out', short)]))
+            uid = 'port_out_%s_%s' % (pre, var)
+            assert(uid not in index)
+            add_port(a, uid, sel, port_type, 'out')
+            lpus[lpu_ids[a]][1].append((pre, uid, {'variable': var}))
+            out_ports[(pre, var)] = sel
+        if (pre, var, b) not in in_ports:
+            sel = '/%s/in/%s/%s' % (lpu_ids[b], short,
+                                    next(counters[(b, 'in', short)]))
+            uid = 'port_in_%s_%s' % (pre, var)
+            assert(uid not in index)
+            add_port(b, uid, sel, port_type, 'in')
+            in_ports[(pre, var, b)] = (uid, sel)
+            connections[(lpu_ids[a], lpu_ids[b])].append(
+                (out_ports[(pre, var)], sel, port_type))
+        data['variable'] = var
+        lpus[lpu_ids[b]][1].append((in_ports[(pre, var, b)][0], post, data))
+
+    part_w = np.bincount(cparts, weights, num_parts).tolist()
+    return Partition(lpu_ids, part_of, lpus, dict(connections), part_w, cut)
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description='Partition a random clustered graph and report the '
+                    'quality of the result.')
+    parser.add_argument('-n', type=int, default=20000,
+                        help='Number of vertices [default: 20000]')
+    parser.add_argument('-k', type=int, default=4,
+                        help='Number of parts [default: 4]')
+    parser.add_argument('-d', type=int, default=10,
+                        help='Average degree [default: 10]')
+    parser.add_argument('-p', type=float, default=0.05,
+                        help='Fraction of edges between clusters [default: 0.05]')
+    parser.add_argument('-s', type=int, default=0,
+                        help='Seed [default: 0]')
+    args = parser.parse_args()
+
+    # Planted partition: vertices belong to k clusters, and a fraction p of
+    # the edges connect vertices in different clusters:
+    np.random.seed(args.s)
+    n, k = args.n, args.k
+    labels = np.random.randint(0, k, n)
+    members = [np.where(labels == i)[0] for i in range(k)]
+    adj = [collections.defaultdict(int) for _ in range(n)]
+    num_edges = n*args.d//2
+    src = np.random.randint(0, n, num_edges)
+    across = np.random.rand(num_edges) < args.p
+    for u, x in zip(src, across):
+        c = np.random.randint(0, k) if x else labels[u]
+        v = members[c][np.random.randint(0, len(members[c]))]
+        if u != v:
+            adj[u][v] += 1
+            adj[v][u] += 1
+    weights = np.ones(n)
+
+    start = time.time()
+    parts = partition_graph(weights, adj, k)
+    elapsed = time.time()-start
+    part_w = np.bincount(parts, weights, k)
+    print('vertices: %d, edges: %d' % (n, cut_size(adj, np.arange(n))))
+    print('planted cut:   %d' % cut_size(adj, labels))
+    print('random cut:    %d' % cut_size(adj, np.random.randint(0, k, n)))
+    print('partition cut: %d (imbalance %.3f, %.2f s)' % \
+          (cut_size(adj, parts), part_w.max()/part_w.mean(), elapsed))
@@ -0,0 +1,1259 @@
+#!/usr/bin/env python
+
+"""
+Generation of model kernels from update equations.
+
+A model is described by its parameters, states, accessed and updated
+variables and by the equations that advance it by one time step, written as
+Python assignments, e.g.::
+
+    bh = exp(-dt/(capacitance*resistance))
+    V = V*bh + (resistance*I+resting_potential)*(1.0-bh)
+    spike = V >= threshold
+    V = reset_potential if spike else V
+    spike_state = spike_state or spike
+
+`ModelCode` translates the equations into a CUDA kernel following the
+conventions of the hand-written NDComponents kernels and into an equivalent
+vectorized NumPy function, so that both are produced from a single source.
+
+Within the equations, parameters and accessed variables are read-only,
+states keep their values between steps and `dt` is the time step of the
+model. Any other name assigned to is a temporary that is set to 0 at the
+start of each step of the LPU; as the equations are evaluated `nsteps` times
+per step, temporaries that are updated variables can accumulate over the
+substeps (e.g., `spike_state` above). Each updated variable takes the final
+value of the state or temporary of the same name. Statements that only
+depend on parameters, accessed variables and `dt` are evaluated once per
+step rather than in every substep. Temporaries that only depend on
+parameters and `dt` are derived parameters: they are computed once for all
+steps by `ModelCode.evaluate_derived` and passed to the kernel like
+parameters.
+
+The expressions may use arithmetic and comparison operators, `and`, `or`,
+`not`, conditional expressions and the functions exp, expm1, log, sqrt, pow,
+tanh, cosh, sinh, abs, min and max; `/` always denotes floating point
+division. Variables named 'spike_state', and temporaries only assigned
+integer or boolean values, are integers; all other variables are floating
+point.
+
+A state x of a differential equation dx/dt = f can be advanced with::
+
+    x = integrate(x, f)
+
+which leaves the choice of the integration scheme to the `integrator`
+argument of `ModelCode`: forward Euler ('euler', i.e., x + dt*f) or
+exponential Euler ('exponential'), which remains stable for the stiff gating
+variables and membrane potentials of conductance-based models at much
+larger time steps.
+
+With the `tables` argument of `ModelCode`, the rate functions, i.e., the
+temporaries that only depend on one variable (e.g., the membrane potential)
+and on constants, are replaced by linear interpolation in tables of their
+values over a range of that variable; values outside the range are computed
+from the equations.
+
+With the `adaptive` argument, each component chooses the number of
+substeps of every step: the step is repeated with more substeps when one of
+the integrated states changes by more than its tolerance in a substep, and
+the number of substeps of the next step is chosen for changes of about 0.8
+of the tolerances, up to `nsteps`.
+"""
+
+import ast
+import copy
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    long
+except NameError:
+    long = int
+
+# Functions available in the equations and their CUDA and NumPy
+# counterparts:
+_functions = {
+    'exp': ('EXP', 'exp'),
+    'expm1': ('EXPM1', 'expm1'),
+    'log': ('LOG', 'log'),
+    'sqrt': ('SQRT', 'sqrt'),
+    'pow': ('POW', 'power'),
+    'tanh': ('TANH', 'tanh'),
+    'cosh': ('COSH', 'cosh'),
+    'sinh': ('SINH', 'sinh'),
+    'abs': ('FABS', 'abs'),
+    'min': ('FMIN', 'fmin'),
+    'max': ('FMAX', 'fmax')}
+
+_binops = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/',
+           ast.Mod: '%', ast.Pow: '**'}
+_cmpops = {ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=',
+           ast.Eq: '==', ast.NotEq: '!='}
+
+# Names used by the generated kernel:
+_reserved = set(['i', 'j', 'tid', 'total_threads', 'num_comps', 'nsteps'])
+
+_header = """
+# if (defined(USE_DOUBLE))
+#    define FLOATTYPE double
+#    define EXP exp
+#    define EXPM1 expm1
+#    define LOG log
+#    define SQRT sqrt
+#    define POW pow
+#    define TANH tanh
+#    define COSH cosh
+#    define SINH sinh
+#    define FABS fabs
+#    define FMIN fmin
+#    define FMAX fmax
+# else
+#    define FLOATTYPE float
+#    define EXP expf
+#    define EXPM1 expm1f
+#    define LOG logf
+#    define SQRT sqrtf
+#    define POW powf
+#    define TANH tanhf
+#    define COSH coshf
+#    define SINH sinhf
+#    define FABS fabsf
+#    define FMIN fminf
+#    define FMAX fmaxf
+# endif
+#
+# if (defined(USE_LONG_LONG))
+#     define INTTYPE long long
+# else
+#     define INTTYPE int
+# endif
+#
+# define PARAM_INDEX(name, i) ((i)*name##_STRIDE)
+"""
+
+_table_lookup = """// Linear interpolation in a table of values at x0 + k/inv_step:
+__device__ FLOATTYPE table_lookup(FLOATTYPE *table, FLOATTYPE x,
+                                  FLOATTYPE x0, FLOATTYPE inv_step)
+{
+    FLOATTYPE u = (x - x0) * inv_step;
+    int k = (int)u;
+    u -= k;
+    return table[k] + u * (table[k+1] - table[k]);
+}
+"""
+
+def _number(node):
+    # Value of a numeric or boolean literal, or None:
+    if type(node).__name__ in ['Num', 'Constant']:
+        value = node.n if type(node).__name__ == 'Num' else node.value
+        if isinstance(value, (bool, int, float)) or \
+           type(value).__name__ == 'long':
+            return value
+        raise ValueError('unsupported constant %r' % (value,))
+    if type(node).__name__ == 'NameConstant' or \
+       (isinstance(node, ast.Name) and node.id in ['True', 'False']):
+        value = node.value if type(node).__name__ == 'NameConstant' \
+                else node.id == 'True'
+        return value
+    return None
+
+def _const(value):
+    if hasattr(ast, 'Constant'):
+        return ast.Constant(value=value)
+    return ast.Num(n=value)
+
+def _call(func, *args):
+    return ast.Call(func=ast.Name(func, ast.Load()), args=list(args),
+                    keywords=[])
+
+# Construction of expressions in which None denotes 0:
+
+def _zero(node):
+    return node if node is not None else _const(0)
+
+def _add(a, b):
+    if a is None or b is None:
+        return b if a is None else a
+    return ast.BinOp(a, ast.Add(), b)
+
+def _neg(a):
+    if a is None:
+        return None
+    if _number(a) is not None:
+        return _const(-_number(a))
+    if isinstance(a, ast.UnaryOp) and isinstance(a.op, ast.USub):
+        return a.operand
+    return ast.UnaryOp(ast.USub(), a)
+
+def _sub(a, b):
+    return _add(a, _neg(b))
+
+def _mul(a, b):
+    if a is None or b is None:
+        return None
+    for x, y in [(a, b), (b, a)]:
+        if _number(x) == 1:
+            return y
+        if _number(x) == -1:
+            return _neg(y)
+    return ast.BinOp(a, ast.Mult(), b)
+
+def _div(a, b):
+    return None if a is None else ast.BinOp(a, ast.Div(), b)
+
+def _diff(node, x):
+    """
+    Derivative of an expression with respect to the variable `x`, or None
+    if it is 0.
+    """
+
+    if _number(node) is not None or getattr(node, '_frozen', False):
+        return None
+    if isinstance(node, ast.Name):
+        return _const(1) if node.id == x else None
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.USub):
+            return _neg(_diff(node.operand, x))
+        if isinstance(node.op, ast.UAdd):
+            return _diff(node.operand, x)
+        return None
+    if isinstance(node, (ast.Compare, ast.BoolOp)):
+        return None
+    if isinstance(node, ast.IfExp):
+        body = _diff(node.body, x)
+        orelse = _diff(node.orelse, x)
+        if body is None and orelse is None:
+            return None
+        return ast.IfExp(node.test, _zero(body), _zero(orelse))
+    if isinstance(node, ast.BinOp) or \
+       (isinstance(node, ast.Call) and node.func.id == 'pow'):
+        if isinstance(node, ast.Call):
+            a, b, op = node.args[0], node.args[1], ast.Pow()
+        else:
+            a, b, op = node.left, node.right, node.op
+        da = _diff(a, x)
+        db = _diff(b, x)
+        if isinstance(op, ast.Add):
+            return _add(da, db)
+        if isinstance(op, ast.Sub):
+            return _sub(da, db)
+        if isinstance(op, ast.Mult):
+            return _add(_mul(da, b), _mul(a, db))
+        if isinstance(op, ast.Div):
+            return _sub(_div(da, b), _div(_mul(a, db), _mul(b, b)))
+        if isinstance(op, ast.Mod):
+            return da
+        if isinstance(op, ast.Pow):
+            # d(a**b) = b*a**(b-1)*da + log(a)*a**b*db:
+            return _add(
+                _mul(_mul(b, ast.BinOp(a, ast.Pow(),
+                                       ast.BinOp(b, ast.Sub(), _const(1)))),
+                     da),
+                _mul(_mul(_call('log', a), ast.BinOp(a, ast.Pow(), b)), db))
+    if isinstance(node, ast.Call):
+        func = node.func.id
+        u = node.args[0]
+        du = _diff(u, x)
+        if func in ['min', 'max']:
+            dv = _diff(node.args[1], x)
+            if du is None and dv is None:
+                return None
+            test = ast.Compare(u, [ast.LtE() if func == 'min' else
+                                   ast.GtE()], [node.args[1]])
+            return ast.IfExp(test, _zero(du), _zero(dv))
+        if du is None:
+            return None
+        if func in ['exp', 'expm1']:
+            return _mul(_call('exp', u), du)
+        if func == 'log':
+            return _div(du, u)
+        if func == 'sqrt':
+            return _div(du, _mul(_const(2), _call('sqrt', u)))
+        if func == 'tanh':
+            return _mul(_sub(_const(1),
+                             ast.BinOp(_call('tanh', u), ast.Pow(),
+                                       _const(2))), du)
+        if func == 'cosh':
+            return _mul(_call('sinh', u), du)
+        if func == 'sinh':
+            return _mul(_call('cosh', u), du)
+        if func == 'abs':
+            return ast.IfExp(ast.Compare(u, [ast.GtE()], [_const(0)]),
+                             du, _neg(du))
+    raise ValueError('cannot differentiate %s' % type(node).__name__)
+
+def _lookup(tables, offset, x, x0, inv_step, n):
+    # Linear interpolation in the table starting at `offset`, which holds
+    # the values at x0 + k/inv_step, k = 0, ..., n+1; same computation as
+    # table_lookup in the kernels:
+    u = (x-x0)*inv_step
+    k = np.clip(np.floor(u), 0, n).astype(np.intp)
+    u = u-k
+    return tables[offset+k]+u*(tables[offset+k+1]-tables[offset+k])
+
+def _names(node):
+    # Names of the variables read by an expression:
+    funcs = set([id(n.func) for n in ast.walk(node)
+                 if isinstance(n, ast.Call)])
+    return set([n.id for n in ast.walk(node) if isinstance(n, ast.Name) and
+                n.id not in ['True', 'False'] and id(n) not in funcs])
+
+class ModelCode(object):
+    """
+    CUDA kernel and NumPy function generated from the equations of a model.
+
+    Parameters
+    ----------
+    name : str
+        Name of the model, used for error messages.
+    equations : str
+        Update equations of the model.
+    params : list
+        Names of the parameters.
+    states : OrderedDict
+        Names of the states and their default values; states with integer
+        defaults are integers.
+    accesses : list
+        Names of the accessed variables.
+    updates : list
+        Names of the updated variables.
+    integrator : str
+        Scheme of the `integrate` statements, 'euler' or 'exponential'.
+    tables : dict
+        Range and step `(low, high, step)` of the grid of each variable
+        whose rate functions are tabulated. The variables must be
+        floating point states or accessed variables.
+    adaptive : dict
+        Maximum change of each integrated state in a substep. If given, the
+        number of substeps is chosen by each component: the kernel and the
+        NumPy function then take the duration of the step instead of that
+        of a substep and `nsteps` is the maximum number of substeps. The
+        states must include the integers 'substeps', the number of substeps
+        of the next step, and 'substeps_taken', the number of substeps
+        computed in the last step (including repeated ones).
+
+    Attributes
+    ----------
+    params, states, accesses : list
+        Parameters, states and accessed variables used by the kernel, in the
+        order in which they are passed to it.
+    updates : list
+        Updated variables.
+    integrated : list
+        States advanced by `integrate`.
+    derived : OrderedDict
+        Derived parameters and the parameters they depend on.
+    cuda_src : str
+        Source of the kernel `update(num_comps, dt, nsteps, accesses...,
+        params..., derived..., states..., updates...)`.
+    numpy_src : str
+        Source of the NumPy function `update(num_comps, dt, nsteps, floattype,
+        inttype, accesses..., params..., derived..., states...)` returning
+        the new values of the states followed by the values of the updated
+        variables.
+    tables : list
+        Names of the tabulated rate functions and the variables they depend
+        on. If not empty, the kernel and the NumPy function take the values
+        returned by `build_tables` as their last argument.
+    table_grids : OrderedDict
+        Start, step and number of intervals of the grid of each variable.
+    table_size : int
+        Total number of values of the tables.
+    """
+
+    def __init__(self, name, equations, params, states, accesses, updates,
+                 integrator='euler', tables=None, adaptive=None):
+        self.name = name
+        self.integrator = integrator
+        self.updates = list(updates)
+        self.adaptive = OrderedDict(sorted((adaptive or {}).items()))
+        for k in ['substeps', 'substeps_taken']:
+            if self.adaptive and not isinstance(states.get(k), (int, long)):
+                self._error('adaptive substeps need the integer state %s' %
+                            k)
+        self.statements = self._integrate(
+            self._tabulate(self._parse(equations), states, accesses,
+                           tables or {}), states)
+
+        read = set()
+        assigned = []
+        for target, value in self.statements:
+            read.update(_names(value))
+            if target not in assigned:
+                assigned.append(target)
+        used = read.union(assigned).union(updates)
+        if self.adaptive:
+            used.update(['substeps', 'substeps_taken'])
+        for k in list(params)+list(accesses):
+            if k in assigned:
+                self._error('cannot assign to %s' % k)
+        for k in assigned:
+            if k in _reserved or k == 'dt':
+                self._error('%s is a reserved name' % k)
+
+        self.params = [k for k in params if k in used]
+        self.accesses = [k for k in accesses if k in used]
+        self.states = [k for k in states if k in used]
+        self.locals = [k for k in assigned if k not in states]
+        known = set(self.params+self.accesses+self.states+self.locals+['dt'])
+        for k in read.union(updates):
+            if k not in known:
+                self._error('undefined name %s' % k)
+
+        # Integer variables; states initialized to another state have its
+        # type, and temporaries are integers unless they are assigned a
+        # floating point value:
+        self.int_vars = set([k for k in self.states if isinstance(
+            states.get(states[k], states[k]), (int, long))])
+        self.int_vars.update(['spike_state']+
+                             [k for k in self.locals if k[0] != '_'])
+        changed = True
+        while changed:
+            changed = False
+            for target, value in self.statements:
+                if target in self.int_vars and target != 'spike_state' and \
+                   target in self.locals and not self._is_int(value):
+                    self.int_vars.discard(target)
+                    changed = True
+
+        self._hoist(states)
+        self._derive()
+        self.cuda_src = self._cuda()
+        self.numpy_src = self._numpy()
+        namespace = {}
+        exec(compile(self.numpy_src, '<%s equations>' % name, 'exec'),
+             {'_np': np, '_lookup': _lookup}, namespace)
+        self._numpy_func = namespace['update']
+        if self.derived:
+            exec(compile(self._derived_src(), '<%s derived parameters>' %
+                         name, 'exec'), {'_np': np}, namespace)
+            self._derived_func = namespace['derived']
+        self.table_size = self._table_offset(len(self.tables))
+        self._host_tables = {}
+
+    def _error(self, msg):
+        raise ValueError('%s: %s' % (self.name, msg))
+
+    def _parse(self, equations):
+        try:
+            tree = ast.parse(equations.strip())
+        except SyntaxError as e:
+            self._error('invalid equations: %s' % e)
+        statements = []
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and \
+               isinstance(node.targets[0], ast.Name):
+                statements.append((node.targets[0].id, node.value))
+            elif isinstance(node, ast.AugAssign) and \
+                 isinstance(node.target, ast.Name):
+                value = ast.BinOp(ast.Name(node.target.id, ast.Load()),
+                                  node.op, node.value)
+                statements.append((node.target.id, value))
+            else:
+                self._error('only assignments to single variables are '
+                            'supported (line %d)' % node.lineno)
+        return statements
+
+    def _tabulate(self, statements, states, accesses, tables):
+        # Replace the rate functions that are used by the other statements
+        # and call functions (e.g., exp) by lookups in tables, falling back
+        # to their expressions outside of the tabulated range. A temporary
+        # is a rate function of a variable if it only depends on constants,
+        # on the variable and on rate functions of the same value of the
+        # variable.
+        self.tables = []
+        self.table_grids = OrderedDict()
+        self._table_consts = []
+        self._table_exprs = []
+        for var in sorted(tables):
+            low, high, step = tables[var]
+            if var not in accesses and (var not in states or not isinstance(
+                    states.get(states[var], states[var]), float)):
+                self._error('cannot tabulate the functions of %s' % var)
+            if not high > low or not step > 0:
+                self._error('invalid grid of %s' % var)
+            n = int(np.ceil((high-low)/float(step)-1e-9))
+            self.table_grids[var] = (float(low), float(step), n)
+        if not self.table_grids:
+            return statements
+
+        counts = {}
+        early = set()
+        for target, value in statements:
+            early.update([k for k in _names(value) if k not in counts])
+            counts[target] = counts.get(target, 0)+1
+        consts = set()
+        rates = {}
+        version = dict.fromkeys(self.table_grids, 0)
+        info = []
+        def expand(node):
+            class Expand(ast.NodeTransformer):
+                def visit_Name(self, n):
+                    return rates[n.id][2] if n.id in rates else n
+            return Expand().visit(copy.deepcopy(node))
+        for target, value in statements:
+            names = _names(value)
+            entry = None
+            if target not in states and target not in self.updates and \
+               target not in early:
+                if counts[target] == 1 and names <= consts:
+                    consts.add(target)
+                    self._table_consts.append((target, value))
+                else:
+                    deps = names-consts
+                    found = set([k for k in deps if k in self.table_grids])
+                    found.update([rates[k][0] for k in deps if k in rates])
+                    if len(found) == 1:
+                        var = found.pop()
+                        if all([k == var or (k in rates and
+                                             rates[k][:2] == (var,
+                                                              version[var]))
+                                for k in deps]):
+                            entry = (var, version[var], expand(value))
+            if target in version:
+                version[target] += 1
+            rates.pop(target, None)
+            if entry is not None:
+                rates[target] = entry
+            info.append(entry)
+
+        # Rate functions used by the other statements:
+        current = {}
+        used = set()
+        for i, (target, value) in enumerate(statements):
+            if info[i] is None:
+                used.update([current[k] for k in _names(value)
+                             if k in current])
+            if info[i] is not None:
+                current[target] = i
+            else:
+                current.pop(target, None)
+        replaced = {}
+        for i in sorted(used):
+            target, value = statements[i]
+            var, _, expr = info[i]
+            if not any([isinstance(n, ast.Call) or
+                        (isinstance(n, ast.BinOp) and
+                         isinstance(n.op, ast.Pow)) for n in ast.walk(expr)]):
+                continue
+            low, step, n = self.table_grids[var]
+            lookup = _call('table', ast.Name(var, ast.Load()))
+            lookup._table = len(self.tables)
+            lookup._frozen = True
+            replaced[i] = ast.IfExp(
+                ast.Compare(_const(low), [ast.LtE(), ast.Lt()],
+                            [ast.Name(var, ast.Load()), _const(low+n*step)]),
+                lookup, expr)
+            self.tables.append((target, var))
+            self._table_exprs.append(copy.deepcopy(expr))
+
+        # Rate functions that are no longer needed:
+        needed = set(self.updates)
+        result = []
+        for i in reversed(range(len(statements))):
+            target, value = statements[i]
+            value = replaced.get(i, value)
+            if info[i] is not None and i not in replaced and \
+               target not in needed:
+                continue
+            needed.discard(target)
+            needed.update(_names(value))
+            result.append((target, value))
+        return result[::-1]
+
+    def _integrate(self, statements, states):
+        # Replace the statements x = integrate(x, f), which advance the
+        # state x over dt given its derivative f, by the update of the
+        # integrator:
+        #
+        # - 'euler': forward Euler, x + dt*f.
+        # - 'exponential': exponential Euler, x + (exp(J*dt)-1)/J*f with
+        #   J the derivative of f with respect to x, holding the
+        #   temporaries used by f constant. For gating variables
+        #   (f = a-b*x) and the membrane potential of conductance-based
+        #   models (f = I-g*(x-E)), this is the exact solution for the
+        #   other variables held constant over the step. f and J are
+        #   evaluated at the integrate statement, i.e., with the states
+        #   advanced by the preceding integrate statements, which gives a
+        #   staggered scheme (e.g., the membrane potential is advanced with
+        #   the updated gating variables).
+        if self.integrator not in ['euler', 'exponential']:
+            self._error('unsupported integrator %r' % self.integrator)
+        counts = {}
+        for target, value in statements:
+            if target[0] == '_':
+                self._error('names starting with _ are reserved')
+            counts[target] = counts.get(target, 0)+1
+
+        # Expressions of the temporaries in terms of the states; temporaries
+        # that are assigned once and do not depend on the states are kept.
+        # In `direct`, the temporaries used by the expressions are marked as
+        # constant for differentiation:
+        defs = {}
+        direct = {}
+        def expand(node, frozen=False):
+            class Expand(ast.NodeTransformer):
+                def visit_Name(self, n):
+                    if n.id not in defs:
+                        return n
+                    if not frozen:
+                        return defs[n.id]
+                    n = copy.copy(defs[n.id])
+                    n._frozen = True
+                    return n
+            return Expand().visit(copy.deepcopy(node))
+
+        result = []
+        self.integrated = []
+        for target, value in statements:
+            if isinstance(value, ast.Call) and \
+               isinstance(value.func, ast.Name) and \
+               value.func.id == 'integrate':
+                if target not in self.integrated:
+                    self.integrated.append(target)
+                if len(value.args) != 2 or \
+                   not isinstance(value.args[0], ast.Name) or \
+                   value.args[0].id != target or target not in states:
+                    self._error('integrate must be used as '
+                                'x = integrate(x, dx/dt) for a state x')
+                f = value.args[1]
+                if self.integrator == 'euler':
+                    steps = [(target, _add(ast.Name(target, ast.Load()),
+                                           _mul(ast.Name('dt', ast.Load()),
+                                                f)))]
+                elif isinstance(f, ast.Name) and f.id in direct:
+                    steps = self._step(target, expand(f), direct[f.id])
+                else:
+                    steps = self._step(target, expand(f), expand(f, True))
+                if target in self.adaptive:
+                    steps = steps[:-1]+self._control(target,
+                                                     steps[-1][1].right)
+                result.extend(steps)
+                continue
+            result.append((target, value))
+            if target not in states:
+                full = expand(value)
+                if counts[target] > 1 or _names(full) & set(states):
+                    defs[target] = full
+                    direct[target] = expand(value, True)
+        for k in self.adaptive:
+            if k not in self.integrated:
+                self._error('%s must be advanced by integrate to choose '
+                            'the substeps' % k)
+        if self.integrator == 'euler':
+            return result
+
+        # The temporaries used in the derivatives may no longer be needed:
+        needed = set(states).union(self.updates)
+        if self.adaptive:
+            needed.add('_r')
+        for target, value in reversed(result):
+            if target in needed or target in states:
+                needed.update(_names(value))
+        return [(t, v) for t, v in result if t in needed or t in states]
+
+    def _control(self, x, dx):
+        # Advance x by dx and record the largest change relative to the
+        # tolerance in _r:
+        d = ast.Name('_d_'+x, ast.Load())
+        return [('_d_'+x, dx), (x, _add(ast.Name(x, ast.Load()), d)),
+                ('_r', _call('max', ast.Name('_r', ast.Load()),
+                             _mul(_call('abs', d),
+                                  _const(1./self.adaptive[x]))))]
+
+    def _step(self, x, f, f_direct):
+        # Exponential Euler step of x given the expressions of its
+        # derivative for evaluation and for differentiation:
+        dt = ast.Name('dt', ast.Load())
+        try:
+            J = _diff(f_direct, x)
+        except ValueError as e:
+            self._error(str(e))
+        if J is None:
+            return [(x, _add(ast.Name(x, ast.Load()), _mul(dt, f)))]
+        fx = ast.Name('_f_'+x, ast.Load())
+        Jx = ast.Name('_J_'+x, ast.Load())
+        dx = ast.IfExp(
+            ast.Compare(Jx, [ast.Eq()], [_const(0)]), _mul(dt, fx),
+            _mul(_div(_call('expm1', _mul(Jx, dt)), Jx), fx))
+        return [('_f_'+x, f), ('_J_'+x, J),
+                (x, _add(ast.Name(x, ast.Load()), dx))]
+
+    def _is_int(self, node):
+        if _number(node) is not None:
+            return not isinstance(_number(node), float)
+        if isinstance(node, ast.Name):
+            return node.id in self.int_vars
+        if isinstance(node, (ast.Compare, ast.BoolOp)) or \
+           (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)):
+            return True
+        if isinstance(node, ast.UnaryOp):
+            return self._is_int(node.operand)
+        if isinstance(node, ast.BinOp):
+            return type(node.op) in [ast.Add, ast.Sub, ast.Mult, ast.Mod] and \
+                self._is_int(node.left) and self._is_int(node.right)
+        if isinstance(node, ast.IfExp):
+            return self._is_int(node.body) and self._is_int(node.orelse)
+        return False
+
+    def _hoist(self, states):
+        # Split the statements into those evaluated once per step and those
+        # evaluated in every substep:
+        invariant = set(self.params+self.accesses)
+        if not self.adaptive:
+            invariant.add('dt')
+        counts = {}
+        for target, value in self.statements:
+            counts[target] = counts.get(target, 0)+1
+        read = set()
+        assigned = set()
+        self.step_statements = []
+        self.substep_statements = []
+        # Temporaries read before they are assigned, which start from 0:
+        self.accumulated = []
+        for target, value in self.statements:
+            for k in sorted(_names(value)):
+                if k in self.locals and k not in assigned and \
+                   k not in self.accumulated:
+                    self.accumulated.append(k)
+            assigned.add(target)
+            if target not in states and counts[target] == 1 and \
+               target not in read and _names(value) <= invariant:
+                self.step_statements.append((target, value))
+                invariant.add(target)
+            else:
+                self.substep_statements.append((target, value))
+            read.update(_names(value))
+
+    def _derive(self):
+        # Move the statements evaluated once per step that only depend on
+        # the parameters and dt (which varies with adaptive substeps) out of
+        # the kernel; the constants they use are evaluated by both:
+        deps = {k: set([k]) for k in self.params}
+        if not self.adaptive:
+            deps['dt'] = set(['dt'])
+        self.derived = OrderedDict()
+        self._derived_statements = []
+        for target, value in self.step_statements:
+            names = _names(value)
+            if not all([k in deps for k in names]):
+                continue
+            self._derived_statements.append((target, value))
+            deps[target] = set().union(*[deps[k] for k in names])
+            if deps[target]:
+                self.derived[target] = sorted(deps[target]-set(['dt']))
+        self.step_statements = [(t, v) for t, v in self.step_statements
+                                if t not in self.derived]
+        # Parameters only used by the derived parameters are not passed to
+        # the kernel:
+        read = set()
+        for target, value in self._derived_statements:
+            read.update(_names(value))
+        self._derived_params = [k for k in self.params if k in read]
+        read = set(self.updates)
+        for target, value in self.step_statements+self.substep_statements:
+            read.update(_names(value))
+        self.params = [k for k in self.params if k in read]
+
+    def _derived_src(self):
+        lines = ['def derived(dt, floattype, inttype%s):' %
+                 ''.join([', '+k for k in self._derived_params])]
+        lines.append('    _err = _np.seterr(all=\'ignore\')')
+        lines.append('    try:')
+        for target, value in self._derived_statements:
+            lines.append('        %s = %s' % (target, self._pyexpr(value)))
+        lines.append('    finally:')
+        lines.append('        _np.seterr(**_err)')
+        lines.append('    return (%s)' % ''.join([k+', '
+                                                  for k in self.derived]))
+        return '\n'.join(lines)+'\n'
+
+    def evaluate_derived(self, dt, params, floattype=np.float64,
+                         inttype=np.int32):
+        """
+        Compute the derived parameters.
+
+        Parameters
+        ----------
+        dt : float
+            Time step of the equations.
+        params : dict
+            Arrays of the values of the parameters, either for all
+            components or a single value for all of them.
+        floattype, inttype : numpy.dtype
+            Data types of the floating point and integer variables.
+
+        Returns
+        -------
+        derived : OrderedDict
+            Values of the derived parameters; those that only depend on
+            parameters given as a single value are single values.
+        """
+
+        if not self.derived:
+            return OrderedDict()
+        values = self._derived_func(
+            floattype(dt), floattype, inttype,
+            *[np.asarray(params[k], floattype)
+              for k in self._derived_params])
+        return OrderedDict([
+            (k, np.atleast_1d(np.asarray(
+                v, inttype if k in self.int_vars else floattype)))
+            for k, v in zip(self.derived, values)])
+
+    def _ctype(self, k):
+        return 'INTTYPE' if k in self.int_vars else 'FLOATTYPE'
+
+    def _cexpr(self, node):
+        value = _number(node)
+        if value is not None:
+            if isinstance(value, bool):
+                return '1' if value else '0'
+            return repr(value).rstrip('L')
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.BinOp):
+            left = self._cexpr(node.left)
+            right = self._cexpr(node.right)
+            op = type(node.op)
+            if op not in _binops:
+                self._error('unsupported operator %s' % op.__name__)
+            if op is ast.Pow:
+                return 'POW(%s, %s)' % (left, right)
+            if op is ast.Mod and not self._is_int(node):
+                return 'fmod(%s, %s)' % (left, right)
+            if op is ast.Div and self._is_int(node.left) and \
+               self._is_int(node.right):
+                left = '(FLOATTYPE)%s' % left
+            return '(%s %s %s)' % (left, _binops[op], right)
+        if isinstance(node, ast.UnaryOp):
+            operand = self._cexpr(node.operand)
+            if isinstance(node.op, ast.USub):
+                return '(-%s)' % operand
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if isinstance(node.op, ast.Not):
+                return '(!%s)' % operand
+        if isinstance(node, ast.BoolOp):
+            op = ' && ' if isinstance(node.op, ast.And) else ' || '
+            return '(%s)' % op.join([self._cexpr(v) for v in node.values])
+        if isinstance(node, ast.Compare):
+            terms = []
+            left = self._cexpr(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                if type(op) not in _cmpops:
+                    self._error('unsupported comparison %s' %
+                                type(op).__name__)
+                right = self._cexpr(comparator)
+                terms.append('(%s %s %s)' % (left, _cmpops[type(op)], right))
+                left = right
+            return terms[0] if len(terms) == 1 else \
+                '(%s)' % ' && '.join(terms)
+        if isinstance(node, ast.IfExp):
+            return '(%s ? %s : %s)' % (self._cexpr(node.test),
+                                       self._cexpr(node.body),
+                                       self._cexpr(node.orelse))
+        if getattr(node, '_table', None) is not None:
+            name, var = self.tables[node._table]
+            low, step, n = self.table_grids[var]
+            return 'table_lookup(g_tables + %d, %s, %r, %r)' % (
+                self._table_offset(node._table), var, low, 1./step)
+        if isinstance(node, ast.Call):
+            func = node.func.id if isinstance(node.func, ast.Name) else None
+            if func not in _functions or node.keywords:
+                self._error('unsupported function %s' % func)
+            return '%s(%s)' % (_functions[func][0],
+                               ', '.join([self._cexpr(a) for a in node.args]))
+        self._error('unsupported expression %s' % type(node).__name__)
+
+    def _pyexpr(self, node):
+        value = _number(node)
+        if value is not None:
+            return repr(value)
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.BinOp):
+            left = self._pyexpr(node.left)
+            right = self._pyexpr(node.right)
+            if isinstance(node.op, ast.Div):
+                return '_np.true_divide(%s, %s)' % (left, right)
+            return '(%s %s %s)' % (left, _binops[type(node.op)], right)
+        if isinstance(node, ast.UnaryOp):
+            operand = self._pyexpr(node.operand)
+            if isinstance(node.op, ast.USub):
+                return '(-%s)' % operand
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return '_np.logical_not(%s)' % operand
+        if isinstance(node, ast.BoolOp):
+            func = '_np.logical_and' if isinstance(node.op, ast.And) \
+                   else '_np.logical_or'
+            expr = self._pyexpr(node.values[0])
+            for v in node.values[1:]:
+                expr = '%s(%s, %s)' % (func, expr, self._pyexpr(v))
+            return expr
+        if isinstance(node, ast.Compare):
+            terms = []
+            left = self._pyexpr(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._pyexpr(comparator)
+                terms.append('(%s %s %s)' % (left, _cmpops[type(op)], right))
+                left = right
+            expr = terms[0]
+            for t in terms[1:]:
+                expr = '_np.logical_and(%s, %s)' % (expr, t)
+            return expr
+        if isinstance(node, ast.IfExp):
+            return '_np.where(%s, %s, %s)' % (self._pyexpr(node.test),
+                                              self._pyexpr(node.body),
+                                              self._pyexpr(node.orelse))
+        if getattr(node, '_table', None) is not None:
+            name, var = self.tables[node._table]
+            low, step, n = self.table_grids[var]
+            return '_lookup(_tables, %d, %s, %r, %r, %d)' % (
+                self._table_offset(node._table), var, low, 1./step, n)
+        if isinstance(node, ast.Call):
+            return '_np.%s(%s)' % (_functions[node.func.id][1],
+                                   ', '.join([self._pyexpr(a)
+                                              for a in node.args]))
+        self._error('unsupported expression %s' % type(node).__name__)
+
+    def _cuda(self):
+        args = ['%s *g_%s' % (self._ctype(k), k) for k in self.accesses]
+        args += ['FLOATTYPE *g_%s' % k for k in self.params]
+        args += ['%s *g_%s' % (self._ctype(k), k) for k in self.derived]
+        args += ['%s *g_internal%s' % (self._ctype(k), k)
+                 for k in self.states]
+        args += ['%s *g_%s' % (self._ctype(k), k) for k in self.updates]
+        if self.tables:
+            args.append('FLOATTYPE *g_tables')
+        names = set(['g_'+k for k in self.accesses+self.params+
+                     list(self.derived)+self.updates])
+        names.update(['g_internal'+k for k in self.states])
+        names.update(['g_tables', 'table_lookup'])
+        for k in self.accesses+self.params+self.states+self.locals:
+            if k in names:
+                self._error('%s clashes with the name of an argument' % k)
+
+        lines = [_header]
+        # Parameters stored as a single value have a stride of 0 (see
+        # NDComponent):
+        for k in self.params+list(self.derived):
+            lines.append('# ifndef %s_STRIDE\n#     define %s_STRIDE 1\n'
+                         '# endif' % (k, k))
+        lines.append('')
+        if self.tables:
+            lines.append(_table_lookup)
+        lines.append('__global__ void update(int num_comps, FLOATTYPE %s, '
+                     'int nsteps,' % ('_step' if self.adaptive else 'dt'))
+        lines.append(',\n'.join(['    '+a for a in args])+')')
+        lines.append('{')
+        lines.append('    int tid = threadIdx.x + blockIdx.x * blockDim.x;')
+        lines.append('    int total_threads = gridDim.x * blockDim.x;')
+        lines.append('')
+        for k in self.accesses+self.params+self.states+self.locals:
+            lines.append('    %s %s;' % (self._ctype(k), k))
+        if self.adaptive:
+            lines.append('    FLOATTYPE dt;')
+            lines.append('    int _n;')
+            for k in self._saved_states():
+                lines.append('    %s _x0_%s;' % (self._ctype(k), k))
+        lines.append('')
+        lines.append('    for (int i = tid; i < num_comps; '
+                     'i += total_threads) {')
+        for k in self.accesses:
+            lines.append('        %s = g_%s[i];' % (k, k))
+        for k in self.params+list(self.derived):
+            lines.append('        %s = g_%s[PARAM_INDEX(%s, i)];' % (k, k, k))
+        for k in self.states:
+            lines.append('        %s = g_internal%s[i];' % (k, k))
+        if not self.adaptive:
+            for k in self.accumulated:
+                lines.append('        %s = 0;' % k)
+        for target, value in self.step_statements:
+            lines.append('        %s = %s;' % (target, self._cexpr(value)))
+        if self.adaptive:
+            lines.extend(self._cuda_adaptive())
+        elif self.substep_statements:
+            lines.append('')
+            lines.append('        for (int j = 0; j < nsteps; ++j) {')
+            for target, value in self.substep_statements:
+                lines.append('            %s = %s;' % (target,
+                                                       self._cexpr(value)))
+            lines.append('        }')
+        lines.append('')
+        for k in self.states:
+            lines.append('        g_internal%s[i] = %s;' % (k, k))
+        for k in self.updates:
+            lines.append('        g_%s[i] = %s;' % (k, k))
+        lines.append('    }')
+        lines.append('}')
+        return '\n'.join(lines)+'\n'
+
+    def _saved_states(self):
+        # States restored when a step is repeated with more substeps:
+        return [k for k in self.states
+                if k not in ['substeps', 'substeps_taken']]
+
+    def _cuda_adaptive(self):
+        lines = ['']
+        lines.append('        _n = substeps < nsteps ? substeps : nsteps;')
+        for k in self._saved_states():
+            lines.append('        _x0_%s = %s;' % (k, k))
+        lines.append('        substeps_taken = 0;')
+        lines.append('        for (;;) {')
+        lines.append('            dt = _step / _n;')
+        for k in self.accumulated:
+            lines.append('            %s = 0;' % k)
+        lines.append('            for (int j = 0; j < _n; ++j) {')
+        for target, value in self.substep_statements:
+            lines.append('                %s = %s;' % (target,
+                                                       self._cexpr(value)))
+        lines.append('            }')
+        lines.append('            substeps_taken += _n;')
+        lines.append('            if (_r <= 1 || _n >= nsteps)')
+        lines.append('                break;')
+        lines.append('            // Repeat the step with more substeps:')
+        lines.append('            _n = _n * _r * 1.25 < nsteps ? '
+                     '(int)(_n * _r * 1.25) + 1 : nsteps;')
+        for k in self._saved_states():
+            lines.append('            %s = _x0_%s;' % (k, k))
+        lines.append('        }')
+        lines.append('        substeps = _n * _r * 1.25 < nsteps ? '
+                     '(int)(_n * _r * 1.25) + 1 : nsteps;')
+        return lines
+
+    def _numpy_adaptive(self):
+        # Components repeating the step and those that have taken all their
+        # substeps are masked out:
+        masked = []
+        for k in self._saved_states()+self.accumulated+self.updates:
+            if k not in masked:
+                masked.append(k)
+        outputs = masked+(['_r'] if '_r' not in masked else [])
+        lines = []
+        lines.append('        _n = _np.minimum(_np.broadcast_to(substeps, '
+                     '(num_comps,)), nsteps)')
+        for k in self._saved_states():
+            lines.append('        _x0_%s = %s' % (k, k))
+        for k in outputs:
+            if k not in self.states:
+                lines.append('        %s = _np.zeros(num_comps, %s)' %
+                             (k, 'inttype' if k in self.int_vars
+                              else 'floattype'))
+            lines.append('        _out_%s = %s' % (k, k))
+        lines.append('        substeps_taken = _np.zeros(num_comps, inttype)')
+        lines.append('        _todo = _np.ones(num_comps, bool)')
+        lines.append('        while _todo.any():')
+        for k in self._saved_states():
+            lines.append('            %s = _x0_%s' % (k, k))
+        lines.append('            dt = _np.true_divide(_step, _n)'
+                     '.astype(floattype)')
+        for k in self.accumulated:
+            lines.append('            %s = _np.zeros(num_comps, %s)' %
+                         (k, 'inttype' if k in self.int_vars
+                          else 'floattype'))
+        lines.append('            for _j in range(_n[_todo].max()):')
+        lines.append('                _active = _np.logical_and(_todo, '
+                     '_j < _n)')
+        for target, value in self.substep_statements:
+            if target in masked:
+                lines.append('                %s = _np.where(_active, %s, '
+                             '%s)' % (target, self._pyexpr(value), target))
+            else:
+                lines.append('                %s = %s' %
+                             (target, self._pyexpr(value)))
+        lines.append('            substeps_taken = substeps_taken + '
+                     '_np.where(_todo, _n, 0)')
+        lines.append('            _done = _np.logical_and(_todo, '
+                     '_np.logical_or(_r <= 1, _n >= nsteps))')
+        for k in outputs:
+            lines.append('            _out_%s = _np.where(_done, %s, '
+                         '_out_%s)' % (k, k, k))
+        lines.append('            _todo = _np.logical_and(_todo, '
+                     '_np.logical_not(_done))')
+        lines.append('            _q = _n * _r * 1.25')
+        lines.append('            _n = _np.where(_todo, _np.where('
+                     '_q < nsteps, _np.floor(_q) + 1, nsteps), _n)'
+                     '.astype(int)')
+        for k in outputs:
+            lines.append('        %s = _out_%s' % (k, k))
+        lines.append('        _q = _n * _r * 1.25')
+        lines.append('        substeps = _np.where(_q < nsteps, '
+                     '_np.floor(_q) + 1, nsteps).astype(inttype)')
+        return lines
+
+    def _numpy(self):
+        args = self.accesses+self.params+list(self.derived)+self.states
+        if self.tables:
+            args = args+['_tables']
+        lines = ['def update(num_comps, %s, nsteps, floattype, inttype%s):' %
+                 ('_step' if self.adaptive else 'dt',
+                  ''.join([', '+k for k in args]))]
+        lines.append('    _err = _np.seterr(all=\'ignore\')')
+        lines.append('    try:')
+        if not self.adaptive:
+            for k in self.accumulated:
+                lines.append('        %s = _np.zeros(num_comps, %s)' %
+                             (k, 'inttype' if k in self.int_vars
+                              else 'floattype'))
+        for target, value in self.step_statements:
+            lines.append('        %s = %s' % (target, self._pyexpr(value)))
+        if self.adaptive:
+            lines.extend(self._numpy_adaptive())
+        else:
+            if self.substep_statements:
+                lines.append('        for _j in range(nsteps):')
+            for target, value in self.substep_statements:
+                lines.append('            %s = %s' % (target,
+                                                      self._pyexpr(value)))
+        if lines[-1] == '    try:':
+            lines.append('        pass')
+        lines.append('    finally:')
+        lines.append('        _np.seterr(**_err)')
+        lines.append('    return (%s)' % ''.join([k+', ' for k in
+                                                  self.states+self.updates]))
+        return '\n'.join(lines)+'\n'
+
+    def arg_types(self, floattype):
+        """
+        Return the argument types of the kernel for `prepare`.
+        """
+
+        return 'i'+np.dtype(floattype).char+'i'+'P'*(
+            len(self.accesses)+len(self.params)+len(self.derived)+
+            len(self.states)+len(self.updates)+(1 if self.tables else 0))
+
+    def arguments(self, inputs, params_dict, states, update_pointers,
+                  tables=None, derived=None):
+        """
+        Return the array arguments of the kernel.
+        """
+
+        return [inputs[k].gpudata for k in self.accesses]+\
+               [params_dict[k].gpudata for k in self.params]+\
+               [derived[k].gpudata for k in self.derived]+\
+               [states[k].gpudata for k in self.states]+\
+               [update_pointers[k] for k in self.updates]+\
+               ([tables.gpudata] if self.tables else [])
+
+    def _table_offset(self, index):
+        # Position of a table in the values returned by build_tables:
+        return sum([self.table_grids[var][2]+2
+                    for name, var in self.tables[:index]])
+
+    def build_tables(self, floattype=np.float64):
+        """
+        Tabulate the rate functions and validate the tables.
+
+        Each function is tabulated at the points of the grid of its
+        variable. The interpolated values are compared to the functions at
+        the midpoints of the grid, where the error of linear interpolation
+        is largest.
+
+        Parameters
+        ----------
+        floattype : numpy.dtype
+            Data type of the tables.
+
+        Returns
+        -------
+        values : numpy.ndarray
+            Concatenated tables.
+        errors : OrderedDict
+            Maximum relative error of each table.
+        """
+
+        if not self.tables:
+            return np.zeros(0, floattype), OrderedDict()
+        if not hasattr(self, '_table_funcs'):
+            lines = []
+            for k, (name, var) in enumerate(self.tables):
+                lines.append('def %s(%s):' % (name, var))
+                for target, value in self._table_consts:
+                    lines.append('    %s = %s' % (target,
+                                                  self._pyexpr(value)))
+                lines.append('    return %s' %
+                             self._pyexpr(self._table_exprs[k]))
+            namespace = {}
+            exec(compile('\n'.join(lines)+'\n',
+                         '<%s rate functions>' % self.name, 'exec'),
+                 {'_np': np}, namespace)
+            self._table_funcs = [namespace[name] for name, var in self.tables]
+
+        values = []
+        errors = OrderedDict()
+        err = np.seterr(all='ignore')
+        try:
+            for (name, var), f in zip(self.tables, self._table_funcs):
+                low, step, n = self.table_grids[var]
+                x = low+step*np.arange(n+2)
+                # Average of the values on both sides of the points, which
+                # is well defined at removable singularities (e.g.,
+                # x/(exp(x)-1) at 0):
+                d = 1e-3*step
+                table = 0.5*(f(x-d)+f(x+d))*np.ones_like(x)
+                if not np.all(np.isfinite(table)):
+                    self._error('%s is not finite over the range of %s' %
+                                (name, var))
+                mid = x[:n]+0.5*step
+                exact = f(mid)*np.ones_like(mid)
+                approx = _lookup(table, 0, mid, low, 1./step, n)
+                ok = np.isfinite(exact)
+                scale = np.maximum(np.abs(exact[ok]),
+                                   1e-6*np.abs(exact[ok]).max())
+                errors[name] = np.max(np.abs(approx[ok]-exact[ok])/scale)
+                values.append(table)
+        finally:
+            np.seterr(**err)
+        return np.concatenate(values).astype(floattype), errors
+
+    def run_numpy(self, dt, nsteps, inputs, params, states,
+                  floattype=np.float64, inttype=np.int32):
+        """
+        Advance the model on the host with the generated NumPy function.
+
+        Parameters
+        ----------
+        dt : float
+            Time step of the equations.
+        nsteps : int
+            Number of substeps.
+        inputs, params, states : dict
+            Arrays of the values of the accessed variables, parameters and
+            states of all components. Derived parameters that are not in
+            `params` are computed with `evaluate_derived`.
+        floattype, inttype : numpy.dtype
+            Data types of the floating point and integer variables.
+
+        Returns
+        -------
+        states : OrderedDict
+            New values of the states used by the equations.
+        updates : OrderedDict
+            Values of the updated variables.
+        """
+
+        derived = {}
+        if not all([k in params for k in self.derived]):
+            derived = self.evaluate_derived(dt, params, floattype, inttype)
+        arrays = [np.asarray(inputs[k]) for k in self.accesses]+\
+                 [np.asarray(params[k]) for k in self.params]+\
+                 [np.asarray(params[k]) if k in params else derived[k]
+                  for k in self.derived]+\
+                 [np.asarray(states[k]) for k in self.states]
+        num_comps = max([a.size for a in arrays]+[1])
+        if self.tables:
+            if floattype not in self._host_tables:
+                self._host_tables[floattype] = self.build_tables(floattype)[0]
+            arrays.append(self._host_tables[floattype])
+        result = self._numpy_func(num_comps, floattype(dt), nsteps,
+                                  floattype, inttype, *arrays)
+        values = []
+        for k, v in zip(self.states+self.updates, result):
+            dtype = inttype if k in self.int_vars else floattype
+            values.append((k, np.array(np.broadcast_to(v, (num_comps,)),
+                                       dtype)))
+        n = len(self.states)
+        return OrderedDict(values[:n]), OrderedDict(values[n:])
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+
+"""
+Persistent cache of compiled CUDA kernels.
+
+Compiled modules are stored on disk under a key computed from their source,
+compiler options, target architecture and compiler version, so that the same
+kernel is compiled once and reused by all processes (and all LPUs, whatever
+their size) that request it. Compilations requested within
+`KernelCache.deferred` are run in parallel.
+
+The cache directory defaults to ~/.cache/neurokernel/kernels and can be set
+with the NEUROKERNEL_KERNEL_CACHE environment variable; setting it to an
+empty string disables the on-disk cache.
+"""
+
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+
+def default_cache_dir():
+    """
+    Return the directory of the on-disk cache, or None if it is disabled.
+    """
+
+    cache_dir = os.environ.get('NEUROKERNEL_KERNEL_CACHE')
+    if cache_dir is None:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'neurokernel',
+                            'kernels')
+    return cache_dir or None
+
+def _nvcc_compile(source, options, arch):
+    from pycuda.compiler import compile
+    # The cache keys include the architecture, so bypass PyCUDA's own cache:
+    return compile(source, options=list(options), arch=arch, no_extern_c=True,
+                   cache_dir=False)
+
+def _nvcc_version():
+    from pycuda.compiler import get_nvcc_version
+    return get_nvcc_version('nvcc')
+
+def _device_arch():
+    import pycuda.driver as cuda
+    return 'sm_%d%d' % cuda.Context.get_device().compute_capability()
+
+def _current_context():
+    import pycuda.driver as cuda
+    return cuda.Context.get_current().handle
+
+def _load_module(cubin):
+    import pycuda.driver as cuda
+    return cuda.module_from_buffer(cubin)
+
+class KernelCache(object):
+    """
+    Content-addressed cache of compiled CUDA modules.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the compiled modules. If None, modules are only cached
+        in memory.
+    compiler : callable
+        `compiler(source, options, arch)` returns the compiled module (e.g.,
+        a cubin) as a byte string. Defaults to nvcc through PyCUDA.
+    loader : callable
+        `loader(binary)` loads a compiled module in the current context.
+        Defaults to `pycuda.driver.module_from_buffer`.
+    arch : callable
+        Returns the architecture to compile for. Defaults to that of the
+        current device.
+    context : callable
+        Returns a hashable identifier of the current context; loaded modules
+        are reused within a context.
+    version : callable
+        Returns a string identifying the compiler, which is part of the keys.
+    """
+
+    def __init__(self, cache_dir=None, compiler=_nvcc_compile,
+                 loader=_load_module, arch=_device_arch,
+                 context=_current_context, version=_nvcc_version):
+        self.cache_dir = cache_dir
+        self.compiler = compiler
+        self.loader = loader
+        self.arch = arch
+        self.context = context
+        self.version = version
+        self.stats = {'memory': 0, 'disk': 0, 'compiled': 0}
+        self._version = None
+        self._binaries = {}
+        self._modules = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pending = []
+        self._results = {}
+
+    def key(self, source, options, arch):
+        """
+        Return the key of a module.
+        """
+
+        if self._version is None:
+            self._version = str(self.version())
+        h = hashlib.sha1()
+        for s in [self._version, arch, '\0'.join(options), source]:
+            h.update(s.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.cubin')
+
+    def _read(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _write(self, key, binary):
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        tmp = None
+        try:
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                # Created by another process in the meantime:
+                if not os.path.isdir(os.path.dirname(path)):
+                    raise
+            # Write to a temporary file first so that other processes never
+            # read a partially written module:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(binary)
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            # The cache directory can't be written to; the module is only
+            # kept in memory:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get_binary(self, source, options=(), arch=None):
+        """
+        Return a compiled module, compiling it if it is not in the cache.
+        """
+
+        if arch is None:
+            arch = self.arch()
+        key = self.key(source, options, arch)
+        with self._lock:
+            binary = self._binaries.get(key)
+            if binary is not None:
+                self.stats['memory'] += 1
+                return binary
+        binary = self._read(key)
+        if binary is not None:
+            origin = 'disk'
+        else:
+            binary = self.compiler(source, options, arch)
+            origin = 'compiled'
+            self._write(key, binary)
+        with self._lock:
+            self.stats[origin] += 1
+            self._binaries[key] = binary
+        return binary
+
+    def _load(self, key, binary):
+        ctx = self.context()
+        if (key, ctx) not in self._modules:
+            self._modules[(key, ctx)] = self.loader(binary)
+        return self._modules[(key, ctx)]
+
+    def source_module(self, source, options=(), no_extern_c=False):
+        """
+        Compile and load a module, like `pycuda.compiler.SourceModule`.
+
+        Within `deferred`, the module is compiled in the background and a
+        proxy is returned whose functions can be retrieved and prepared
+        immediately; the module is loaded when it is first used.
+        """
+
+        if not no_extern_c:
+            source = 'extern "C" {\n%s\n}\n' % source
+        options = tuple(options)
+        arch = self.arch()
+        key = self.key(source, options, arch)
+        ctx = self.context()
+        if (key, ctx) in self._modules:
+            self.stats['memory'] += 1
+            return self._modules[(key, ctx)]
+        if self._pool is None:
+            return self._load(key, self.get_binary(source, options, arch))
+        # Identical modules requested in the same context are compiled once:
+        if key not in self._results:
+            self._results[key] = self._pool.apply_async(
+                self.get_binary, (source, options, arch))
+        module = _DeferredModule(self, key, self._results[key])
+        self._pending.append(module)
+        return module
+
+    @contextlib.contextmanager
+    def deferred(self, processes=None):
+        """
+        Compile the modules requested within the context in parallel.
+
+        All modules are loaded when the context exits.
+
+        Parameters
+        ----------
+        processes : int
+            Number of concurrent compilations. Defaults to the number of
+            CPUs.
+        """
+
+        if self._pool is not None:
+            yield
+            return
+        from multiprocessing.pool import ThreadPool
+        self._pool = ThreadPool(processes)
+        try:
+            yield
+            for module in self._pending:
+                module._resolve()
+        finally:
+            pool = self._pool
+            self._pool = None
+            self._pending = []
+            self._results = {}
+            pool.close()
+            pool.join()
+
+class _DeferredModule(object):
+    """
+    Module whose compilation is running in the background.
+    """
+
+    def __init__(self, cache, key, result):
+        self._cache = cache
+        self._key = key
+        self._result = result
+        self._module = None
+
+    def _resolve(self):
+        if self._module is None:
+            self._module = self._cache._load(self._key, self._result.get())
+        return self._module
+
+    def get_function(self, name):
+        return _DeferredFunction(self, name)
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+class _DeferredFunction(object):
+    """
+    Function of a module whose compilation is running in the background.
+
+    `prepare` is recorded and applied when the module is loaded; attributes
+    set on the proxy (e.g., the grid and block sizes used by the
+    components) stay on the proxy.
+    """
+
+    def __init__(self, module, name):
+        self._module = module
+        self._name = name
+        self._func = None
+        self._prepare = None
+
+    def prepare(self, *args, **kwargs):
+        if self._func is None:
+            self._prepare = (args, kwargs)
+        else:
+            self._func.prepare(*args, **kwargs)
+        return self
+
+    def _resolve(self):
+        if self._func is None:
+            func = self._module._resolve().get_function(self._name)
+            if self._prepare is not None:
+                func.prepare(*self._prepare[0], **self._prepare[1])
+            self._func = func
+        return self._func
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self._resolve(), name)
+        if callable(attr):
+            # Later calls bypass __getattr__:
+            self.__dict__[name] = attr
+        return attr
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+_default_cache = None
+
+def get_cache():
+    """
+    Return the cache used by `SourceModule`.
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = KernelCache(default_cache_dir())
+    return _default_cache
+
+def SourceModule(source, options=None, no_extern_c=False, include_dirs=[]):
+    """
+    Drop-in replacement of `pycuda.compiler.SourceModule` that goes through
+    the kernel cache.
+    """
+
+    options = list(options or [])+['-I'+d for d in include_dirs]
+    return get_cache().source_module(source, options, no_extern_c)
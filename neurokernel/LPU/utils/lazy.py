@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""
+Deferred imports of PyCUDA.
+
+Importing PyCUDA is slow and fails on hosts without CUDA. The modules and
+functions defined here stand in for the PyCUDA ones and only import them when
+they are first used, so that the modules defining circuits and models (e.g.,
+`Graph` and the NDComponents) can be imported by tools that never touch the
+GPU. Use::
+
+    from neurokernel.LPU.utils.lazy import garray, cuda, SourceModule
+
+in place of the corresponding PyCUDA imports.
+"""
+
+import importlib
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    """
+    Module that is imported when one of its attributes is first accessed.
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(name)
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        # Later accesses don't go through __getattr__:
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+def lazy_import(name):
+    """
+    Return a module, deferring its import if it has not been imported yet.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def lazy_function(module, name):
+    """
+    Return a wrapper that calls `module.name`, importing the module on the
+    first call.
+    """
+
+    func = []
+    def wrapper(*args, **kwargs):
+        if not func:
+            func.append(getattr(importlib.import_module(module), name))
+        return func[0](*args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+def lazy_decorator(module, name):
+    """
+    Return a decorator that applies `module.name` when the decorated function
+    is first called, importing the module at that time.
+    """
+
+    def decorator(f):
+        func = []
+        def wrapper(*args, **kwargs):
+            if not func:
+                func.append(getattr(importlib.import_module(module), name)(f))
+            return func[0](*args, **kwargs)
+        wrapper.__name__ = f.__name__
+        wrapper.__doc__ = f.__doc__
+        return wrapper
+    return decorator
+
+cuda = lazy_import('pycuda.driver')
+garray = lazy_import('pycuda.gpuarray')
+elementwise = lazy_import('pycuda.elementwise')
+# Modules are compiled through the persistent kernel cache:
+SourceModule = lazy_function('neurokernel.LPU.utils.kernel_cache',
+                             'SourceModule')
+dtype_to_ctype = lazy_function('pycuda.tools', 'dtype_to_ctype')
+context_dependent_memoize = lazy_decorator('pycuda.tools',
+                                           'context_dependent_memoize')
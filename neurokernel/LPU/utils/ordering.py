@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+Reordering of LPU components to improve the locality of presynaptic gathers.
+"""
+
+from collections import OrderedDict
+import itertools
+
+import numpy as np
+
+def order_components(comps, pres, method='rcm'):
+    """
+    Reorder the components of each model.
+
+    Components read the variables of their presynaptic components through
+    index arrays into the variable buffers, which are laid out in the order
+    of the components of each model. Placing components that are connected
+    near each other makes these gathers (and the sums over the inputs of each
+    component) access memory more contiguously.
+
+    Parameters
+    ----------
+    comps : OrderedDict
+        Uids of the components of each model, in their current order.
+    pres : dict
+        Uids of the presynaptic components of each component. Uids that are
+        not in `comps` (e.g., ports and inputs) are ignored.
+    method : str
+        'rcm' orders the components of all models together by the reverse
+        Cuthill-McKee ordering of the (symmetrized) connectivity graph, which
+        places connected components close together. 'pre' sorts the
+        components of each model by the position of the first component
+        that reads them, which makes the `pre` index arrays nearly monotonic
+        and the inputs of each component contiguous.
+
+    Returns
+    -------
+    order : OrderedDict
+        Uids of the components of each model in their new order.
+    """
+
+    uids = list(itertools.chain(*comps.values()))
+    index = {uid: i for i, uid in enumerate(uids)}
+
+    if method == 'rcm':
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+        rows = []
+        cols = []
+        for post, p in pres.items():
+            if post not in index: continue
+            for pre in p:
+                if pre in index:
+                    rows.append(index[pre])
+                    cols.append(index[post])
+        n = len(uids)
+        adj = csr_matrix((np.ones(len(rows), np.int8), (rows, cols)),
+                         shape=(n, n))
+        perm = reverse_cuthill_mckee((adj+adj.T).tocsr(), symmetric_mode=True)
+        rank = np.empty(n, np.int64)
+        rank[perm] = np.arange(n)
+        return OrderedDict((m, sorted(u, key=lambda uid: rank[index[uid]])) \
+                           for m, u in comps.items())
+    elif method == 'pre':
+        posts = {}
+        for post, p in pres.items():
+            if post not in index: continue
+            for pre in p:
+                if pre in index:
+                    posts.setdefault(pre, []).append(post)
+
+        # The position of a component depends on the order of its own model,
+        # so sort once more after updating all models:
+        order = OrderedDict((m, list(u)) for m, u in comps.items())
+        for _ in range(2):
+            pos = {}
+            for uid in itertools.chain(*order.values()):
+                pos[uid] = len(pos)
+            inf = len(pos)
+            for m, u in order.items():
+                u.sort(key=lambda uid: min([pos[p] for p in posts.get(uid, [])] \
+                                           or [inf]))
+        return order
+    else:
+        raise ValueError('unsupported reordering method %r' % method)
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description='Compare the time taken by the presynaptic gathers of a '
+                    'locally connected circuit before and after reordering.')
+    parser.add_argument('-n', type=int, default=200000,
+                        help='Number of neurons [default: 200000]')
+    parser.add_argument('-k', type=int, default=10,
+                        help='Synapses per neuron [default: 10]')
+    parser.add_argument('-w', type=int, default=50,
+                        help='Connection radius [default: 50]')
+    parser.add_argument('-r', type=int, default=20,
+                        help='Repetitions [default: 20]')
+    args = parser.parse_args()
+
+    # Neurons on a ring connected to nearby neurons, with uids listed in a
+    # random order as they would be when read from an arbitrary graph file:
+    np.random.seed(0)
+    n, k = args.n, args.k
+    neurons = ['n%d' % i for i in np.random.permutation(n)]
+    syn_pre = np.repeat(np.arange(n), k)
+    syn_post = (syn_pre+np.random.randint(-args.w, args.w+1, n*k)) % n
+    syn_post[::k] = (np.arange(n)+1) % n    # every neuron has a synapse
+    syn_order = np.random.permutation(n*k)
+    synapses = ['s%d' % i for i in syn_order]
+    pres = {}
+    for i in syn_order:
+        pres['s%d' % i] = ['n%d' % syn_pre[i]]
+        pres.setdefault('n%d' % syn_post[i], []).append('s%d' % i)
+    comps = OrderedDict([('Neuron', neurons), ('Synapse', synapses)])
+
+    def gather_time(order):
+        # Index arrays as built by LPU.process_connections:
+        ind = {m: {uid: i for i, uid in enumerate(u)} \
+               for m, u in order.items()}
+        syn_pre_ind = np.array([ind['Neuron'][pres[s][0]] \
+                                for s in order['Synapse']])
+        neu_pre = [[ind['Synapse'][s] for s in pres.get(x, [])] \
+                   for x in order['Neuron']]
+        neu_pre_ind = np.array(list(itertools.chain(*neu_pre)))
+        cumpre = np.cumsum([0]+[len(p) for p in neu_pre])[:-1]
+
+        V = np.random.rand(n)
+        g = np.empty(n*k)
+        start = time.time()
+        for _ in range(args.r):
+            # Synapses read the state of their presynaptic neuron, and neurons
+            # sum the conductances of their synapses:
+            np.take(V, syn_pre_ind, out=g)
+            I = np.add.reduceat(np.take(g, neu_pre_ind), cumpre)
+        return (time.time()-start)/args.r
+
+    base = gather_time(comps)
+    print('input order: %.2f ms/step' % (base*1e3))
+    for method in ['pre', 'rcm']:
+        start = time.time()
+        order = order_components(comps, pres, method)
+        elapsed = time.time()-start
+        t = gather_time(order)
+        print('%s:         %.2f ms/step (%.1fx faster, reordering took %.1f s)' % \
+              (method, t*1e3, base/t, elapsed))
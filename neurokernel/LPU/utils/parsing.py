@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+"""
+Conversion of LPU specifications in NetworkX graphs and GEXF files to the
+data structures consumed by the LPU.
+
+NetworkX is only imported when a graph is read or created, so that this
+module can be used by tools that don't need it.
+"""
+
+import copy
+import itertools
+import numbers
+
+_nx = None
+
+def networkx():
+    """
+    Import NetworkX.
+
+    The first call works around a bug in networkx < 1.9 that causes networkx
+    to choke on GEXF files with boolean attributes that contain the strings
+    'True' or 'False' (bug already observed in
+    https://github.com/networkx/networkx/pull/971).
+    """
+
+    global _nx
+    if _nx is None:
+        import networkx as nx
+        convert_bool = nx.readwrite.gexf.GEXF.convert_bool
+        convert_bool['false'] = False
+        convert_bool['False'] = False
+        convert_bool['true'] = True
+        convert_bool['True'] = True
+        _nx = nx
+    return _nx
+
+def read_gexf(filename):
+    """
+    Read a GEXF file into a NetworkX graph.
+    """
+
+    return networkx().read_gexf(filename)
+
+def conv_legacy_graph(g):
+    """
+    Converts a gexf from legacy neurodriver format to one currently
+    supported
+    """
+
+
+    # Find maximum ID in given graph so that we can use it to create new nodes
+    # with IDs that don't overlap with those that already exist:
+    max_id = 0
+    for id in g.nodes():
+        if isinstance(id, basestring):
+            if id.isdigit():
+                max_id = max(max_id, int(id))
+            else:
+                raise ValueError('node id must be an integer')
+        elif isinstance(id, numbers.Integral):
+            max_id = max(max_id, id)
+        else:
+            raise ValueError('node id must be an integer')
+        gen_new_id = itertools.count(max_id+1).next
+
+    # Create LPU and interface nodes and connect the latter to the former via an
+    # Owns edge:
+    g_new = networkx().MultiDiGraph()
+
+    # Transformation:
+    # 1. nonpublic neuron node -> neuron node
+    # 2. public neuron node -> neuron node with
+    #    output edge to output port
+    # 3. input port -> input port
+    # 4. synapse edge -> synapse node + 2 edges connecting
+    #    transformed original input/output nodes
+    edges_to_out_ports = [] # edges to new output port nodes:
+    for id, data in g.nodes(data=True):
+
+        # Don't clobber the original graph's data:
+        data = copy.deepcopy(data)
+
+        if 'public' in data and data['public']:
+            new_id = gen_new_id()
+            port_data = {'selector': data['selector'],
+                         'port_type': 'spike' if data['spiking'] else 'gpot',
+                         'port_io': 'out',
+                         'class': 'Port'}
+            g_new.add_node(new_id, port_data)
+            edges_to_out_ports.append((id, new_id))
+            del data['selector']
+
+        if 'model' in data:
+            if data['model'] == 'port_in_gpot':
+                for a in data.keys():
+                    if a!='selector': del data[a]
+                data['class'] = 'Port'
+                data['port_type'] = 'gpot'
+                data['port_io'] = 'in'
+            elif data['model'] == 'port_in_spk':
+                for a in data.keys():
+                    if a!='selector': del data[a]
+                data['class'] = 'Port'
+                data['port_type'] = 'spike'
+                data['port_io'] = 'in'
+            else:
+                data['class'] = data['model']
+
+            # Don't need to several attributes that are implicit:
+            for a in ['model', 'public', 'spiking','extern']:
+                if a in data: del data[a]
+
+            g_new.add_node(id, attr_dict=data)
+
+    # Create synapse nodes for each edge in original graph and connect them to
+    # the source/dest neuron/port nodes:
+    for from_id, to_id, data in g.edges(data=True):
+        data = copy.deepcopy(data)
+        if data['model'] == 'power_gpot_gpot':
+            data['class'] = 'PowerGPotGPot'
+        else:
+            data['class'] = data['model']
+        del data['model']
+
+        if 'id' in data: del data['id']
+
+        new_id = gen_new_id()
+        g_new.add_node(new_id, attr_dict=data)
+        g_new.add_edge(from_id, new_id, attr_dict={})
+        g_new.add_edge(new_id, to_id, attr_dict={})
+
+    # Connect output ports to the neurons that emit data through them:
+    for from_id, to_id in edges_to_out_ports:
+        g_new.add_edge(from_id, to_id, attr_dict={})
+
+    return g_new
+
+def graph_to_dicts(graph, uid_key=None, class_key='class'):
+    """
+    Convert graph of LPU neuron/synapse data to Python data structures.
+
+    Parameters
+    ----------
+    graph : networkx.MultiDiGraph
+        NetworkX graph containing LPU data.
+
+    Returns
+    -------
+    comp_dict : dict
+        A dictionary of components of which
+        keys are model names, and
+        values are dictionaries of parameters/attributes associated
+        with the model.
+        Keys of a dictionary of parameters are the names of them,
+        and values of corresponding keys are lists of value of parameters.
+        One of the parameters is called 'id' and by default it
+        uses the id of the node in the graph.
+        If uid_keys is specified, id will use the specified parameter.
+        Therefore, comp_dict has the following structure:
+
+        comp_dict = {}
+            comp_dict[model_name_1] = {}
+                comp_dict[model_name_1][parameter_1] = []
+                ...
+                comp_dict[model_name_1][parameter_N] = []
+                comp_dict[model_name_1][id] = []
+
+            ...
+
+            comp_dict[model_name_M] = {}
+                comp_dict[model_name_M][parameter_1] = []
+                ...
+                comp_dict[model_name_M][parameter_N] = []
+                comp_dict[model_name_M][id] = []
+
+    conns : list
+        A list of edges contained in graph describing the relation
+        between components
+
+    Example
+    -------
+    TODO: Update
+
+    Notes
+    -----
+    TODO: Update
+    """
+
+    comp_dict = {}
+    comps = graph.node.items()
+
+    all_component_types = list(set([comp[class_key] for uid, comp in comps]))
+
+    for model in all_component_types:
+        sub_comps = [comp for comp in comps \
+                               if comp[1][class_key] == model]
+
+        all_keys = [set(comp[1].keys()) for comp in sub_comps]
+        key_intersection = set.intersection(*all_keys)
+        key_union = set.union(*all_keys)
+
+        # For visually checking if any essential parameter is dropped
+        ignored_keys = list(key_union-key_intersection)
+        if ignored_keys:
+            print('parameters of model {} ignored: {}'.format(model, ignored_keys))
+
+        del all_keys
+
+        sub_comp_keys = list(key_intersection)
+
+        if model == 'Port':
+            assert('selector' in sub_comp_keys)
+
+        comp_dict[model] = {
+            k: [comp[k] for uid, comp in sub_comps] \
+            for k in sub_comp_keys if not k in [uid_key, class_key]}
+
+        comp_dict[model]['id'] = [comp[uid_key] if uid_key else uid \
+                                  for uid, comp in sub_comps]
+
+#    for id, comp in comps:
+#        model = comp[class_key]
+#
+#        # For port, make sure selector is specified
+#        if model == 'Port':
+#            assert('selector' in comp.keys())
+#
+#        # if the neuron model does not appear before, add it into n_dict
+#        if model not in comp_dict:
+#            comp_dict[model] = {k:[] for k in comp.keys() + ['id']}
+#
+#        # Same model should have the same attributes
+#        if not set(comp_dict[model].keys()) == set(comp.keys() + ['id']):
+#            raise KeyError("keys of component does not match with that of "+\
+#                           model+": "+ str(set(comp_dict[model].keys())) +
+#                           str(set(comp.keys() + ['id'])))
+#
+#        # add data to the subdictionary of comp_dict
+#        for key in comp.iterkeys():
+#            if not key==uid_key:
+#                comp_dict[model][key].append( comp[key] )
+#        if uid_key:
+#            comp_dict[model]['id'].append(comp[uid_key])
+#        else:
+#            comp_dict[model]['id'].append( id )
+#
+#    # Remove duplicate model information:
+#    for val in comp_dict.itervalues(): val.pop(class_key)
+
+    # Extract connections
+    conns = graph.edges(data=True)
+    return comp_dict, conns
+
+def lpu_parser(filename):
+    """
+    GEXF LPU specification parser.
+
+    Extract LPU specification data from a GEXF file and store it in
+    Python data structures.
+    TODO: Update
+
+    Parameters
+    ----------
+    filename : str
+        GEXF filename.
+
+    Returns
+    -------
+    TODO: Update
+    """
+
+    graph = read_gexf(filename)
+    return graph_to_dicts(graph)
+
+def lpu_parser_legacy(filename):
+    """
+    TODO: Update
+    """
+
+    graph = read_gexf(filename)
+    return graph_to_dicts(conv_legacy_graph(graph))
@@ -122,3 +122,70 @@ def read_array(filename):
     result = h5file['/array'][:]
     h5file.close()
     return result
+
+def write_dict(d, filename):
+    """
+    Write nested dictionary of numpy arrays and scalars to HDF5 file.
+
+    Each dictionary is stored as a group; arrays are stored as datasets and
+    scalars as attributes of the group containing them.
+
+    Parameters
+    ----------
+    d : dict
+        Dictionary to store. Keys must be strings; values must be numpy
+        arrays, scalars, strings or dictionaries satisfying the same
+        constraints.
+    filename: str
+        HDF5 file to write.
+
+    See Also
+    --------
+    read_dict
+    """
+
+    def write_group(group, d):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                write_group(group.create_group(k), v)
+            elif isinstance(v, np.ndarray):
+                group.create_dataset(k, data=v)
+            else:
+                group.attrs[k] = v
+
+    h5file = h5py.File(filename, 'w')
+    write_group(h5file, d)
+    h5file.close()
+
+def read_dict(filename):
+    """
+    Read nested dictionary of numpy arrays and scalars from HDF5 file.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 file to read.
+
+    Returns
+    -------
+    d : dict
+        Dictionary read from file.
+
+    See Also
+    --------
+    write_dict
+    """
+
+    def read_group(group):
+        d = dict(group.attrs.items())
+        for k, v in group.items():
+            if isinstance(v, h5py.Group):
+                d[k] = read_group(v)
+            else:
+                d[k] = v[()]
+        return d
+
+    h5file = h5py.File(filename, 'r')
+    result = read_group(h5file)
+    h5file.close()
+    return result
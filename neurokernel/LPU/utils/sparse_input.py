@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""
+Sparse matrix formulation of the summation of component inputs.
+
+The inputs of the components of a model are gathered from the history of a
+variable stored in a CircularArray of shape (buffer_length, size), where row
+`(current-delay) % buffer_length` holds the values of the variable `delay`
+steps ago. Grouping the connections by delay turns the summation into one
+sparse matrix-vector product per distinct delay.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+def input_matrices(pre, npre, delay, num_inputs, weights=None,
+                   dtype=np.double):
+    """
+    Build the sparse matrices that sum the inputs of a set of components.
+
+    Parameters
+    ----------
+    pre : array_like
+        Index of the presynaptic entry of each connection, grouped by
+        postsynaptic component.
+    npre : array_like
+        Number of connections of each postsynaptic component.
+    delay : array_like
+        Delay (in steps) of each connection.
+    num_inputs : int
+        Number of entries of the variable, i.e., the size of a row of its
+        CircularArray.
+    weights : array_like
+        Weight of each connection. Defaults to 1.
+    dtype : numpy.dtype
+        Data type of the matrices.
+
+    Returns
+    -------
+    matrices : OrderedDict
+        CSR matrix of shape (len(npre), num_inputs) for each distinct delay.
+        Connections that appear several times are summed.
+    """
+
+    from scipy.sparse import csr_matrix
+
+    pre = np.asarray(pre, np.int64)
+    npre = np.asarray(npre, np.int64)
+    delay = np.asarray(delay, np.int64)
+    rows = np.repeat(np.arange(len(npre)), npre)
+    if weights is None:
+        weights = np.ones(len(pre), dtype)
+    else:
+        weights = np.asarray(weights, dtype)
+    assert(len(rows) == len(pre) == len(delay) == len(weights))
+
+    matrices = OrderedDict()
+    for d in np.unique(delay):
+        mask = delay == d
+        matrices[int(d)] = csr_matrix((weights[mask], (rows[mask], pre[mask])),
+                                      shape=(len(npre), num_inputs))
+    if not matrices:
+        matrices[0] = csr_matrix((len(npre), num_inputs), dtype=dtype)
+    return matrices
+
+def sum_input(matrices, history, current):
+    """
+    Sum inputs from the history of a variable.
+
+    Parameters
+    ----------
+    matrices : OrderedDict
+        Matrices returned by `input_matrices`.
+    history : numpy.ndarray
+        Contents of the CircularArray of the variable, of shape
+        (buffer_length, size).
+    current : int
+        Current row of the CircularArray.
+
+    Returns
+    -------
+    res : numpy.ndarray
+        Sum of the inputs of each component.
+    """
+
+    res = None
+    for d, m in matrices.items():
+        x = m.dot(history[(current-d) % history.shape[0]])
+        res = x if res is None else res+x
+    return res
+
+def aggregator_current(g_matrices, rev_matrices, g_history, g_current, V):
+    """
+    Compute the current I = -sum_i g_i*(V-V_rev_i) of each component.
+
+    The term is evaluated as two sparse matrix-vector products per delay,
+    sum_i g_i and sum_i V_rev_i*g_i, so that
+    I = sum_i V_rev_i*g_i - V*sum_i g_i.
+
+    Parameters
+    ----------
+    g_matrices : OrderedDict
+        Matrices that sum the conductances, from `input_matrices`.
+    rev_matrices : OrderedDict
+        Matrices that sum the conductances weighted by the reversal
+        potentials, from `input_matrices`.
+    g_history : numpy.ndarray
+        Contents of the CircularArray of the conductances.
+    g_current : int
+        Current row of the conductance CircularArray.
+    V : numpy.ndarray
+        Membrane potential of each component.
+
+    Returns
+    -------
+    I : numpy.ndarray
+        Current of each component.
+    """
+
+    return sum_input(rev_matrices, g_history, g_current) - \
+        V*sum_input(g_matrices, g_history, g_current)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""
+Timing of the sections of a simulation step.
+"""
+
+from collections import OrderedDict
+import time
+
+import numpy as np
+
+class StepTimer(object):
+    """
+    Accumulate the time spent in each section of a simulation step.
+
+    A step is divided into consecutive sections by calls to `mark`; the time
+    elapsed since the previous call (or since `start_step`) is attributed
+    to the named section. Sections marked several times in a step are
+    summed. The per-step totals of each section are aggregated into
+    histograms with logarithmically spaced bins.
+
+    Parameters
+    ----------
+    clock : str
+        'cuda' records CUDA events on the default stream, which measure the
+        time taken by the kernels launched in each section; 'wall' measures
+        wall-clock time on the host.
+    bin_edges : array_like
+        Edges of the histogram bins in seconds. Defaults to 100 bins per
+        decade between 1 us and 10 s.
+    """
+
+    def __init__(self, clock='cuda', bin_edges=None):
+        if clock not in ['cuda', 'wall']:
+            raise ValueError('unsupported clock %r' % clock)
+        self.clock = clock
+        if clock == 'cuda':
+            import pycuda.driver as cuda
+            self._event_cls = cuda.Event
+        if bin_edges is None:
+            bin_edges = 10**np.linspace(-6, 1, 701)
+        self.bin_edges = np.asarray(bin_edges)
+        self.sections = OrderedDict()
+        self.steps = 0
+        self._events = []
+        self._names = []
+
+    def _record(self):
+        i = len(self._names)
+        if self.clock == 'wall':
+            if i < len(self._events):
+                self._events[i] = time.time()
+            else:
+                self._events.append(time.time())
+        else:
+            # Reuse the events of previous steps:
+            if i == len(self._events):
+                self._events.append(self._event_cls())
+            self._events[i].record()
+
+    def start_step(self):
+        """
+        Start timing a step.
+        """
+
+        del self._names[:]
+        self._record()
+        self._names.append(None)
+
+    def mark(self, name):
+        """
+        Attribute the time elapsed since the previous mark to a section.
+        """
+
+        self._record()
+        self._names.append(name)
+
+    def end_step(self):
+        """
+        Finish timing a step and add its sections to the histograms.
+        """
+
+        n = len(self._names)
+        if self.clock == 'wall':
+            elapsed = np.diff(self._events[:n])
+        else:
+            self._events[n-1].synchronize()
+            elapsed = np.array([self._events[i+1].time_since(self._events[i])
+                                for i in range(n-1)])*1e-3
+        totals = OrderedDict()
+        for name, t in zip(self._names[1:], elapsed):
+            totals[name] = totals.get(name, 0.)+t
+        for name, t in totals.items():
+            try:
+                s = self.sections[name]
+            except KeyError:
+                s = self.sections[name] = {
+                    'count': 0, 'total': 0., 'min': np.inf, 'max': 0.,
+                    'hist': np.zeros(len(self.bin_edges)+1, np.int64)}
+            s['count'] += 1
+            s['total'] += t
+            s['min'] = min(s['min'], t)
+            s['max'] = max(s['max'], t)
+            s['hist'][np.searchsorted(self.bin_edges, t)] += 1
+        self.steps += 1
+
+    def percentile(self, name, q):
+        """
+        Estimate a percentile of the per-step time of a section from its
+        histogram.
+        """
+
+        s = self.sections[name]
+        i = np.searchsorted(np.cumsum(s['hist']), q/100.*s['count'])
+        edges = np.concatenate([[s['min']], self.bin_edges, [s['max']]])
+        return min(max(edges[i+1], s['min']), s['max'])
+
+    def get_timings(self):
+        """
+        Return statistics of the per-step time of each section.
+
+        Returns
+        -------
+        timings : OrderedDict
+            Dictionary mapping each section to a dictionary with the number
+            of steps in which it was timed ('count'), the total, mean,
+            minimum, maximum and median time in seconds, and the histogram
+            counts ('hist') for the bins delimited by `bin_edges`, with
+            an additional bin at each end for times outside them.
+        """
+
+        timings = OrderedDict()
+        for name, s in self.sections.items():
+            timings[name] = dict(s, mean=s['total']/s['count'],
+                                 median=self.percentile(name, 50),
+                                 hist=s['hist'].copy())
+        return timings
+
+    def summary(self):
+        """
+        Return a table of the timing statistics of all sections.
+        """
+
+        total = sum([s['total'] for s in self.sections.values()])
+        width = max([len(str(n)) for n in self.sections]+[7])
+        lines = ['%-*s %10s %10s %10s %10s %7s' % \
+                 (width, 'section', 'mean [us]', 'p50 [us]', 'p99 [us]',
+                  'max [us]', 'share')]
+        for name, s in self.sections.items():
+            lines.append('%-*s %10.1f %10.1f %10.1f %10.1f %6.1f%%' % \
+                         (width, name, s['total']/s['count']*1e6,
+                          self.percentile(name, 50)*1e6,
+                          self.percentile(name, 99)*1e6, s['max']*1e6,
+                          100.*s['total']/total if total else 0.))
+        lines.append('%d steps, %.3f s total' % (self.steps, total))
+        return '\n'.join(lines)
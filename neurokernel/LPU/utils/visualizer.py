@@ -6,8 +6,12 @@ LPU output visualization.
 
 import collections
 from collections import OrderedDict
+import io
 import itertools
+import multiprocessing
+import numbers
 import os
+import subprocess
 import h5py
 
 import matplotlib
@@ -19,11 +23,217 @@ from matplotlib.animation import FFMpegFileWriter, AVConvFileWriter
 from matplotlib.colors import hsv_to_rgb
 import networkx as nx
 import numpy as np
-from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
 from shutilwhich import which
 
 import simpleio as sio
 
+class _WindowedDataset(object):
+    """
+    Lazily loaded view of a dataset in an LPU input/output HDF5 file.
+
+    The dataset is kept on disk and indexed as `[uid index, time index]`
+    regardless of its storage layout. Only rows registered with `request()`
+    are read, one window of time steps at a time, so that plotting a few
+    components of a large output does not require loading the whole
+    dataset into memory.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 file containing the dataset.
+    name : str
+        Path of the dataset within the file.
+    transpose_axes : list
+        Permutation that maps the stored axes to `[uid, time]`.
+    win : slice/list (Optional)
+        Restrict the view to the specified time indices.
+    window : int
+        Number of time steps read from disk at a time.
+    """
+
+    def __init__(self, filename, name, transpose_axes=[1,0], win=None,
+                 window=1000):
+        self.filename = filename
+        self.name = name
+        self.window = window
+        self._uid_axis, self._time_axis = transpose_axes
+        self._file = None
+
+        shape = self.dataset.shape
+        num_times = shape[self._time_axis]
+        if win is None:
+            win = slice(None)
+        if isinstance(win, slice):
+            start, stop, step = win.indices(num_times)
+            self._tinds = None
+            self._tslice = (start, step)
+            num_times = len(range(start, stop, step))
+        else:
+            self._tinds = np.asarray(win, dtype=np.int64)
+            num_times = len(self._tinds)
+        self.shape = (shape[self._uid_axis], num_times)
+        self.dtype = self.dataset.dtype
+
+        self._rows = np.zeros(0, np.int64)
+        self._row_pos = {}
+        self._cache = None
+        self._cache_start = 0
+
+    @property
+    def dataset(self):
+        if self._file is None:
+            self._file = h5py.File(self.filename, 'r')
+        return self._file[self.name]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._cache = None
+
+    def request(self, rows):
+        """
+        Register rows (uid indices) that will be read from the dataset.
+        """
+        rows = np.union1d(self._rows, np.asarray(rows, np.int64).ravel())
+        if len(rows) != len(self._rows):
+            self._rows = rows
+            self._row_pos = {r: i for i, r in enumerate(rows)}
+            self._cache = None
+
+    def _read(self, rows, start, stop):
+        """
+        Read `rows` of the time window `[start, stop)` from disk.
+        """
+        rows = [int(r) for r in rows]
+        if not rows or stop <= start:
+            return np.zeros((len(rows), max(stop-start, 0)), self.dtype)
+        sel = [None, None]
+        sel[self._uid_axis] = rows
+        if self._tinds is None:
+            t0, step = self._tslice
+            sel[self._time_axis] = slice(t0+start*step, t0+stop*step, step)
+            data = self.dataset[tuple(sel)]
+        else:
+            # h5py only supports one list index per selection, so read the
+            # enclosing contiguous span and select the time indices in memory:
+            tinds = self._tinds[start:stop]
+            t0 = tinds.min()
+            sel[self._time_axis] = slice(t0, tinds.max()+1)
+            data = np.take(self.dataset[tuple(sel)], tinds-t0,
+                           axis=self._time_axis)
+        return data if self._uid_axis == 0 else data.T
+
+    def _get_block(self, rows, start, stop):
+        """
+        Return `rows` of the time window `[start, stop)` as a 2D array.
+        """
+        missing = [r for r in rows if r not in self._row_pos]
+        if missing:
+            self.request(missing)
+
+        # Spans larger than the window are only needed occasionally (e.g.,
+        # to compute color limits) and bypass the cache:
+        if stop-start > self.window:
+            uniq = np.unique(rows)
+            pos = {r: i for i, r in enumerate(uniq)}
+            data = self._read(uniq, start, stop)
+            return data[[pos[r] for r in rows]]
+
+        if self._cache is None or start < self._cache_start or \
+           stop > self._cache_start+self._cache.shape[1]:
+            self._cache_start = start
+            self._cache = self._read(self._rows, start,
+                                     min(start+self.window, self.shape[1]))
+        data = self._cache[:, start-self._cache_start:stop-self._cache_start]
+        return data[[self._row_pos[r] for r in rows]]
+
+    def __getitem__(self, key):
+        rows, cols = key
+        rows = np.asarray(rows, np.int64)
+        flat = [int(r) for r in rows.ravel()]
+        if isinstance(cols, slice):
+            start, stop, step = cols.indices(self.shape[1])
+            block = self._get_block(flat, start, max(start, stop))[:, ::step]
+            return block.reshape(rows.shape+(block.shape[1],))
+        col = int(cols)
+        if col < 0:
+            col += self.shape[1]
+        if not 0 <= col < self.shape[1]:
+            raise IndexError('time index %d out of range' % col)
+        return self._get_block(flat, col, col+1)[:, 0].reshape(rows.shape)
+
+class _MinMaxPyramid(object):
+    """
+    Level-of-detail min/max envelope of a sampled trace.
+
+    Level k holds the minimum and maximum of consecutive bins of 2**k
+    samples. Any range of the trace can therefore be drawn at roughly one
+    bin per horizontal pixel, so the number of vertices is bounded by the
+    width of the axes rather than by the length of the trace.
+
+    Parameters
+    ----------
+    y : array_like
+        Samples of the trace.
+    """
+
+    def __init__(self, y):
+        y = np.asarray(y, np.double).ravel()
+        self.levels = [(y, y)]
+        while len(self.levels[-1][0]) > 1:
+            lo, hi = self.levels[-1]
+            idx = np.arange(0, len(lo), 2)
+            self.levels.append((np.minimum.reduceat(lo, idx),
+                                np.maximum.reduceat(hi, idx)))
+
+    def get(self, start, stop, samples_per_bin):
+        """
+        Return the envelope of samples `[start, stop)`.
+
+        Bins only include samples before `stop`, so the envelope of a trace
+        that is still being revealed never shows future values.
+
+        Parameters
+        ----------
+        start, stop : int
+            Range of sample indices.
+        samples_per_bin : float
+            Desired number of samples per bin, e.g., the number of samples
+            that fall within one pixel.
+
+        Returns
+        -------
+        x : numpy.ndarray
+            Sample index of each vertex.
+        y : numpy.ndarray
+            Value of each vertex.
+        """
+
+        y = self.levels[0][0]
+        start = max(0, start)
+        stop = min(stop, len(y))
+        if stop <= start:
+            return np.zeros(0), np.zeros(0)
+        k = int(np.floor(np.log2(max(samples_per_bin, 1))))
+        k = min(k, len(self.levels)-1)
+        if k == 0:
+            return np.arange(start, stop, dtype=np.double), y[start:stop]
+
+        b0 = start >> k
+        b1 = stop >> k
+        lo, hi = self.levels[k]
+        lo = lo[b0:b1]
+        hi = hi[b0:b1]
+        if stop > b1 << k:
+            # Partially revealed last bin:
+            tail = y[b1 << k:stop]
+            lo = np.append(lo, tail.min())
+            hi = np.append(hi, tail.max())
+        x = np.repeat(np.arange(b0, b0+len(lo), dtype=np.double)*(1 << k), 2)
+        return x, np.column_stack((lo, hi)).ravel()
+
 class visualizer(object):
     """
     Visualize the output produced by LPU models.
@@ -70,7 +280,8 @@ class visualizer(object):
         self._FFMpeg = None
 
     def add_LPU(self, data_file, LPU='', win=None, is_input=False,gexf_file=None,
-                sample_interval=1, start_time=0, dt=1e-4, transpose_axes = [1,0]):
+                sample_interval=1, start_time=0, dt=1e-4, transpose_axes = [1,0],
+                window=1000):
         """
         Add data associated with a specific LPU to a visualization.
 
@@ -109,6 +320,10 @@ class visualizer(object):
             These arguments will only be used to set these attributes for
             input h5 files. For all other cases, these will be read from
             the h5 file
+        window : int (Optional)
+            Number of time steps of data read from disk at a time. The data
+            files are kept open and only the components referenced by
+            `add_plot()` are loaded as the animation advances.
         
         All arguments beyond LPU should be considered strictly keyword only
         """
@@ -118,13 +333,14 @@ class visualizer(object):
             self._sample_intervals[LPU] = sample_interval
             self._dts[LPU] = dt * sample_interval
             self._start_times[LPU] = start_time
-            f = h5py.File(data_file)
+            f = h5py.File(data_file, 'r')
             self._uids[LPU] = {}
             self._data[LPU] = {}
             for k, d in f.items():
-                self._uids[LPU][k] = f[k]['uids'].value
-                self._data[LPU][k] = np.transpose(f[k]['data'].value,
-                                                  axes = transpose_axes)
+                self._uids[LPU][k] = f[k]['uids'][()]
+                self._data[LPU][k] = _WindowedDataset(
+                    data_file, k+'/data', transpose_axes=transpose_axes,
+                    window=window)
                 
             self._config[LPU] = []
             if self._maxt:
@@ -136,7 +352,7 @@ class visualizer(object):
             return
 
         self._config[LPU] = []
-        f = h5py.File(data_file)
+        f = h5py.File(data_file, 'r')
             
         self._sample_intervals[LPU] = f['metadata'].attrs['sample_interval']
         self._dts[LPU] = f['metadata'].attrs['dt'] * self._sample_intervals[LPU]
@@ -145,14 +361,12 @@ class visualizer(object):
         self._data[LPU] = {}
         for k, d in f.items():
             if k=='metadata': continue
-            self._uids[LPU][k] = f[k]['uids'].value
-            self._data[LPU][k] = np.transpose(f[k]['data'].value,
-                                              axes = transpose_axes)
+            self._uids[LPU][k] = f[k]['uids'][()]
+            self._data[LPU][k] = _WindowedDataset(
+                data_file, k+'/data', transpose_axes=transpose_axes, win=win,
+                window=window)
         
-        if win is not None:
-            for k in self._data[LPU].keys():
-                self._data[LPU][k] = self._data[LPU][k][:,win]
-        k = self._data[LPU].keys()[0]
+        k = list(self._data[LPU].keys())[0]
         if self._maxt:
             self._maxt = min(self._maxt,
                              (self._data[LPU][k].shape[1]-1)*self._dts[LPU])
@@ -160,7 +374,8 @@ class visualizer(object):
             self._maxt = (self._data[LPU][k].shape[1]-1)*self._dts[LPU]
         f.close()
         
-    def run(self, final_frame_name=None, dpi=300):
+    def run(self, final_frame_name=None, dpi=300, processes=1,
+            frames_per_task=None):
         """
         Starts the visualization process.
 
@@ -179,6 +394,15 @@ class visualizer(object):
         dpi : int, default=300
             Resolution at which final frame is saved to disk if
             `final_frame_name` is specified.
+        processes : int, default=1
+            Number of worker processes used to render the frames of a video.
+            If greater than 1 (or None, to use all CPUs), the frames are
+            split into contiguous tasks rendered in parallel to raw RGBA
+            buffers and streamed in order into a single ffmpeg/avconv pipe.
+            If `out_filename` contains a '%d' style pattern and no encoder
+            is available, the frames are written as an image sequence.
+        frames_per_task : int, optional
+            Number of consecutive frames rendered by a worker per task.
 
         Notes
         -----
@@ -188,6 +412,9 @@ class visualizer(object):
         """
 
         self.final_frame_name = final_frame_name
+        if processes != 1 and self.out_filename and self.update_interval:
+            self._run_parallel(processes, frames_per_task, dpi)
+            return
         self._initialize()
         if not self._update_interval:
             self._update_interval = self._maxt
@@ -202,6 +429,90 @@ class visualizer(object):
         if self.out_filename:
             self._close()
 
+    def _run_parallel(self, processes, frames_per_task, dpi):
+        """
+        Render the frames of a video in a pool of worker processes.
+        """
+
+        if self._update_interval == -1:
+            self._update_interval = max(np.asarray(list(self._dts.values())))*50
+        num_frames = 1+len(np.arange(self._t,
+                                     self._maxt*(1+np.finfo(float).eps),
+                                     self._update_interval))
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if frames_per_task is None:
+            frames_per_task = int(np.ceil(num_frames/float(4*processes)))
+        tasks = [(i, min(i+frames_per_task, num_frames), dpi)
+                 for i in range(0, num_frames, frames_per_task)]
+        self._num_frames = num_frames
+
+        # Workers reopen the data files, so don't share open HDF5 handles
+        # across the fork:
+        self._close_data()
+        pool = multiprocessing.Pool(processes, _init_render_worker, (self,))
+        sink = None
+        try:
+            # imap() returns the results of the tasks in order, so frames are
+            # written in the same sequence as in the serial mode:
+            for size, frames in pool.imap(_render_frames, tasks):
+                if sink is None:
+                    sink = _FrameSink(self.out_filename, size, self.fps,
+                                      self.codec, self._encoder())
+                for frame in frames:
+                    sink.write(frame)
+        finally:
+            pool.close()
+            pool.join()
+            if sink is not None:
+                sink.close()
+
+    def _encoder(self):
+        """
+        Return the path of the program used to encode videos, if any.
+        """
+
+        ffmpeg = which(matplotlib.rcParams['animation.ffmpeg_path'])
+        avconv = which(matplotlib.rcParams['animation.avconv_path'])
+        if self.FFMpeg is None:
+            return ffmpeg or avconv
+        return ffmpeg if self.FFMpeg else avconv
+
+    def _render(self, start, stop, dpi):
+        """
+        Render frames `[start, stop)` of the animation to raw RGBA buffers.
+
+        Frame 0 is the initial state of the figure, frame i > 0 is the state
+        after the i-th update. The figure is created on first use and advanced
+        without drawing up to `start`, so a worker must be asked for frames in
+        increasing order.
+        """
+
+        if not hasattr(self, '_frame'):
+            self._initialize(writer=False)
+            self._frame = 0
+        assert(start >= self._frame)
+        while self._frame < start:
+            self._update(draw=False)
+            self._frame += 1
+        # Same resolution as the frames grabbed by the serial writer; the
+        # size of the buffers depends on the dpi they are saved at, not on
+        # that of the figure:
+        frame_dpi = 80
+        w, h = self.f.get_size_inches()*frame_dpi
+        size = (int(w), int(h))
+        frames = []
+        for i in range(start, stop):
+            if i > self._frame:
+                self._update(draw=False)
+                self._frame += 1
+            buf = io.BytesIO()
+            self.f.savefig(buf, format='raw', dpi=frame_dpi)
+            frames.append(buf.getvalue())
+        if self.final_frame_name is not None and stop == self._num_frames:
+            self.f.savefig(self.final_frame_name, dpi=dpi)
+        return size, frames
+
     def _set_wrapper(self, obj, name, value):
         name = name.lower()
         func = getattr(obj, 'set_'+name, None)
@@ -214,7 +525,7 @@ class visualizer(object):
                 except:
                     pass
 
-    def _initialize(self):
+    def _initialize(self, writer=True):
 
         # Count number of plots to create:
         num_plots = 0
@@ -234,7 +545,7 @@ class visualizer(object):
         cnt = 0
         self.handles = []
         self.types = []
-        keywds = ['handle', 'ydata', 'fmt', 'type', 'ids', 'shape', 'norm']
+        keywds = ['handle', 'envelope', 'fmt', 'type', 'ids', 'shape', 'norm']
         # TODO: Irregular grid in U will make the plot better
         U, V = np.mgrid[0:np.pi/2:complex(0, 60),
                         0:2*np.pi:complex(0, 60)]
@@ -328,7 +639,8 @@ class visualizer(object):
                     if len(config['ids'][0])==1:
                         config['handle'] = self.axarr[ind].plot([0], \
                                             [self._data[LPU][var][config['ids'][0][0],0]], fmt)[0]
-                        config['ydata'] = [self._data[LPU][var][config['ids'][0][0],0]]
+                        config['envelope'] = _MinMaxPyramid(
+                            self._data[LPU][var][config['ids'][0], :])
                     else:
                         config['handle'] = self.axarr[ind].plot(self._data[LPU][var][config['ids'][0],0])[0]
 
@@ -378,17 +690,18 @@ class visualizer(object):
                     yy = np.sin(longpositions) * np.sin(latpositions)
                     zz = np.cos(latpositions)
                     config['positions'] = (xx, yy, zz)
-                    colors = griddata(config['positions'], self._data[LPU][var][config['ids'][0],0],
-                                      self._dome_pos_flat, 'nearest').reshape(self._dome_arr_shape)
-                    colors = config['norm'](colors).data
-                    colors = np.tile(np.reshape(colors,
-                                                [self._dome_arr_shape[0],self._dome_arr_shape[1],1])
-                                     ,[1,1,4])
-                    colors[:,:,3] = 1.0
-                    config['handle'].plot_surface(self._dome_pos[0], self._dome_pos[1],
-                                                  self._dome_pos[2], rstride=1, cstride=1,
-                                                  facecolors=colors, antialiased=False,
-                                                  shade=False)
+                    # The component positions are fixed, so the nearest
+                    # component of every point on the dome is only computed
+                    # once and reused as an index gather in each frame:
+                    tree = cKDTree(np.column_stack(config['positions']))
+                    config['dome_inds'] = tree.query(
+                        np.column_stack(self._dome_pos_flat))[1]
+                    colors = self._dome_colors(
+                        config, self._data[LPU][var][config['ids'][0],0])
+                    config['surface'] = config['handle'].plot_surface(
+                        self._dome_pos[0], self._dome_pos[1],
+                        self._dome_pos[2], rstride=1, cstride=1,
+                        facecolors=colors, antialiased=False, shade=False)
 
                 for key in config.iterkeys():
                     if key not in keywds:
@@ -410,6 +723,8 @@ class visualizer(object):
 
         plt.tight_layout()
 
+        if not writer:
+            return
         if self.out_filename and self.update_interval:
             if self.FFMpeg is None:
                 if which(matplotlib.rcParams['animation.ffmpeg_path']):
@@ -439,7 +754,7 @@ class visualizer(object):
         elif not self.final_frame_name:
             self.f.show()
 
-    def _update(self):
+    def _update(self, draw=True):
         t = self._t
         for LPU, configs in self._config.iteritems():
             dt = self._dts[LPU]
@@ -449,28 +764,32 @@ class visualizer(object):
                 if config['type'] == 3:
                     if round(float(t)/dt) >= data.shape[1] : continue
                     if len(config['ids'][0])==1:
-                        s = int(round(float(t-self._update_interval)/dt))
-                        e = int(round(float(t)/dt))
-                        config['ydata'].extend(
-                            np.reshape(np.double(data[config['ids'][0], \
-                                        max(0,s):min(e,data.shape[1])]),(-1,)))
-                        config['handle'].set_xdata(dt* np.arange(0, \
-                                len(config['ydata']))+self._start_times[LPU])
-                        config['handle'].set_ydata(np.asarray(config['ydata']))
+                        # Only draw the part of the trace revealed so far
+                        # that is visible, at about one bin per pixel:
+                        ax = config['handle'].axes
+                        t0 = self._start_times[LPU]
+                        xmin, xmax = ax.get_xlim()
+                        width = max(ax.get_window_extent().width, 1)
+                        e = min(int(round(float(t)/dt)), data.shape[1])
+                        x, y = config['envelope'].get(
+                            int(np.floor((xmin-t0)/dt)),
+                            min(e, int(np.ceil((xmax-t0)/dt))+1),
+                            (xmax-xmin)/dt/width)
+                        config['handle'].set_data(dt*x+t0, y)
                     else:
                         config['handle'].set_ydata(data[config['ids'][0],
                                                         int(round(float(t)/dt))])
                 elif config['type']==4:
                     if int(round(float(t)/dt)) >= data.shape[1] : continue
-                    for j, id in enumerate((config['ids'][0])):
-                        s = int(round(float(t-self._update_interval)/dt))
-                        e = int(round(float(t)/dt))
-                        tmp = np.where(data[id, \
-                                      max(0,s):min(e,data.shape[1])])[0]
-                        for tind in tmp:
-                            shift = self._start_times[LPU]
-                            config['handle'].vlines(float(shift+(max(0,s)+tind)*dt),
-                                                    j+0.75, j+1.25)
+                    s = max(0, int(round(float(t-self._update_interval)/dt)))
+                    e = min(int(round(float(t)/dt)), data.shape[1])
+                    spikes = np.atleast_2d(data[config['ids'][0], s:e])
+                    # Draw all spikes of the interval as a single collection:
+                    rows, tinds = np.nonzero(spikes)
+                    if len(rows):
+                        config['handle'].vlines(
+                            self._start_times[LPU]+(s+tinds)*dt,
+                            rows+0.75, rows+1.25)
                 elif config['type'] == 0:
                     if int(round(float(t)/dt)) >= data.shape[1] : continue
                     ind = int(round(float(t)/dt))
@@ -506,25 +825,13 @@ class visualizer(object):
                     if int(round(float(t)/dt)) >= data.shape[1] : continue
                     ind = int(round(float(t)/dt))
                     ids = config['ids']
-                    d = data[ids[0], ind]
-                    colors = griddata(config['positions'], d,
-                                      self._dome_pos_flat, 'nearest').reshape(self._dome_arr_shape)
-                    colors = config['norm'](colors).data
-                    colors = np.tile(np.reshape(colors,
-                                                [self._dome_arr_shape[0],self._dome_arr_shape[1],1])
-                                     ,[1,1,4])
-                    colors[:,:,3] = 1.0
-
-                    config['handle'].clear()
-                    config['handle'].xaxis.set_ticks([])
-                    config['handle'].yaxis.set_ticks([])
-                    config['handle'].zaxis.set_ticks([])
-
-                    config['handle'].plot_surface(self._dome_pos[0], self._dome_pos[1],
-                                                  self._dome_pos[2], rstride=1, cstride=1,
-                                                  facecolors=colors, antialiased=False,
-                                                  shade=False)
-                keywds = ['handle', 'ydata', 'fmt', 'type', 'ids', 'shape', 'norm']
+                    colors = self._dome_colors(config, data[ids[0], ind])
+                    # plot_surface() creates one face per grid cell in row
+                    # major order, colored by the cell's first vertex:
+                    colors = colors[:-1,:-1].reshape(-1, 4)
+                    config['surface'].set_facecolor(colors)
+                    config['surface'].set_edgecolor(colors)
+                keywds = ['handle', 'envelope', 'fmt', 'type', 'ids', 'shape', 'norm']
                 for key in config.iterkeys():
                     if key not in keywds:
                         try:
@@ -536,12 +843,25 @@ class visualizer(object):
                             self._set_wrapper(config['handle'],key, config[key])
                         except:
                             pass
-        self.f.canvas.draw()
-        if self.out_filename:
-            self.writer.grab_frame()
+        if draw:
+            self.f.canvas.draw()
+            if self.out_filename:
+                self.writer.grab_frame()
 
         self._t+=self._update_interval
 
+    def _dome_colors(self, config, d):
+        """
+        Map component values onto the RGBA colors of the dome grid.
+        """
+        colors = np.asarray(d)[config['dome_inds']].reshape(self._dome_arr_shape)
+        colors = config['norm'](colors).data
+        colors = np.tile(np.reshape(colors,
+                                    [self._dome_arr_shape[0],self._dome_arr_shape[1],1])
+                         ,[1,1,4])
+        colors[:,:,3] = 1.0
+        return colors
+
     def add_plot(self, config_dict, LPU):
         """
         Add a plot to the visualizer
@@ -616,13 +936,17 @@ class visualizer(object):
                 config['ids'].append([np.where(self._uids[LPU][var]==uid)[0][0]
                                       for uid in uids])
             self._config[LPU].append(config)
+            for ids in config['ids']:
+                self._data[LPU][var].request(ids)
         elif str(LPU).startswith('input'):
             config['ids'] = [range(0, self._data[LPU][var].shape[0])]
             self._config[LPU].append(config)
+            self._data[LPU][var].request(config['ids'][0])
         else:
             config['uids'] = self._uids[LPU][var]
-            config['ids'] = [[range(0,len(config['uids']))]]
+            config['ids'] = [range(0,len(config['uids']))]
             self._config[LPU].append(config)
+            self._data[LPU][var].request(config['ids'][0])
             #raise ValueError('uids must be provided')
             '''
             config['ids'] = {}
@@ -643,6 +967,12 @@ class visualizer(object):
     def _close(self):
         self.writer.finish()
         plt.close(self.f)
+        self._close_data()
+
+    def _close_data(self):
+        for data in self._data.values():
+            for d in data.values():
+                d.close()
 
     @property
     def xlim(self):
@@ -763,3 +1093,51 @@ class visualizer(object):
     @update_interval.setter
     def update_interval(self, value):
         self._update_interval = value
+
+class _FrameSink(object):
+    """
+    Write raw RGBA frames to a video encoder pipe or to an image sequence.
+
+    If `filename` contains a '%d' style pattern, each frame is saved as a
+    separate image; otherwise the frames are piped to `encoder`.
+    """
+
+    def __init__(self, filename, size, fps, codec, encoder=None):
+        self.filename = filename
+        self.size = size
+        self.count = 0
+        self.proc = None
+        if '%' in filename:
+            return
+        if not encoder:
+            raise RuntimeError('cannot find ffmpeg or avconv')
+        cmd = [encoder, '-y', '-f', 'rawvideo', '-vcodec', 'rawvideo',
+               '-s', '%dx%d' % tuple(size), '-pix_fmt', 'rgba',
+               '-r', str(fps), '-i', 'pipe:0', '-vcodec', codec, filename]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        if self.proc is not None:
+            self.proc.stdin.write(frame)
+        else:
+            w, h = self.size
+            plt.imsave(self.filename % self.count,
+                       np.frombuffer(frame, np.uint8).reshape((h, w, 4)))
+        self.count += 1
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            if self.proc.wait():
+                raise RuntimeError('video encoder exited with status %d' % \
+                                   self.proc.returncode)
+
+# Visualizer copied into each rendering worker process:
+_render_vis = None
+
+def _init_render_worker(vis):
+    global _render_vis
+    _render_vis = vis
+
+def _render_frames(task):
+    return _render_vis._render(*task)
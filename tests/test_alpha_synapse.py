@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import numpy as np
+
+from benchmarks.device_stub import install
+install()
+
+import pycuda.gpuarray as garray
+
+from neurokernel.LPU.NDComponents.SynapseModels.AlphaSynapse import \
+    AlphaSynapse
+
+class Buffer(object):
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+
+def alpha(ar, ad, t):
+    """
+    Response of a0 to a single spike at t = 0.
+    """
+
+    t = np.maximum(t, 0)
+    if ad == ar:
+        return np.where(t > 0, ar*ar*t*np.exp(-ar*t), 0.)
+    return np.where(t > 0, ar*ad/(ad-ar)*(np.exp(-ar*t)-np.exp(-ad*t)), 0.)
+
+class test_exact_propagator(TestCase):
+    """
+    The 'exact' propagator of AlphaSynapse against the closed form of the
+    alpha function, at a time step at which forward Euler is inaccurate.
+    """
+
+    dt = 2e-3
+
+    def synapses(self, integrator, ar, ad, gmax):
+        cls = AlphaSynapse.with_integrator(integrator)
+        n = len(ar)
+        params = {'ar': garray.to_gpu(np.asarray(ar, np.double)),
+                  'ad': garray.to_gpu(np.asarray(ad, np.double)),
+                  'gmax': garray.to_gpu(np.asarray(gmax, np.double)),
+                  'reverse': garray.to_gpu(np.zeros(n)),
+                  'npre': {'spike_state': garray.to_gpu(np.ones(n, np.int32))}}
+        comp = cls(params, {'spike_state': Buffer(np.int32)}, self.dt)
+        # Computed by pre_run:
+        comp.update_derived_params()
+        return comp
+
+    def run_synapses(self, comp, spikes):
+        g = []
+        for spike in spikes:
+            g.append(comp.update_numpy({'spike_state': spike})['g'])
+        return np.array(g)
+
+    def test_single_spike(self):
+        # ar < ad, ar > ad and ar == ad, the last handled by its own branch
+        # of the coupling:
+        ar = [110., 190., 150., 50.]
+        ad = [190., 110., 150., 50.]
+        gmax = [1., 0.5, 2., 1.]
+        steps = 100
+        spikes = np.zeros((steps, 4), np.int32)
+        spikes[0] = 1
+        t = np.arange(steps)*self.dt
+        expected = np.array([gm*alpha(r, d, t)
+                             for r, d, gm in zip(ar, ad, gmax)]).T
+
+        g = self.run_synapses(self.synapses('exact', ar, ad, gmax), spikes)
+        np.testing.assert_allclose(g, expected, rtol=1e-10,
+                                   atol=1e-10*np.abs(expected).max())
+        # The response decays over the run and ar == ad peaks at 1/ar:
+        self.assertEqual(np.argmax(g[:, 3]), int(round(1./50/self.dt)))
+        self.assertLess(np.abs(g[-1, :3]).max(), 1e-3*g.max())
+
+        # Forward Euler is off by more than 10% at this time step:
+        g = self.run_synapses(self.synapses('euler', ar, ad, gmax), spikes)
+        self.assertGreater(np.abs(g-expected).max(), 0.1*expected.max())
+
+    def test_spike_train(self):
+        # The response to a train of spikes is the sum of the responses to
+        # each spike:
+        rng = np.random.RandomState(0)
+        ar, ad = [110., 150.], [190., 150.]
+        steps = 200
+        spikes = (rng.rand(steps, 2) < 0.1).astype(np.int32)
+        t = np.arange(steps)*self.dt
+        expected = np.zeros((steps, 2))
+        for j in range(2):
+            for k in np.nonzero(spikes[:, j])[0]:
+                expected[:, j] += alpha(ar[j], ad[j], t-t[k])
+        g = self.run_synapses(self.synapses('exact', ar, ad, [1., 1.]),
+                              spikes)
+        np.testing.assert_allclose(g, expected, rtol=1e-9,
+                                   atol=1e-10*expected.max())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+import copy
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import h5py
+import numpy as np
+
+from benchmarks.device_stub import install
+install(run_elementwise=True)
+
+import pycuda.driver as cuda
+
+from neurokernel.LPU.LPU import LPU
+from neurokernel.LPU.Graph import Graph
+from neurokernel.LPU.InputProcessors.FileInputProcessor import \
+    FileInputProcessor
+from neurokernel.LPU.OutputProcessors.FileOutputProcessor import \
+    FileOutputProcessor
+from neurokernel.LPU.NDComponents.AxonHillockModels.LeakyIAF import LeakyIAF
+from neurokernel.LPU.NDComponents.SynapseModels.AlphaSynapse import \
+    AlphaSynapse
+
+DT = 1e-4
+
+class HostStep(object):
+    """
+    Step a component with its NumPy update instead of its kernel, so that
+    the simulation advances with the device stub.
+    """
+
+    def run_step(self, update_pointers, st=None):
+        # The inputs are held while relaxing (see NDComponent.relax):
+        if self._hold_inputs:
+            inputs = {k: self.inputs[k].get() for k in self.accesses}
+        else:
+            inputs = {k: self.sum_in_variable_sparse(k)
+                      for k in self.accesses}
+        for k, v in self.update_numpy(inputs).items():
+            cuda.memcpy_htod(update_pointers[k], np.ascontiguousarray(v))
+
+class HostLeakyIAF(HostStep, LeakyIAF):
+    pass
+
+class HostAlphaSynapse(HostStep, AlphaSynapse):
+    pass
+
+def create_circuit(num_neurons=8):
+    # Neurons driven by the input file and synapses with delays, whose
+    # spike inputs are read from the history of the spike buffer:
+    G = Graph()
+    neurons = ['neuron_%d' % i for i in range(num_neurons)]
+    G.add_neurons(neurons, 'HostLeakyIAF', threshold=-50., resistance=1.,
+                  capacitance=0.01, resting_potential=-60.,
+                  reset_potential=-65., V=np.linspace(-65., -51., num_neurons))
+    G.add_synapses(['synapse_%d' % i for i in range(num_neurons)],
+                   neurons, neurons[1:]+neurons[:1], 'HostAlphaSynapse',
+                   ar=110., ad=190., gmax=1., reverse=0.,
+                   delay=np.arange(1, num_neurons+1)*1e-3)
+    return G.to_lpu_args(), neurons
+
+def snapshot(lpu):
+    """
+    Copy the states of the components, the variable buffers and the time.
+    """
+
+    state = {'time': lpu.time}
+    for model, comp in lpu.components.items():
+        for k, v in comp.get_checkpoint().items():
+            state[(model, k)] = v
+    for var in lpu.memory_manager.variables:
+        buff = lpu.memory_manager.get_buffer(var)
+        state[var] = buff.parr.get()
+        state[(var, 'current')] = buff.current
+    return state
+
+class test_checkpoint(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        (self.comp_dict, self.conns), self.neurons = create_circuit()
+        self.input_file = os.path.join(self.dir, 'input.h5')
+        # Input available for 45 steps:
+        with h5py.File(self.input_file, 'w') as f:
+            f.create_dataset('I/uids', data=np.array(self.neurons, 'S'))
+            f.create_dataset('I/data', data=np.random.RandomState(0).uniform(
+                0., 30., (45, len(self.neurons))))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def lpu(self, output, **kwargs):
+        comp_dict, conns = copy.deepcopy((self.comp_dict, self.conns))
+        return LPU(DT, comp_dict, conns, id='test',
+                   input_processors=[FileInputProcessor(self.input_file)],
+                   output_processors=[FileOutputProcessor(
+                       [('V', None), ('spike_state', None)],
+                       os.path.join(self.dir, output))], **kwargs)
+
+    def run_steps(self, lpu, steps):
+        for _ in range(steps):
+            lpu.run_step()
+
+    def assertStatesEqual(self, a, b):
+        self.assertEqual(sorted(a, key=str), sorted(b, key=str))
+        for k in a:
+            np.testing.assert_array_equal(a[k], b[k], err_msg=str(k))
+
+    def test_resume(self):
+        checkpoint = os.path.join(self.dir, 'checkpoint.h5')
+        N, M = 30, 30
+        lpu = self.lpu('output.h5')
+        lpu.pre_run()
+        self.run_steps(lpu, N)
+        lpu.save_checkpoint(checkpoint)
+        time = lpu.time
+        self.run_steps(lpu, M)
+        expected = snapshot(lpu)
+        lpu.post_run()
+        with h5py.File(os.path.join(self.dir, 'output.h5'), 'r') as f:
+            V = f['V/data'][()]
+            spikes = f['spike_state/data'][()]
+        # The states changed and the synapses received spikes:
+        self.assertGreater(spikes.sum(), 0)
+        self.assertGreater(np.abs(expected[('HostAlphaSynapse', 'a0')]).max(),
+                           0)
+
+        # Resume in a new LPU, past the end of the input:
+        lpu = self.lpu('resumed.h5', checkpoint_in=checkpoint)
+        lpu.pre_run()
+        self.assertEqual(lpu.time, time)
+        self.run_steps(lpu, M)
+        self.assertStatesEqual(snapshot(lpu), expected)
+        lpu.post_run()
+        with h5py.File(os.path.join(self.dir, 'resumed.h5'), 'r') as f:
+            self.assertEqual(f['metadata'].attrs['start_time'], time)
+            np.testing.assert_array_equal(f['V/data'][()], V[N:])
+            np.testing.assert_array_equal(f['spike_state/data'][()],
+                                          spikes[N:])
+
+    def test_restore_after_end_of_input(self):
+        checkpoint = os.path.join(self.dir, 'checkpoint.h5')
+        lpu = self.lpu('output.h5')
+        lpu.pre_run()
+        self.run_steps(lpu, 30)
+        lpu.save_checkpoint(checkpoint)
+        self.run_steps(lpu, 30)
+        expected = snapshot(lpu)
+        # The input processor closed the file at the end of the input:
+        self.assertTrue(lpu.input_processors[0].end_of_file)
+
+        lpu.load_checkpoint(checkpoint)
+        self.run_steps(lpu, 30)
+        self.assertStatesEqual(snapshot(lpu), expected)
+        lpu.post_run()
+
+if __name__ == '__main__':
+    main()
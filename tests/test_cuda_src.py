@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""
+Compilation of the CUDA kernels of the models, and of their variants, for
+the host.
+"""
+
+from unittest import main, TestCase
+
+from benchmarks.device_stub import install, HostModule
+install()
+
+from neurokernel.LPU.NDComponents import model_names, get_model
+
+def variants(cls):
+    """
+    Versions of a model with every integrator, with tables and with
+    adaptive substeps that it supports.
+    """
+
+    result = [cls]
+    if cls.__name__ == 'AlphaSynapse':
+        return result+[cls.with_integrator('exact')]
+    if cls.equations is None:
+        return result
+    for k in sorted(cls.integrator_max_dt):
+        result.append(cls.with_integrator(k))
+    if cls.table_range:
+        result.extend([c.with_tables() for c in result[:]])
+    if cls.adaptive_tolerance:
+        result.append(cls.with_adaptive_steps())
+    return result
+
+def options(cls):
+    # Macros set by the components of the model:
+    if cls.equations is not None:
+        code = cls.get_model_code()
+        params = list(code.params)+list(code.derived)
+    else:
+        params = list(cls.params)+list(cls.derived_params)
+    result = ['-D%s_STRIDE=1' % k for k in params]
+    if getattr(cls, 'integrator', None) == 'exact':
+        result.append('-DEXACT_PROPAGATOR')
+    return result
+
+class test_cuda_src(TestCase):
+    def test_compile(self):
+        compiled = []
+        for name in model_names():
+            model = get_model(name)
+            for cls in variants(model):
+                if cls.equations is not None:
+                    src = cls.get_model_code().cuda_src
+                else:
+                    src = getattr(cls, 'cuda_src', None)
+                if src is None:
+                    continue
+                for precision in [['-DUSE_DOUBLE'], []]:
+                    try:
+                        HostModule(src, precision+options(cls),
+                                   syntax_only=True)
+                    except RuntimeError as e:
+                        self.fail('%s (%s): %s' % (name, cls.__dict__.get(
+                            'integrator', 'default'), e))
+                compiled.append(cls)
+        names = set([cls.__name__ for cls in compiled])
+        for name in ['ConnorStevens', 'HodgkinHuxley', 'AlphaSynapse',
+                     'LeakyIAFwithRefactoryPeriod']:
+            self.assertIn(name, names)
+        self.assertGreater(len(compiled), len(names))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+from neurokernel.LPU.Graph import Graph
+
+class test_graph(TestCase):
+    def test_graph_view_read_only(self):
+        G = Graph()
+        G.add_neuron('a', 'LeakyIAF', threshold=-30.)
+        G.add_neuron('b', 'LeakyIAF')
+        G.add_synapse('s', 'a', 'b', 'AlphaSynapse')
+        g = G.graph
+        self.assertEqual(g.nodes['a']['threshold'], -30.)
+        with self.assertRaises(TypeError):
+            g.nodes['a']['threshold'] = -20.
+        with self.assertRaises(TypeError):
+            g.nodes['a'].update(threshold=-20.)
+        with self.assertRaises(Exception):
+            g.add_node('c')
+        with self.assertRaises(TypeError):
+            list(g.edges(data=True))[0][2]['delay'] = 1.
+        comp_dict, conns = G.to_lpu_args()
+        self.assertEqual(comp_dict['LeakyIAF']['id'], ['a', 'b'])
+        self.assertEqual(comp_dict['LeakyIAF']['threshold'][0], -30.)
+
+        # Copies can be modified:
+        h = G.to_networkx()
+        h.nodes['a']['threshold'] = -20.
+        h.add_node('c')
+        self.assertEqual(G.graph.nodes['a']['threshold'], -30.)
+
+    def test_graph_view_updated(self):
+        G = Graph()
+        G.add_neuron('a', 'LeakyIAF')
+        self.assertEqual(list(G.graph.nodes()), ['a'])
+        G.add_neuron('b', 'LeakyIAF')
+        self.assertEqual(list(G.graph.nodes()), ['a', 'b'])
+
+    def test_repeated_nodes_in_batch(self):
+        G = Graph()
+        G.add_neuron('a', 'LeakyIAF')
+        G.add_neurons(['b', 'b'], 'LeakyIAF', threshold=[-30., -20.])
+
+        H = Graph()
+        H.add_neuron('a', 'LeakyIAF')
+        H.add_neuron('b', 'LeakyIAF', threshold=-30.)
+        H.add_neuron('b', 'LeakyIAF', threshold=-20.)
+
+        self.assertEqual(G.to_lpu_args(), H.to_lpu_args())
+        self.assertEqual(G.to_lpu_args()[0]['LeakyIAF']['id'], ['a', 'b'])
+        self.assertEqual(G.node['b']['threshold'], -20.)
+
+if __name__ == '__main__':
+    main()
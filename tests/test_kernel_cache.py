@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import main, TestCase
+
+import numpy as np
+
+from benchmarks.device_stub import install
+install()
+
+import pycuda.gpuarray as garray
+
+from neurokernel.LPU.utils import kernel_cache
+from neurokernel.LPU.utils.kernel_cache import KernelCache
+from neurokernel.LPU.NDComponents.AxonHillockModels.LeakyIAF import LeakyIAF
+from neurokernel.LPU.NDComponents.SynapseModels.AlphaSynapse import \
+    AlphaSynapse
+
+class Function(object):
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+        self.prepared = None
+
+    def prepare(self, *args, **kwargs):
+        self.prepared = (args, kwargs)
+
+    def prepared_call(self, *args):
+        return (self.module.binary, self.name, args)
+
+class Module(object):
+    def __init__(self, binary):
+        self.binary = binary
+
+    def get_function(self, name):
+        return Function(self, name)
+
+class Compiler(object):
+    """
+    Compiler that records its calls; it can be made to wait for an event
+    or to fail.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.release = None
+        self.error = None
+
+    def __call__(self, source, options, arch):
+        with self.lock:
+            self.calls.append((source, options, arch))
+        if self.release is not None:
+            self.release.wait(10)
+        if self.error is not None:
+            raise self.error
+        return ('%s|%s|%s' % (arch, ','.join(options), source)).encode('utf-8')
+
+class test_kernel_cache(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.compiler = Compiler()
+        self.loaded = []
+        self.ctx = 'ctx0'
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def cache(self, cache_dir=True, version='1.0', arch='sm_35'):
+        def loader(binary):
+            self.loaded.append(binary)
+            return Module(binary)
+        if cache_dir is True:
+            cache_dir = self.dir
+        return KernelCache(cache_dir or None,
+                           compiler=self.compiler, loader=loader,
+                           arch=lambda: arch, context=lambda: self.ctx,
+                           version=lambda: version)
+
+    def files(self):
+        return sorted(os.path.relpath(os.path.join(d, f), self.dir)
+                      for d, _, files in os.walk(self.dir) for f in files)
+
+    def test_key(self):
+        c = self.cache()
+        k = c.key('src', ('-O3',), 'sm_35')
+        self.assertEqual(k, self.cache().key('src', ('-O3',), 'sm_35'))
+        self.assertEqual(len(k), 40)
+        # Every part of the key matters:
+        others = set([c.key('src2', ('-O3',), 'sm_35'),
+                      c.key('src', ('-O2',), 'sm_35'),
+                      c.key('src', (), 'sm_35'),
+                      c.key('src', ('-O3',), 'sm_60'),
+                      self.cache(version='2.0').key('src', ('-O3',), 'sm_35')])
+        self.assertEqual(len(others), 5)
+        self.assertNotIn(k, others)
+        # Options are not concatenated ambiguously:
+        self.assertNotEqual(c.key('src', ('-a', '-b'), 'sm_35'),
+                            c.key('src', ('-a-b',), 'sm_35'))
+
+    def test_stats(self):
+        c = self.cache()
+        b = c.get_binary('src', ('-O3',))
+        self.assertEqual(b, b'sm_35|-O3|src')
+        self.assertEqual(c.get_binary('src', ('-O3',)), b)
+        self.assertEqual(c.stats, {'memory': 1, 'disk': 0, 'compiled': 1})
+
+        # Another instance (e.g., in another process) reads the disk cache:
+        d = self.cache()
+        self.assertEqual(d.get_binary('src', ('-O3',)), b)
+        self.assertEqual(d.stats, {'memory': 0, 'disk': 1, 'compiled': 0})
+        self.assertEqual(len(self.compiler.calls), 1)
+
+        # Different architectures are compiled separately:
+        d.get_binary('src', ('-O3',), arch='sm_60')
+        self.assertEqual(d.stats, {'memory': 0, 'disk': 1, 'compiled': 1})
+
+    def test_memory_only(self):
+        c = self.cache(cache_dir=False)
+        c.get_binary('src')
+        c.get_binary('src')
+        self.assertEqual(c.stats, {'memory': 1, 'disk': 0, 'compiled': 1})
+        self.cache(cache_dir=False).get_binary('src')
+        self.assertEqual(len(self.compiler.calls), 2)
+        self.assertEqual(self.files(), [])
+
+    def test_atomic_write(self):
+        c = self.cache()
+        key = c.key('src', (), 'sm_35')
+        c.get_binary('src')
+        # Only the module is left, under the first two characters of its key:
+        self.assertEqual(self.files(),
+                         [os.path.join(key[:2], key + '.cubin')])
+        with open(os.path.join(self.dir, key[:2], key + '.cubin'), 'rb') as f:
+            self.assertEqual(f.read(), b'sm_35||src')
+
+        # A failed rename leaves no temporary file behind:
+        rename = os.rename
+        def fail(src, dst):
+            raise OSError('rename failed')
+        os.rename = fail
+        try:
+            self.cache().get_binary('src2')
+        finally:
+            os.rename = rename
+        self.assertEqual(len(self.files()), 1)
+
+    def test_unwritable(self):
+        # The cache directory can't be created under a file:
+        filename = os.path.join(self.dir, 'file')
+        open(filename, 'w').close()
+        c = self.cache(cache_dir=os.path.join(filename, 'cache'))
+        b = c.get_binary('src')
+        self.assertEqual(c.get_binary('src'), b)
+        self.assertEqual(c.stats, {'memory': 1, 'disk': 0, 'compiled': 1})
+        self.assertEqual(self.files(), ['file'])
+
+    def test_generic_kernels(self):
+        # The kernels that are the same for all models are compiled once,
+        # whatever the parameters of the models that use them:
+        class Buffer(object):
+            def __init__(self, dtype):
+                self.dtype = np.dtype(dtype)
+        def component(cls, broadcast):
+            params = {k: garray.to_gpu(np.full(1 if k in broadcast else 4, v))
+                      for k, v in cls.params.items()}
+            params['npre'] = {k: garray.to_gpu(np.ones(4, np.int32))
+                              for k in cls.accesses}
+            buffers = {k: Buffer(np.int32 if k == 'spike_state' else
+                                 np.double) for k in cls.accesses}
+            return cls(params, buffers, 1e-4)
+
+        comps = [component(LeakyIAF, []), component(LeakyIAF, ['threshold']),
+                 component(AlphaSynapse, []),
+                 component(AlphaSynapse, ['ar', 'ad'])]
+        self.assertEqual(len(set(tuple(c.compile_options) for c in comps)), 4)
+        default = kernel_cache._default_cache
+        kernel_cache._default_cache = self.cache(cache_dir=False)
+        try:
+            for c in comps:
+                c._NDComponent__get_sum_kernel(4, np.double)
+            for c in comps[2:]:
+                c.get_retrieve_buffer_func('spike_state', np.int32)
+        finally:
+            kernel_cache._default_cache = default
+        self.assertEqual(len(self.compiler.calls), 2)
+        self.assertEqual([options for _, options, _ in self.compiler.calls],
+                         [(), ()])
+
+    def test_module_per_context(self):
+        c = self.cache()
+        m = c.source_module('src', ['-O3'])
+        self.assertEqual(m.binary, b'sm_35|-O3|extern "C" {\nsrc\n}\n')
+        self.assertIs(c.source_module('src', ['-O3']), m)
+        self.assertEqual(len(self.loaded), 1)
+
+        # Modules are loaded again in other contexts, but not recompiled:
+        self.ctx = 'ctx1'
+        n = c.source_module('src', ['-O3'])
+        self.assertIsNot(n, m)
+        self.assertEqual(len(self.loaded), 2)
+        self.assertEqual(len(self.compiler.calls), 1)
+        self.assertEqual(c.stats, {'memory': 2, 'disk': 0, 'compiled': 1})
+
+        m2 = c.source_module('src', ['-O3'], no_extern_c=True)
+        self.assertEqual(m2.binary, b'sm_35|-O3|src')
+
+    def test_deferred(self):
+        c = self.cache()
+        self.compiler.release = threading.Event()
+        with c.deferred():
+            m = c.source_module('src')
+            f = m.get_function('update')
+            # The function can be prepared before the module is compiled:
+            self.assertIs(f.prepare('PPi', shared=0), f)
+            f.block = (256, 1, 1)
+            self.assertEqual(self.loaded, [])
+            self.compiler.release.set()
+        self.assertEqual(len(self.loaded), 1)
+        # The function is retrieved and prepared when it is first used:
+        self.assertEqual(f.prepared_call(1, 2)[1:], ('update', (1, 2)))
+        self.assertEqual(f._func.prepared, (('PPi',), {'shared': 0}))
+        self.assertEqual(f.block, (256, 1, 1))
+
+        # Functions prepared after they were first used are prepared
+        # directly:
+        g = m.get_function('step')
+        g.prepared_call()
+        self.assertIsNone(g._func.prepared)
+        g.prepare('P')
+        self.assertEqual(g._func.prepared, (('P',), {}))
+
+    def test_deferred_dedup(self):
+        c = self.cache()
+        self.compiler.release = threading.Event()
+        with c.deferred():
+            modules = [c.source_module('src') for _ in range(4)]
+            other = c.source_module('other')
+            self.compiler.release.set()
+        self.assertEqual(len(self.compiler.calls), 2)
+        self.assertEqual(len(set(m._resolve() for m in modules)), 1)
+        self.assertIsNot(other._resolve(), modules[0]._resolve())
+        self.assertEqual(len(self.loaded), 2)
+
+        # Loaded modules are returned directly afterwards:
+        self.assertIs(c.source_module('src'), modules[0]._resolve())
+
+    def test_deferred_error(self):
+        c = self.cache()
+        self.compiler.error = RuntimeError('compilation failed')
+        with self.assertRaises(RuntimeError):
+            with c.deferred():
+                c.source_module('src').get_function('update').prepare('P')
+        # The cache can be used again:
+        self.compiler.error = None
+        self.assertIsNone(c._pool)
+        with c.deferred():
+            m = c.source_module('src')
+        self.assertEqual(m._resolve().binary,
+                         b'sm_35||extern "C" {\nsrc\n}\n')
+        self.assertEqual(self.files()[0][-6:], '.cubin')
+
+if __name__ == '__main__':
+    main()
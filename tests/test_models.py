@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+
+"""
+Comparison of the NumPy code generated from the equations of the models to
+transcriptions of the hand-written kernels they replaced.
+"""
+
+from collections import OrderedDict
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.LPU.NDComponents.AxonHillockModels.LeakyIAF import LeakyIAF
+from neurokernel.LPU.NDComponents.AxonHillockModels.HodgkinHuxley import \
+    HodgkinHuxley
+from neurokernel.LPU.NDComponents.AxonHillockModels.Wilson import Wilson
+from neurokernel.LPU.NDComponents.AxonHillockModels.Rinzel import Rinzel
+from neurokernel.LPU.NDComponents.AxonHillockModels.ConnorStevens import \
+    ConnorStevens
+from neurokernel.LPU.NDComponents.MembraneModels.MorrisLecar import \
+    MorrisLecar
+from neurokernel.LPU.NDComponents.SynapseModels.PowerGpotGpot import \
+    PowerGPotGPot
+
+# Kernels of the models before they were generated from their equations,
+# in NumPy; they take the time step in ms and the number of substeps and
+# return the new states and the updated variables:
+
+def leaky_iaf(dt, nsteps, I, p, s):
+    # nsteps was ignored
+    bh = np.exp(-dt/(p['capacitance']*p['resistance']))
+    V = s['V']*bh + (p['resistance']*I+p['resting_potential'])*(1.0-bh)
+    spike = V >= p['threshold']
+    V = np.where(spike, p['reset_potential'], V)
+    return {'V': V}, {'spike_state': spike.astype(np.int32), 'V': V}
+
+def morris_lecar(dt, nsteps, I, p, s):
+    V, n = s['V'], s['n']
+    for _ in range(nsteps):
+        n_inf = 0.5*(1+np.tanh((V-p['V3'])/p['V4']))
+        dn = p['phi']*np.cosh((V-p['V3'])/(p['V4']*2))*(n_inf-n)
+        m_inf = 0.5*(1+np.tanh((V-p['V1'])/p['V2']))
+        dV = (I - p['g_L']*(V-p['V_L']) - p['g_K']*n*(V-p['V_K'])
+              - p['g_Ca']*m_inf*(V-p['V_Ca']) + p['offset'])
+        V = V + dV*dt
+        n = n + dn*dt
+    return {'V': V, 'n': n}, {'V': V}
+
+def power_gpot_gpot(dt, nsteps, V, p, s):
+    g = np.fmin(p['saturation'],
+                p['slope']*np.power(np.fmax(0.0, V-p['threshold']),
+                                    p['power']))
+    return {}, {'g': g}
+
+def _spikes(V, Vprev1, Vprev2, threshold):
+    return (Vprev2 <= Vprev1) & (Vprev1 >= V) & (Vprev1 > threshold)
+
+def hodgkin_huxley(dt, nsteps, I, p, s):
+    n, m, h, V = s['n'], s['m'], s['h'], s['V']
+    Vprev1, Vprev2 = s['Vprev1'], s['Vprev2']
+    spike = np.zeros(V.shape, np.int32)
+    for _ in range(nsteps):
+        a = np.exp(-(V+55)/10)-1
+        dn = np.where(np.abs(a) <= 1e-7,
+                      (1.-n)*0.1 - n*(0.125*np.exp(-(V+65.)/80.)),
+                      (1.-n)*(-0.01*(V+55.)/a) - n*(0.125*np.exp(-(V+65)/80)))
+        a = np.exp(-(V+40.)/10.)-1.
+        dm = np.where(np.abs(a) <= 1e-7,
+                      (1.-m) - m*(4*np.exp(-(V+65)/18)),
+                      (1.-m)*(-0.1*(V+40.)/a) - m*(4.*np.exp(-(V+65.)/18.)))
+        dh = (1.-h)*(0.07*np.exp(-(V+65.)/20.)) - h/(np.exp(-(V+35.)/10.)+1.)
+        dV = I - 120.*np.power(m, 3)*h*(V-50.) - \
+             36.*np.power(n, 4)*(V+77.) - 0.3*(V+54.387)
+        n = n + dt*dn
+        m = m + dt*dm
+        h = h + dt*dh
+        V = V + dt*dV
+        spike += _spikes(V, Vprev1, Vprev2, -30)
+        Vprev2 = Vprev1
+        Vprev1 = V
+    return {'n': n, 'm': m, 'h': h, 'V': V, 'Vprev1': Vprev1,
+            'Vprev2': Vprev2}, {'spike_state': (spike > 0).astype(np.int32),
+                                'V': V}
+
+def wilson(dt, nsteps, I, p, s):
+    R, V = s['R'], s['V']
+    Vprev1, Vprev2 = s['Vprev1'], s['Vprev2']
+    spike = np.zeros(V.shape, np.int32)
+    for _ in range(nsteps):
+        R_infty = 0.0135*V+1.03
+        dR = R_infty/1.9 - R/1.9
+        dV = 1./0.8*(I - 1.0*(17.81+0.4771*V+0.003263*V*V)*(V-55.) -
+                     26.*R*(V+92.))
+        V = V + dt*dV
+        R = R + dt*dR
+        spike += _spikes(V, Vprev1, Vprev2, 20.)
+        Vprev2 = Vprev1
+        Vprev1 = V
+    return {'R': R, 'V': V, 'Vprev1': Vprev1, 'Vprev2': Vprev2}, \
+           {'spike_state': (spike > 0).astype(np.int32), 'V': V}
+
+def rinzel(dt, nsteps, I, p, s):
+    w, V = s['W'], s['V']
+    Vprev1, Vprev2 = s['Vprev1'], s['Vprev2']
+    spike = np.zeros(V.shape, np.int32)
+    h0 = 0.07/(0.07+1/(np.exp(3.)+1.))
+    n0 = 0.1/(np.exp(1.)-1.)/(0.1/(np.exp(1.)-1.) + 0.125)
+    s = (1.-h0)/n0
+    for _ in range(nsteps):
+        alpha_n = -0.01*(V+55)/(np.exp(-(V+55)/10)-1)
+        alpha_m = -0.1*(V+40)/(np.exp(-(V+40)/10)-1)
+        alpha_h = 0.07*np.exp(-(V+65)/20)
+        beta_n = 0.125*np.exp(-(V+65)/80)
+        beta_m = 4*np.exp(-(V+65)/18)
+        beta_h = 1/(np.exp(-(V+35)/10)+1)
+        n_infty = alpha_n/(alpha_n + beta_n)
+        m_infty = alpha_m/(alpha_m + beta_m)
+        h_infty = alpha_h/(alpha_h + beta_h)
+        w_infty = s/(1+s*s)*(n_infty + s*(1-h_infty))
+        tau_w = 1 + 5*np.exp(-(V+55)*(V+55)/55*55)
+        dw = 3*w_infty/tau_w - 3/tau_w*w
+        dV = I - 120.*np.power(m_infty, 3)*(1-w)*(V-50.) - \
+             36.*np.power(w/s, 4)*(V+77.) - 0.3*(V+54.387)
+        V = V + dt*dV
+        w = w + dt*dw
+        spike += _spikes(V, Vprev1, Vprev2, -10)
+        Vprev2 = Vprev1
+        Vprev1 = V
+    return {'W': w, 'V': V, 'Vprev1': Vprev1, 'Vprev2': Vprev2}, \
+           {'spike_state': (spike > 0).astype(np.int32), 'V': V}
+
+def connor_stevens(dt, nsteps, I, p, s):
+    n, m, h, a, b, V = [s[k] for k in ['n', 'm', 'h', 'a', 'b', 'V']]
+    Vprev1, Vprev2 = s['Vprev1'], s['Vprev2']
+    E_K, E_Na, E_a, E_l = -72., 55., -75., -17.
+    G_total, G_a, G_Na, G_l = 67.7, 47.7, 120., 0.3
+    G_K = G_total-G_a
+    ms, hs, ns = -5.3, -12., -4.3
+    spike = np.zeros(V.shape, np.int32)
+    for _ in range(nsteps):
+        a_m = -.1*(V+35+ms)/(np.exp(-(V+35+ms)/10)-1)
+        b_m = 4*np.exp(-(V+60+ms)/18)
+        m_inf = a_m/(a_m+b_m)
+        tau_m = 1/(3.8*(a_m+b_m))
+        a_h = .07*np.exp(-(V+60+hs)/20)
+        b_h = 1/(1+np.exp(-(V+30+hs)/10))
+        h_inf = a_h/(a_h+b_h)
+        tau_h = 1/(3.8*(a_h+b_h))
+        a_n = -.01*(V+50+ns)/(np.exp(-(V+50+ns)/10)-1)
+        b_n = .125*np.exp(-(V+60+ns)/80)
+        n_inf = a_n/(a_n+b_n)
+        tau_n = 2/(3.8*(a_n+b_n))
+        a_inf = np.power(.0761*np.exp((V+94.22)/31.84) /
+                         (1+np.exp((V+1.17)/28.93)), .3333)
+        tau_a = .3632+1.158/(1+np.exp((V+55.96)/20.12))
+        b_inf = np.power(1/(1+np.exp((V+53.3)/14.54)), 4)
+        tau_b = 1.24+2.678/(1+np.exp((V+50)/16.027))
+        V = V + dt*(I-G_l*(V-E_l)-G_Na*h*m*m*m*(V-E_Na) -
+                    G_K*n*n*n*n*(V-E_K)-G_a*b*a*a*a*(V-E_a))
+        m = m + dt*(m_inf-m)/tau_m
+        h = h + dt*(h_inf-h)/tau_h
+        n = n + dt*(n_inf-n)/tau_n
+        a = a + dt*(a_inf-a)/tau_a
+        b = b + dt*(b_inf-b)/tau_b
+        spike += _spikes(V, Vprev1, Vprev2, -30)
+        Vprev2 = Vprev1
+        Vprev1 = V
+    return {'n': n, 'm': m, 'h': h, 'a': a, 'b': b, 'V': V,
+            'Vprev1': Vprev1, 'Vprev2': Vprev2}, \
+           {'spike_state': (spike > 0).astype(np.int32), 'V': V}
+
+N = 50
+STEPS = 300
+
+def random_params(model, rng, spread=0.1):
+    """
+    Default parameters of the model, perturbed for each component.
+    """
+
+    return OrderedDict([(k, v*rng.uniform(1-spread, 1+spread, N))
+                        for k, v in model.params.items()])
+
+def initial_states(model, rng):
+    states = OrderedDict()
+    for k, v in model.states.items():
+        if k in ['substeps', 'substeps_taken']:
+            states[k] = np.full(N, v, np.int32)
+        elif isinstance(v, str):
+            states[k] = states[v].copy()
+        else:
+            states[k] = np.full(N, float(v))
+    return states
+
+class test_models(TestCase):
+    def compare(self, model, reference, inputs, params, states, dt, nsteps,
+                rtol=1e-10):
+        """
+        Run the generated code and the reference for all inputs and check
+        that their states and updates agree.
+        """
+
+        code = model.get_model_code()
+        var = model.accesses[0]
+        ref_states = dict(states)
+        gen_states = dict(states)
+        counts = {}
+        for t, x in enumerate(inputs):
+            ref_states, ref_updates = reference(dt, nsteps, x, params,
+                                                ref_states)
+            gen_states, gen_updates = code.run_numpy(
+                dt, nsteps, {var: x}, params, gen_states)
+            gen_states = dict(states, **gen_states)
+            self.assertEqual(sorted(gen_updates), sorted(ref_updates))
+            for k, v in ref_states.items():
+                np.testing.assert_allclose(gen_states[k], v, rtol=rtol,
+                                           atol=1e-12, err_msg='%s at step %d'
+                                           % (k, t))
+            for k, v in ref_updates.items():
+                if k == 'spike_state':
+                    self.assertEqual(gen_updates[k].dtype, np.int32)
+                    np.testing.assert_array_equal(gen_updates[k], v,
+                                                  err_msg='step %d' % t)
+                    counts[k] = counts.get(k, 0)+v.sum()
+                else:
+                    np.testing.assert_allclose(gen_updates[k], v, rtol=rtol,
+                                               atol=1e-12)
+        return counts
+
+    def test_leaky_iaf(self):
+        rng = np.random.RandomState(0)
+        params = random_params(LeakyIAF, rng)
+        params['capacitance'] = rng.uniform(0.005, 0.02, N)
+        counts = self.compare(LeakyIAF, leaky_iaf,
+                              rng.uniform(0., 0.1, (STEPS, N)), params,
+                              initial_states(LeakyIAF, rng), 0.1, 1)
+        self.assertGreater(counts['spike_state'], N)
+
+    def test_leaky_iaf_substeps(self):
+        # The kernel that was replaced ignored nsteps; all substeps are now
+        # taken, and a spike in any of them is reported:
+        rng = np.random.RandomState(1)
+        params = random_params(LeakyIAF, rng)
+        params['capacitance'] = rng.uniform(0.005, 0.02, N)
+        code = LeakyIAF.get_model_code()
+        states = initial_states(LeakyIAF, rng)
+        ref_states = states
+        spikes = 0
+        for I in rng.uniform(0., 0.1, (STEPS, N)):
+            states, updates = code.run_numpy(0.025, 4, {'I': I}, params,
+                                             states)
+            spike = np.zeros(N, np.int32)
+            for _ in range(4):
+                ref_states, ref_updates = leaky_iaf(0.025, 1, I, params,
+                                                    ref_states)
+                spike |= ref_updates['spike_state']
+            np.testing.assert_allclose(states['V'], ref_states['V'],
+                                       rtol=1e-10)
+            np.testing.assert_array_equal(updates['spike_state'], spike)
+            spikes += spike.sum()
+        self.assertGreater(spikes, N)
+
+        # A single step of the old kernel only advanced by one substep:
+        states = initial_states(LeakyIAF, rng)
+        new, _ = code.run_numpy(0.025, 4, {'I': np.full(N, 0.01)}, params,
+                                states)
+        old, _ = leaky_iaf(0.025, 4, np.full(N, 0.01), params, states)
+        self.assertFalse(np.allclose(new['V'], old['V']))
+
+    def test_morris_lecar(self):
+        rng = np.random.RandomState(2)
+        states = initial_states(MorrisLecar, rng)
+        states['V'] = rng.uniform(-70., 10., N)
+        self.compare(MorrisLecar, morris_lecar,
+                     rng.uniform(0., 20., (STEPS, N)),
+                     random_params(MorrisLecar, rng), states, 0.01, 10)
+
+    def test_power_gpot_gpot(self):
+        rng = np.random.RandomState(3)
+        self.compare(PowerGPotGPot, power_gpot_gpot,
+                     rng.uniform(-80., 0., (STEPS, N)),
+                     random_params(PowerGPotGPot, rng), {}, 0.1, 1)
+
+    def test_hodgkin_huxley(self):
+        rng = np.random.RandomState(4)
+        counts = self.compare(HodgkinHuxley, hodgkin_huxley,
+                              rng.uniform(0., 30., (STEPS, N)), {},
+                              initial_states(HodgkinHuxley, rng), 0.01, 10)
+        self.assertGreater(counts['spike_state'], N)
+
+    def test_wilson(self):
+        rng = np.random.RandomState(5)
+        counts = self.compare(Wilson, wilson,
+                              rng.uniform(0., 30., (STEPS, N)), {},
+                              initial_states(Wilson, rng), 0.01, 10)
+        self.assertGreater(counts['spike_state'], N)
+
+    def test_rinzel(self):
+        rng = np.random.RandomState(6)
+        counts = self.compare(Rinzel, rinzel,
+                              rng.uniform(0., 30., (STEPS, N)), {},
+                              initial_states(Rinzel, rng), 0.01, 10)
+        self.assertGreater(counts['spike_state'], 0)
+
+    def test_connor_stevens(self):
+        rng = np.random.RandomState(10)
+        counts = self.compare(ConnorStevens, connor_stevens,
+                              rng.uniform(0., 30., (STEPS, N)), {},
+                              initial_states(ConnorStevens, rng), 0.01, 10)
+        self.assertGreater(counts['spike_state'], N)
+
+    def test_evaluate_derived(self):
+        code = LeakyIAF.get_model_code()
+        self.assertEqual(list(code.derived), ['bh'])
+        rng = np.random.RandomState(7)
+        params = random_params(LeakyIAF, rng)
+        derived = code.evaluate_derived(0.1, params)
+        np.testing.assert_allclose(
+            derived['bh'],
+            np.exp(-0.1/(params['capacitance']*params['resistance'])),
+            rtol=1e-15)
+
+        # Single values for parameters given as single values:
+        derived = code.evaluate_derived(0.1, {'capacitance': [0.065],
+                                              'resistance': [1000.]},
+                                        np.float32)
+        self.assertEqual(derived['bh'].shape, (1,))
+        self.assertEqual(derived['bh'].dtype, np.float32)
+        np.testing.assert_allclose(derived['bh'], np.exp(-0.1/65.),
+                                   rtol=1e-6)
+
+        # Derived parameters passed to run_numpy are used as they are:
+        states = {'V': np.full(N, -60.)}
+        I = {'I': np.zeros(N)}
+        params = OrderedDict((k, np.full(N, v))
+                             for k, v in LeakyIAF.params.items())
+        params['threshold'] = np.full(N, 100.)
+        params['bh'] = np.zeros(N)
+        new, _ = code.run_numpy(0.1, 1, I, params, states)
+        np.testing.assert_array_equal(new['V'], params['resting_potential'])
+
+    def test_tables(self):
+        for model in [HodgkinHuxley, Rinzel, ConnorStevens]:
+            variant = model.with_tables(0.05)
+            self.assertIs(model.with_tables(0.05), variant)
+            self.assertEqual(variant.__name__, model.__name__)
+            code = variant.get_model_code()
+            self.assertTrue(code.tables)
+            values, errors = code.build_tables()
+            self.assertEqual(values.size, code.table_size)
+            for k, v in errors.items():
+                self.assertLess(v, variant.table_tolerance, k)
+
+            # One substep from states over the range of the tables and
+            # beyond, where the rate functions are computed:
+            rng = np.random.RandomState(8)
+            states = initial_states(model, rng)
+            for V in [rng.uniform(-90., 60., N), np.linspace(101, 150, N)]:
+                states['V'] = V
+                I = {'I': rng.uniform(0., 30., N)}
+                exact, _ = model.get_model_code().run_numpy(0.01, 1, I, {},
+                                                            states)
+                approx, _ = code.run_numpy(0.01, 1, I, {}, states)
+                for k in exact:
+                    change = exact[k]-states[k]
+                    scale = np.abs(change).max()
+                    np.testing.assert_allclose(
+                        approx[k]-states[k], change,
+                        atol=1e-3*scale if V[0] < 100 else 1e-12*scale,
+                        err_msg='%s of %s' % (k, model.__name__))
+
+    def test_adaptive_steps(self):
+        rng = np.random.RandomState(9)
+        for model, reference in [(HodgkinHuxley, hodgkin_huxley),
+                                 (Wilson, wilson), (Rinzel, rinzel),
+                                 (MorrisLecar, morris_lecar)]:
+            params = random_params(model, rng)
+            for scale, n in [(1e9, 1), (1e-9, 10)]:
+                variant = model.with_adaptive_steps(scale)
+                self.assertEqual(variant.max_dt, model.max_dt)
+                code = variant.get_model_code()
+                states = initial_states(variant, rng)
+                ref_states = dict((k, v) for k, v in states.items()
+                                  if k not in ['substeps', 'substeps_taken'])
+                for I in rng.uniform(0., 30., (20, N)):
+                    # Duration of the step and maximum number of substeps:
+                    states, updates = code.run_numpy(
+                        0.01, 10, {'I': I}, params, states)
+                    ref_states, ref_updates = reference(
+                        np.true_divide(0.01, n), n, I, params, ref_states)
+                    for k, v in ref_states.items():
+                        np.testing.assert_allclose(
+                            states[k], v, rtol=1e-10, atol=1e-12,
+                            err_msg='%s of %s' % (k, model.__name__))
+                    for k, v in ref_updates.items():
+                        np.testing.assert_allclose(updates[k], v,
+                                                   rtol=1e-10, atol=1e-12)
+                    # With the small tolerances, every step is first taken
+                    # with the number of substeps chosen at the last one:
+                    np.testing.assert_array_equal(states['substeps'], n)
+                    self.assertTrue(np.all(states['substeps_taken'] >= n))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+import collections
+from unittest import main, skipIf, TestCase
+
+import numpy as np
+
+from neurokernel.LPU.Graph import Graph
+from neurokernel.LPU.Partitioner import cut_size, partition, partition_graph
+
+try:
+    import neurokernel.pattern
+except ImportError:
+    has_pattern = False
+else:
+    has_pattern = True
+
+def planted_graph(n, k, degree, p, seed=0):
+    """
+    Random graph whose vertices belong to `k` clusters, with a fraction `p`
+    of the edges between vertices in different clusters.
+    """
+
+    rng = np.random.RandomState(seed)
+    labels = rng.randint(0, k, n)
+    members = [np.where(labels == i)[0] for i in range(k)]
+    adj = [collections.defaultdict(int) for _ in range(n)]
+    num_edges = n*degree//2
+    src = rng.randint(0, n, num_edges)
+    across = rng.rand(num_edges) < p
+    for u, x in zip(src, across):
+        c = rng.randint(0, k) if x else labels[u]
+        v = members[c][rng.randint(0, len(members[c]))]
+        if u != v:
+            adj[u][v] += 1
+            adj[v][u] += 1
+    return labels, adj
+
+def two_cluster_circuit(size=20, seed=0):
+    """
+    Two groups of neurons densely connected within each group and with
+    two synapses from the first group to the second.
+    """
+
+    rng = np.random.RandomState(seed)
+    G = Graph()
+    groups = [['n%d_%d' % (g, i) for i in range(size)] for g in range(2)]
+    for group in groups:
+        G.add_neurons(group, 'LeakyIAF')
+    pairs = []
+    for group in groups:
+        for i, pre in enumerate(group):
+            for j in rng.choice(size, 3, replace=False):
+                if j != i:
+                    pairs.append((pre, group[j]))
+    pairs.extend([(groups[0][0], groups[1][0]), (groups[0][1], groups[1][1])])
+    for k, (pre, post) in enumerate(pairs):
+        G.add_synapse('s%d' % k, pre, post, 'AlphaSynapse')
+    return G, groups
+
+class test_partition_graph(TestCase):
+    def test_planted_partition(self):
+        n, k = 2000, 4
+        labels, adj = planted_graph(n, k, 10, 0.05)
+        parts = partition_graph(np.ones(n), adj, k, imbalance=0.05)
+        self.assertEqual(set(parts), set(range(k)))
+        # The planted partition is (nearly) recovered:
+        self.assertLessEqual(cut_size(adj, parts), 1.05*cut_size(adj, labels))
+        part_w = np.bincount(parts, minlength=k)
+        self.assertLessEqual(part_w.max(), 1.05*n/k+1)
+
+    def test_weights(self):
+        labels, adj = planted_graph(400, 2, 8, 0.05)
+        weights = np.where(labels == 0, 3., 1.)
+        parts = partition_graph(weights, adj, 2, imbalance=0.05)
+        part_w = np.bincount(parts, weights, 2)
+        self.assertLessEqual(part_w.max(), 1.05*weights.sum()/2+3)
+
+class test_partition(TestCase):
+    def setUp(self):
+        self.G, self.groups = two_cluster_circuit()
+        self.comp_dict, self.conns = self.G.to_lpu_args()
+        self.p = partition(self.G, num_parts=2, lpu_ids=['a', 'b'])
+
+    def test_dicts_without_connections(self):
+        p = partition(self.comp_dict, num_parts=2)
+        self.assertEqual(p.cut, 0)
+        self.assertEqual(sum(len(p.lpus[i][0].get('LeakyIAF', {}).get('id', []))
+                             for i in p.lpu_ids), 2*len(self.groups[0]))
+
+    def test_components(self):
+        p = self.p
+        # Each group is in its own LPU, with the synapses of its neurons:
+        self.assertEqual(p.cut, 2)
+        for group in self.groups:
+            self.assertEqual(len(set(p.parts[uid] for uid in group)), 1)
+        self.assertNotEqual(p.parts[self.groups[0][0]],
+                            p.parts[self.groups[1][0]])
+        for pre, post, _ in self.conns:
+            if post.startswith('s'):
+                continue
+            self.assertEqual(p.parts[pre], p.parts[post])
+        uids = [uid for lpu_id in p.lpu_ids
+                for model, attrs in p.lpus[lpu_id][0].items()
+                if model != 'Port' for uid in attrs['id']]
+        self.assertEqual(sorted(uids), sorted(p.parts))
+        self.assertLessEqual(p.imbalance, 1.05)
+
+    def test_ports(self):
+        p = self.p
+        ports = {}
+        for lpu_id in p.lpu_ids:
+            comps, conns = p.lpus[lpu_id]
+            uids = set(uid for attrs in comps.values() for uid in attrs['id'])
+            for pre, post, _ in conns:
+                self.assertIn(pre, uids)
+                self.assertIn(post, uids)
+            attrs = comps.get('Port', {'id': []})
+            for i, uid in enumerate(attrs['id']):
+                ports[uid] = (lpu_id, attrs['selector'][i],
+                              attrs['port_io'][i], attrs['port_type'][i])
+
+        cut = [(pre, post) for pre, post, _ in self.conns
+               if p.parts[pre] != p.parts[post]]
+        self.assertEqual(len(cut), 2)
+        for pre, post in cut:
+            lpu_pre = p.lpu_ids[p.parts[pre]]
+            lpu_post = p.lpu_ids[p.parts[post]]
+            out_port = [c[1] for c in p.lpus[lpu_pre][1] if c[0] == pre and \
+                        c[1] in ports]
+            in_port = [c[0] for c in p.lpus[lpu_post][1] if c[1] == post and \
+                       c[0] in ports]
+            self.assertEqual(len(out_port), 1)
+            self.assertEqual(len(in_port), 1)
+            lpu, out_sel, io, port_type = ports[out_port[0]]
+            self.assertEqual((lpu, io, port_type), (lpu_pre, 'out', 'spike'))
+            lpu, in_sel, io, port_type = ports[in_port[0]]
+            self.assertEqual((lpu, io, port_type), (lpu_post, 'in', 'spike'))
+            self.assertIn((out_sel, in_sel, 'spike'),
+                          p.connections[(lpu_pre, lpu_post)])
+        self.assertEqual(sum(len(v) for v in p.connections.values()), 2)
+
+    @skipIf(not has_pattern, 'requires neurokernel.pattern')
+    def test_pattern(self):
+        p = self.p
+        pat = p.pattern('a', 'b')
+        for (id_0, id_1), conns in p.connections.items():
+            for out_sel, in_sel, port_type in conns:
+                if id_0 == 'a':
+                    self.assertEqual(pat[out_sel, in_sel], 1)
+                else:
+                    self.assertEqual(pat[in_sel, out_sel], 1)
+                self.assertEqual(pat.interface[out_sel, 'type'], port_type)
+                self.assertEqual(pat.interface[in_sel, 'type'], port_type)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import numpy as np
+
+from benchmarks.device_stub import install
+install(run_elementwise=True)
+
+from neurokernel.LPU.LPU import LPU
+from neurokernel.LPU.Graph import Graph
+from neurokernel.LPU.NDComponents.AxonHillockModels.HodgkinHuxley import \
+    HodgkinHuxley
+from neurokernel.LPU.NDComponents.AxonHillockModels.Wilson import Wilson
+
+from .test_checkpoint import HostStep
+
+class HostHodgkinHuxley(HostStep, HodgkinHuxley):
+    pass
+
+class HostWilson(HostStep, Wilson):
+    pass
+
+DT = 1e-5
+
+class test_relax(TestCase):
+    def run_lpu(self, model, I, relax_duration=1e-3):
+        G = Graph()
+        uids = ['neuron_%d' % i for i in range(len(I))]
+        G.add_neurons(uids, model)
+        comp_dict, conns = G.to_lpu_args()
+        lpu = LPU(DT, comp_dict, conns, id='test',
+                  relax_duration=relax_duration,
+                  relax_inputs={'I': dict(zip(uids, I))})
+        lpu.pre_run()
+        comp = lpu.components[model]
+        states = {k: v.get() for k, v in comp.states.items()}
+        buffers = {k: lpu.memory_manager.get_buffer(k).parr.get()
+                   for k in ['V', 'spike_state']}
+        return comp, states, buffers
+
+    def test_rest(self):
+        # Resting below the threshold of repetitive firing and spiking
+        # above it:
+        I = np.array([0., 2., 5., 20., 50.])
+        comp, states, buffers = self.run_lpu('HostHodgkinHuxley', I)
+        code = HodgkinHuxley.get_model_code()
+        rest = np.array([True, True, True, False, False])
+
+        # The derivatives vanish at the resting states:
+        new, _ = code.run_numpy(1e-3, 1, {'I': I}, {}, states)
+        for k in code.integrated:
+            np.testing.assert_allclose(new[k][rest], states[k][rest],
+                                       rtol=1e-12, atol=1e-12)
+            self.assertFalse(np.allclose(new[k][~rest], states[k][~rest],
+                                         rtol=1e-6, atol=1e-6))
+        np.testing.assert_array_equal(states['Vprev1'][rest],
+                                      states['V'][rest])
+        np.testing.assert_array_equal(states['Vprev2'][rest],
+                                      states['V'][rest])
+
+        # The other components were warmed up from the initial states:
+        init = {k: np.full(len(I), v) for k, v in
+                [('n', 0.), ('m', 0.), ('h', 1.), ('V', -65.),
+                 ('Vprev1', -65.), ('Vprev2', -65.)]}
+        for i in range(100):
+            init, _ = code.run_numpy(DT*1000, 1, {'I': I}, {}, init)
+        for k, v in init.items():
+            np.testing.assert_allclose(states[k][~rest], v[~rest],
+                                       rtol=1e-12)
+
+        # The buffers start from the relaxed values, without spikes:
+        for row in buffers['V']:
+            np.testing.assert_array_equal(row[:len(I)], states['V'])
+        self.assertEqual(buffers['spike_state'].sum(), 0)
+
+    def test_stability(self):
+        # The fixed points of the Wilson model above the threshold of
+        # repetitive firing are unstable:
+        I = np.array([0., 1., 10., 30.])
+        comp, states, buffers = self.run_lpu('HostWilson', I)
+        rest = comp.find_rest_states({'I': I})[2]
+        np.testing.assert_array_equal(rest, [True, True, False, False])
+
+        # Warming up for longer changes the spiking components only:
+        comp, longer, buffers = self.run_lpu('HostWilson', I, 2e-3)
+        np.testing.assert_array_equal(longer['V'][:2], states['V'][:2])
+        self.assertTrue(np.all(longer['V'][2:] != states['V'][2:]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import copy
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import h5py
+import numpy as np
+
+from benchmarks.device_stub import install, HostModule
+install(run_elementwise=True)
+
+from neurokernel.LPU.LPU import LPU
+from neurokernel.LPU.Graph import Graph
+from neurokernel.LPU.InputProcessors.FileInputProcessor import \
+    FileInputProcessor
+from neurokernel.LPU.OutputProcessors.FileOutputProcessor import \
+    FileOutputProcessor
+from neurokernel.LPU.NDComponents.SynapseModels.AlphaSynapse import \
+    AlphaSynapse
+
+from .test_checkpoint import DT, HostLeakyIAF, HostAlphaSynapse
+
+def create_circuit():
+    G = Graph()
+    neurons = ['neuron_%d' % i for i in range(4)]
+    G.add_neurons(neurons, 'HostLeakyIAF', threshold=-50., resistance=1.,
+                  capacitance=0.01, resting_potential=-60.,
+                  reset_potential=-65., V=[-60., -55., -52., -65.])
+    # Synapses 0-2 share a state; the others differ from them in their
+    # delay (3), their rates (4), their input (5) or their initial state
+    # (6). Synapse 7 has the same delay and rates as synapse 3 but a
+    # different reversal potential, which does not affect the states:
+    G.add_synapses(['synapse_%d' % i for i in range(8)],
+                   ['neuron_0']*5+['neuron_1', 'neuron_0', 'neuron_0'],
+                   ['neuron_1', 'neuron_2', 'neuron_3', 'neuron_1',
+                    'neuron_2', 'neuron_2', 'neuron_3', 'neuron_3'],
+                   'HostAlphaSynapse',
+                   ar=[110.]*4+[50.]+[110.]*3, ad=190.,
+                   gmax=[1., 2., 3., 1., 1., 1., 1., 0.5],
+                   reverse=[0.]*7+[-80.],
+                   a1=[0.]*6+[1e3, 0.],
+                   delay=[1e-3]*3+[2e-3, 1e-3, 1e-3, 1e-3, 2e-3])
+    return G.to_lpu_args(), neurons
+
+class test_share_states(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        (self.comp_dict, self.conns), self.neurons = create_circuit()
+        self.input_file = os.path.join(self.dir, 'input.h5')
+        with h5py.File(self.input_file, 'w') as f:
+            f.create_dataset('I/uids', data=np.array(self.neurons, 'S'))
+            f.create_dataset('I/data', data=np.random.RandomState(0).uniform(
+                10., 30., (200, len(self.neurons))))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_lpu(self, share_states, steps=200):
+        comp_dict, conns = copy.deepcopy((self.comp_dict, self.conns))
+        output = os.path.join(self.dir, 'shared.h5' if share_states else
+                              'output.h5')
+        lpu = LPU(DT, comp_dict, conns, id='test',
+                  input_processors=[FileInputProcessor(self.input_file)],
+                  output_processors=[FileOutputProcessor(
+                      [('g', None), ('spike_state', None)], output)],
+                  share_states=share_states)
+        lpu.pre_run()
+        comp = lpu.components['HostAlphaSynapse']
+        num_states = comp.states['a0'].size
+        for _ in range(steps):
+            lpu.run_step()
+        lpu.post_run()
+        with h5py.File(output, 'r') as f:
+            uids = [u.decode() if isinstance(u, bytes) else u
+                    for u in f['g/uids'][()]]
+            order = np.argsort(uids)
+            return (np.asarray(uids)[order], f['g/data'][()][:, order],
+                    f['spike_state/data'][()], num_states)
+
+    def test_same_conductances(self):
+        uids, g, spikes, num_states = self.run_lpu(False)
+        shared_uids, shared_g, _, shared_num_states = self.run_lpu(True)
+        self.assertEqual(num_states, 8)
+        # Synapses 0-2 and 3 and 7 share their states:
+        self.assertEqual(shared_num_states, 5)
+
+        # The conductances are the same for every synapse, and change in
+        # response to the spikes:
+        self.assertGreater(spikes.sum(), 0)
+        self.assertTrue(np.all(np.abs(g).max(0) > 0))
+        np.testing.assert_array_equal(shared_uids, uids)
+        np.testing.assert_allclose(shared_g, g, rtol=1e-12, atol=0)
+
+        # Synapses 0 and 3 only differ in their delay:
+        self.assertFalse(np.allclose(g[:, 0], g[:, 3]))
+
+class test_shared_kernels(TestCase):
+    """
+    The kernels of the shared states, compiled for and run on the host.
+    """
+
+    def run_kernels(self, integrator, steps=300):
+        rng = np.random.RandomState(2)
+        cls = AlphaSynapse.with_integrator(integrator)
+        # Synapses of the same class have the same input, delay and rates;
+        # the last one has no input:
+        state_class = np.array([0, 0, 0, 1, 1, 2, 3, 3, 3, 3, 4, 5],
+                               np.int32)
+        num, num_states, num_neurons, buffer_length = 12, 6, 5, 4
+        rep = np.array([list(state_class).index(c)
+                        for c in range(num_states)], np.int32)
+        pre = rng.randint(0, num_neurons, num_states)[state_class]
+        delay = np.array([0, 1, 3, 1, 2, 3], np.int32)[state_class]
+        ar = rng.uniform(50., 200., num_states)[state_class]
+        ad = rng.uniform(50., 200., num_states)[state_class]
+        ad[state_class == 2] = ar[state_class == 2]
+        gmax = rng.uniform(0., 1., num)
+        npre = np.ones(num, np.int32)
+        npre[-1] = 0
+        cumpre = np.concatenate([[0], np.cumsum(npre)[:-1]]).astype(np.int32)
+        Pre = pre[npre > 0].astype(np.int32)
+        derived = cls.get_derived_code().evaluate_derived(
+            DT, {'ar': ar, 'ad': ad})
+        c0, c1 = [np.ascontiguousarray(v) for v in derived.values()]
+
+        options = ['-DUSE_DOUBLE'] + \
+                  ['-D%s_STRIDE=1' % k for k in
+                   ['ar', 'ad', 'gmax']+list(derived)]
+        if integrator != 'euler':
+            options.append('-DEXACT_PROPAGATOR')
+        mod = HostModule(cls.cuda_src, options)
+        update = mod.get_function('alpha_synapse')
+        update_shared = mod.get_function('alpha_synapse_shared')
+        output = mod.get_function('alpha_synapse_output')
+
+        spike = np.zeros((buffer_length, num_neurons), np.int32)
+        a = [np.zeros(num) for _ in range(3)]
+        shared_a = [np.zeros(num_states) for _ in range(3)]
+        cond, shared_cond = np.zeros(num), np.zeros(num)
+        g = []
+        for i in range(steps):
+            current = i % buffer_length
+            spike[current] = rng.rand(num_neurons) < 0.05
+            update(num, DT, spike, num_neurons, current, buffer_length,
+                   ar, ad, c0, c1, gmax, a[0], a[1], a[2], cond, Pre, npre,
+                   cumpre, delay)
+            update_shared(num_states, DT, spike, num_neurons, current,
+                          buffer_length, ar, ad, c0, c1, shared_a[0],
+                          shared_a[1], shared_a[2], rep, Pre, npre, cumpre,
+                          delay)
+            output(num, state_class, gmax, shared_a[0], npre, shared_cond)
+            np.testing.assert_array_equal(shared_cond, cond)
+            g.append(cond.copy())
+        return np.array(g)
+
+    def test_euler(self):
+        g = self.run_kernels('euler')
+        self.assertTrue(np.all(g.max(0)[:-1] > 0))
+        self.assertEqual(np.abs(g[:, -1]).max(), 0)
+
+    def test_exact(self):
+        g = self.run_kernels('exact')
+        self.assertTrue(np.all(g.max(0)[:-1] > 0))
+
+if __name__ == '__main__':
+    main()
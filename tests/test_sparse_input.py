@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.LPU.utils.sparse_input import input_matrices, sum_input, \
+    aggregator_current
+from neurokernel.LPU.NDComponents.NDComponent import NDComponent
+from neurokernel.LPU.NDComponents.DendriteModels.Aggregator import Aggregator
+
+def sum_input_loop(delay, cumpre, npre, pre, pre_buffer, ld, current,
+                   buffer_length, num_comps):
+    # Transcription of the sum_input kernel of NDComponent:
+    res = np.zeros(num_comps)
+    for comp in range(num_comps):
+        for i in range(npre[comp]):
+            col = current-delay[cumpre[comp]+i]
+            if col < 0:
+                col = buffer_length+col
+            res[comp] += pre_buffer[col*ld+pre[cumpre[comp]+i]]
+    return res
+
+def aggregate_I_loop(g, ld, current, buffer_length, delay, V_rev, pre, npre,
+                     cumpre, V, V_ld, V_current, V_pre, num_comps):
+    # Transcription of the aggregate_I kernel of the Aggregator:
+    I = np.zeros(num_comps)
+    for comp in range(num_comps):
+        VV = V[V_pre[comp]+V_current*V_ld]
+        for i in range(npre[comp]):
+            col = current-delay[cumpre[comp]+i]
+            if col < 0:
+                col = buffer_length+col
+            j = cumpre[comp]+i
+            I[comp] -= g[pre[j]+col*ld]*(VV-V_rev[j])
+    return I
+
+class HostArray(object):
+    """
+    Host array with the interface of a GPUArray used by the host paths.
+    """
+
+    def __init__(self, a):
+        self.a = np.asarray(a)
+        self.size = self.a.size
+        self.dtype = self.a.dtype
+
+    def get(self):
+        return self.a
+
+class Buffer(object):
+    """
+    History of a variable with the interface of a CircularArray.
+    """
+
+    def __init__(self, history, current):
+        self.parr = HostArray(history)
+        self.buffer_length, self.size = history.shape
+        self.ld = self.size
+        self.current = current
+        self.dtype = history.dtype
+
+def connections(rng, num_comps, size, buffer_length):
+    # Random connections, with components without inputs, several
+    # connections from the same entry, with the same or different delays,
+    # and delays up to the length of the buffer:
+    npre = rng.randint(0, 6, num_comps)
+    npre[:2] = 0, 4
+    cumpre = np.concatenate([[0], np.cumsum(npre)])
+    pre = rng.randint(0, size, npre.sum())
+    delay = rng.randint(0, buffer_length, npre.sum())
+    pre[:2] = pre[2:4] = 3
+    delay[:4] = 0, 0, 1, buffer_length-1
+    return pre, npre, cumpre, delay
+
+class test_sparse_input(TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+        self.num_comps, self.size, self.buffer_length = 40, 25, 5
+        self.pre, self.npre, self.cumpre, self.delay = connections(
+            self.rng, self.num_comps, self.size, self.buffer_length)
+        self.history = self.rng.randn(self.buffer_length, self.size)
+
+    def test_duplicates(self):
+        matrices = input_matrices(self.pre, self.npre, self.delay, self.size)
+        self.assertEqual(sorted(matrices), sorted(set(self.delay)))
+        # The connections from entry 3 with the same delay are merged:
+        self.assertEqual(matrices[0][1, 3], 2)
+        self.assertEqual(matrices[1][1, 3], 1)
+        self.assertEqual(matrices[self.buffer_length-1][1, 3], 1)
+        self.assertEqual(matrices[0][0].nnz, 0)
+
+    def test_sum_input(self):
+        matrices = input_matrices(self.pre, self.npre, self.delay, self.size)
+        # Every current row, so that current-delay wraps around:
+        for current in range(self.buffer_length):
+            np.testing.assert_allclose(
+                sum_input(matrices, self.history, current),
+                sum_input_loop(self.delay, self.cumpre, self.npre, self.pre,
+                               self.history.ravel(), self.size, current,
+                               self.buffer_length, self.num_comps))
+
+    def test_no_connections(self):
+        matrices = input_matrices([], [0, 0], [], self.size)
+        np.testing.assert_array_equal(sum_input(matrices, self.history, 0),
+                                      np.zeros(2))
+
+    def test_aggregator_current(self):
+        V_rev = self.rng.uniform(-80., 0., len(self.pre))
+        V_history = self.rng.uniform(-70., -50., (3, self.size))
+        V_pre = self.rng.randint(0, self.size, self.num_comps)
+        g_matrices = input_matrices(self.pre, self.npre, self.delay,
+                                    self.size)
+        rev_matrices = input_matrices(self.pre, self.npre, self.delay,
+                                      self.size, V_rev)
+        for current in range(self.buffer_length):
+            np.testing.assert_allclose(
+                aggregator_current(g_matrices, rev_matrices, self.history,
+                                   current, V_history[2][V_pre]),
+                aggregate_I_loop(self.history.ravel(), self.size, current,
+                                 self.buffer_length, self.delay, V_rev,
+                                 self.pre, self.npre, self.cumpre,
+                                 V_history.ravel(), self.size, 2, V_pre,
+                                 self.num_comps))
+
+class test_components(TestCase):
+    """
+    Host summation of the inputs of components, from their connection data.
+    """
+
+    def setUp(self):
+        self.rng = np.random.RandomState(1)
+        self.num_comps, self.size, self.buffer_length = 30, 20, 4
+        self.pre, self.npre, self.cumpre, self.delay = connections(
+            self.rng, self.num_comps, self.size, self.buffer_length)
+        self.V_rev = self.rng.uniform(-80., 0., len(self.pre))
+
+    def component(self, cls, var, history, current, **conn_data):
+        comp = cls.__new__(cls)
+        conn_data['delay'] = self.delay
+        comp.params_dict = {
+            'pre': {var: HostArray(self.pre)},
+            'npre': {var: HostArray(self.npre)},
+            'cumpre': {var: HostArray(self.cumpre)},
+            'conn_data': {var: {k: HostArray(v)
+                                for k, v in conn_data.items()}}}
+        comp.access_buffers = {var: Buffer(history, current)}
+        return comp
+
+    def test_sum_in_variable_sparse(self):
+        history = self.rng.randn(self.buffer_length, self.size)
+        comp = self.component(NDComponent, 'I', history, 1)
+        expected = sum_input_loop(self.delay, self.cumpre, self.npre,
+                                  self.pre, history.ravel(), self.size, 1,
+                                  self.buffer_length, self.num_comps)
+        np.testing.assert_allclose(comp.sum_in_variable_sparse('I'),
+                                   expected)
+        # Other histories are summed with the same matrices:
+        other = self.rng.randn(self.buffer_length, self.size)
+        np.testing.assert_allclose(
+            comp.sum_in_variable_sparse('I', other, 3),
+            sum_input_loop(self.delay, self.cumpre, self.npre, self.pre,
+                           other.ravel(), self.size, 3, self.buffer_length,
+                           self.num_comps))
+
+    def test_compute_I_sparse(self):
+        g = np.abs(self.rng.randn(self.buffer_length, self.size))
+        V = self.rng.uniform(-70., -50., (2, self.size))
+        V_pre = self.rng.randint(0, self.size, self.num_comps)
+        comp = self.component(Aggregator, 'g', g, 0, reverse=self.V_rev)
+        comp.params_dict['pre']['V'] = HostArray(V_pre)
+        comp.access_buffers['V'] = Buffer(V, 1)
+        np.testing.assert_allclose(
+            comp.compute_I_sparse(),
+            aggregate_I_loop(g.ravel(), self.size, 0, self.buffer_length,
+                             self.delay, self.V_rev, self.pre, self.npre,
+                             self.cumpre, V.ravel(), self.size, 1, V_pre,
+                             self.num_comps))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import h5py
+import numpy as np
+
+from benchmarks.device_stub import install
+install(run_elementwise=True)
+
+from neurokernel.LPU.LPU import LPU
+from neurokernel.LPU.InputProcessors.FileInputProcessor import \
+    FileInputProcessor
+
+from .test_checkpoint import DT, create_circuit
+
+class test_timing(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_sections(self):
+        (comp_dict, conns), neurons = create_circuit()
+        input_file = os.path.join(self.dir, 'input.h5')
+        with h5py.File(input_file, 'w') as f:
+            f.create_dataset('I/uids', data=np.array(neurons, 'S'))
+            f.create_dataset('I/data', data=np.ones((10, len(neurons))))
+        lpu = LPU(DT, comp_dict, conns, id='test',
+                  input_processors=[FileInputProcessor(input_file)],
+                  timing='wall')
+        lpu.pre_run()
+        for _ in range(10):
+            lpu.run_step()
+        timings = lpu.get_timings()
+        lpu.post_run()
+
+        # The injection of the input of each model is timed separately,
+        # before the updates:
+        sections = list(timings)
+        self.assertNotIn('inject_input', sections)
+        self.assertIn('HostLeakyIAF', lpu.model_var_inj)
+        for model in lpu.model_var_inj:
+            name = '%s/inject_input' % model
+            self.assertLess(sections.index(name),
+                            sections.index('%s/update' % lpu.exec_order[0]))
+            self.assertEqual(timings[name]['count'], 10)
+        for model in lpu.exec_order:
+            self.assertEqual(timings['%s/update' % model]['count'], 10)
+
+if __name__ == '__main__':
+    main()
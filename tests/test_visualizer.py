@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import io
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import h5py
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from neurokernel.LPU.utils import visualizer as vis
+
+def create_output_file(filename, num_uids=8, steps=200, dt=1e-4, seed=0):
+    """
+    Write a random output file in the format of FileOutputProcessor.
+    """
+
+    rng = np.random.RandomState(seed)
+    uids = np.array(['neuron_%d' % i for i in range(num_uids)], dtype='S')
+    with h5py.File(filename, 'w') as f:
+        f.create_dataset('metadata', (), 'i')
+        f['metadata'].attrs['start_time'] = 0.
+        f['metadata'].attrs['sample_interval'] = 1
+        f['metadata'].attrs['dt'] = dt
+        f.create_dataset('V/uids', data=uids)
+        f.create_dataset('V/data', data=rng.uniform(-70., -20.,
+                                                    (steps, num_uids)))
+        f.create_dataset('spike_state/uids', data=uids)
+        f.create_dataset('spike_state/data',
+                         data=(rng.rand(steps, num_uids) < 0.1).astype(np.int32))
+    return uids
+
+class RecordingWriter(object):
+    """
+    Stand-in for the video writer of the serial mode that keeps the frames
+    it grabs as raw RGBA buffers.
+    """
+
+    def __init__(self, fps=None, codec=None):
+        self.frames = []
+
+    def setup(self, fig, outfile, dpi, frame_prefix=None):
+        self.fig = fig
+        self.dpi = dpi
+
+    def grab_frame(self):
+        buf = io.BytesIO()
+        self.fig.savefig(buf, format='raw', dpi=self.dpi)
+        self.frames.append(buf.getvalue())
+
+    def finish(self):
+        pass
+
+class test_parallel_rendering(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'output.h5')
+        self.uids = create_output_file(self.filename)
+        # Pretend that ffmpeg is available and record the frames that the
+        # serial mode would send to it:
+        self.which = vis.which
+        self.writer = vis.FFMpegFileWriter
+        vis.which = lambda path: path
+        vis.FFMpegFileWriter = RecordingWriter
+
+    def tearDown(self):
+        vis.which = self.which
+        vis.FFMpegFileWriter = self.writer
+        plt.close('all')
+        shutil.rmtree(self.dir)
+
+    def visualizer(self, out_filename):
+        V = vis.visualizer()
+        V.add_LPU(self.filename, LPU='test')
+        V.add_plot({'type': 'waveform', 'variable': 'V',
+                    'uids': [self.uids[:1]]}, 'test')
+        V.add_plot({'type': 'raster', 'variable': 'spike_state',
+                    'uids': [self.uids]}, 'test')
+        V.update_interval = 40e-4
+        V.out_filename = os.path.join(self.dir, out_filename)
+        return V
+
+    def test_frame_size(self):
+        # The figure's own dpi differs from that of the frames:
+        V = self.visualizer('frame%d.png')
+        V.final_frame_name = None
+        V._num_frames = 2
+        size, frames = V._render(0, 2, 300)
+        self.assertEqual(size, (16*80, 9*80))
+        for frame in frames:
+            self.assertEqual(len(frame), 4*size[0]*size[1])
+        V._close_data()
+
+    def test_same_frames(self):
+        V = self.visualizer('serial.mp4')
+        V.run()
+        serial = V.writer.frames
+
+        V = self.visualizer('frame%d.png')
+        V.run(processes=2, frames_per_task=2)
+        parallel = []
+        i = 0
+        while os.path.exists(os.path.join(self.dir, 'frame%d.png' % i)):
+            image = plt.imread(os.path.join(self.dir, 'frame%d.png' % i))
+            parallel.append(np.round(image*255).astype(np.uint8).tobytes())
+            i += 1
+
+        self.assertEqual(len(parallel), len(serial))
+        for s, p in zip(serial, parallel):
+            self.assertEqual(s, p)
+
+class test_add_plot(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'output.h5')
+
+    def tearDown(self):
+        plt.close('all')
+        shutil.rmtree(self.dir)
+
+    def waveform(self, num_uids):
+        create_output_file(self.filename, num_uids=num_uids)
+        V = vis.visualizer()
+        V.add_LPU(self.filename, LPU='test')
+        # Without uids, all the components are plotted:
+        V.add_plot({'type': 'waveform', 'variable': 'V'}, 'test')
+        V._initialize(writer=False)
+        config = V._config['test'][0]
+        V._close_data()
+        return config
+
+    def test_all_uids(self):
+        config = self.waveform(8)
+        self.assertEqual(list(config['ids'][0]), list(range(8)))
+        self.assertNotIn('envelope', config)
+        self.assertEqual(len(config['handle'].get_ydata()), 8)
+
+    def test_single_uid(self):
+        # A single trace is drawn from its envelope:
+        config = self.waveform(1)
+        self.assertEqual(len(config['envelope'].levels[0][0]), 200)
+
+if __name__ == '__main__':
+    main()